@@ -6,7 +6,7 @@ import { useLoans } from "@/hooks/use-loans"
 import Link from "next/link"
 import { useState, useEffect, useMemo, memo } from "react"
 import type { LoanState, Loan } from "@/lib/api/types"
-import { loansApi } from "@/lib/api/loans"
+import { portfolioApi, type PortfolioLoanSummary } from "@/lib/api/portfolio"
 import { useSearchContext } from "@/lib/search-context"
 import { SkeletonLoanCard } from "@/components/ui/skeleton-loader"
 
@@ -45,7 +45,7 @@ function getCovenantStatus(covenantStatus: LoanState["covenant_status"] | undefi
 export function LoanHealthGrid() {
   const { loans, loading, error } = useLoans()
   const { searchQuery } = useSearchContext()
-  const [loanStates, setLoanStates] = useState<Record<string, LoanState>>({})
+  const [loanStates, setLoanStates] = useState<Record<string, PortfolioLoanSummary>>({})
   const [statesLoading, setStatesLoading] = useState(false)
 
   // Filter loans based on search query
@@ -65,7 +65,7 @@ export function LoanHealthGrid() {
     })
   }, [loans, searchQuery])
 
-  // Fetch loan states for all loans
+  // Fetch health for all loans in one portfolio summary request
   useEffect(() => {
     if (loans.length === 0) return
 
@@ -73,16 +73,14 @@ export function LoanHealthGrid() {
     setStatesLoading(true)
 
     async function fetchStates() {
-      const states: Record<string, LoanState> = {}
-      for (const loan of loans) {
-        try {
-          const state = await loansApi.getState(loan.id)
-          if (!cancelled) {
-            states[loan.id] = state
-          }
-        } catch (err) {
-          console.error(`Failed to fetch state for loan ${loan.id}:`, err)
+      const states: Record<string, PortfolioLoanSummary> = {}
+      try {
+        const summary = await portfolioApi.getSummary()
+        for (const loan of summary.loans) {
+          states[loan.loan_id] = loan
         }
+      } catch (err) {
+        console.error("Failed to fetch portfolio summary:", err)
       }
       if (!cancelled) {
         setLoanStates(states)
@@ -37,6 +37,7 @@ export const API_ENDPOINTS = {
     get: (id: string) => `/api/v1/loans/${id}`,
     state: (id: string) => `/api/v1/loans/${id}/state`,
     upload: '/api/v1/loans/upload',
+    bulk: '/api/v1/loans/bulk',
     covenantCheck: (id: string) => `/api/v1/loans/${id}/covenant-check`,
   },
   
@@ -57,6 +58,11 @@ export const API_ENDPOINTS = {
     complianceCheck: (id: string) => `/api/v1/esg/${id}/compliance-check`,
   },
   
+  // Portfolio
+  portfolio: {
+    summary: '/api/v1/portfolio/summary',
+  },
+  
   // Audit
   audit: {
     all: '/api/v1/audit',
@@ -10,3 +10,4 @@ export { loansApi } from './loans'
 export { predictionsApi } from './predictions'
 export { esgApi } from './esg'
 export { auditApi, type AuditLogFilters } from './audit'
+export { portfolioApi, type PortfolioSummary, type PortfolioLoanSummary } from './portfolio'
@@ -0,0 +1,36 @@
+/**
+ * Portfolio API
+ * Portfolio-wide calls - one request instead of one per loan
+ */
+import { apiClient, API_ENDPOINTS } from './client'
+import { apiCache } from './cache'
+import type { LoanState } from './types'
+
+export interface PortfolioLoanSummary {
+  loan_id: string
+  borrower_name: string
+  status: string
+  health_score: LoanState['health_score']
+  covenant_status: LoanState['covenant_status']
+  esg_status: LoanState['esg_status']
+}
+
+export interface PortfolioSummary {
+  loans: PortfolioLoanSummary[]
+  total_loans: number
+  average_health_score: number
+  generated_at: string
+}
+
+export const portfolioApi = {
+  /**
+   * Get health summary for every loan (cached for 15 seconds)
+   */
+  async getSummary(): Promise<PortfolioSummary> {
+    return apiCache.getOrFetch(
+      'portfolio:summary',
+      () => apiClient.get<PortfolioSummary>(API_ENDPOINTS.portfolio.summary),
+      15000 // 15 seconds cache, same as loan state
+    )
+  },
+}
@@ -3,17 +3,52 @@ Feature Engineering for Risk Prediction
 Extracts features from loan data for ML models
 """
 from datetime import datetime, timedelta
-from typing import Dict, Any, List
+from itertools import chain
+from typing import Dict, Any, List, Mapping, Optional, Sequence, Tuple
 import numpy as np
 from app.models import Loan, CovenantCheck
+from app.ai.feature_scaler import FeatureScaler
+from app.services.covenant_series import to_micros
+
+# Column order of every feature vector / matrix
+FEATURE_ORDER = [
+    "loan_amount",
+    "interest_rate",
+    "loan_age_years",
+    "days_to_maturity",
+    "total_covenants",
+    "financial_covenants",
+    "operational_covenants",
+    "total_esg_clauses",
+    "environmental_clauses",
+    "social_clauses",
+    "governance_clauses",
+    "historical_breaches",
+    "historical_at_risk",
+    "avg_days_since_check",
+    "breach_rate",
+    "days_to_next_check",
+    "prediction_horizon_days",
+    "days_to_maturity_at_horizon",
+]
+# Horizon-independent columns come first - the last three are the temporal block
+STATIC_FEATURE_COUNT = 15
+# Static columns that don't depend on the reference time either (LoanFeatureBlock.fixed)
+_FIXED_COLUMNS = [0, 1, 4, 5, 6, 7, 8, 9, 10, 11, 12, 14]
+
+_DAY_MICROS = 86_400_000_000
 
 
 class FeatureEngineer:
     """Engineers features from loan and covenant data for risk prediction"""
     
-    def extract_loan_features(self, loan: Loan) -> Dict[str, float]:
+    def __init__(self, scaler: Optional[FeatureScaler] = None):
+        # Fitted portfolio statistics - until there is one, vectors are normalized on their own
+        self.scaler = scaler
+    
+    def extract_loan_features(self, loan: Loan, now: Optional[datetime] = None) -> Dict[str, float]:
         """Extract features from loan data"""
-        now = datetime.now()
+        now = now or datetime.now()
         days_to_maturity = (loan.maturity_date - now).days
         
         # Time-based features
@@ -51,7 +86,8 @@ class FeatureEngineer:
     
     def extract_covenant_history_features(
         self,
-        covenant_checks: List[CovenantCheck]
+        covenant_checks: List[CovenantCheck],
+        now: Optional[datetime] = None
     ) -> Dict[str, float]:
         """Extract features from covenant check history"""
         if not covenant_checks:
@@ -62,7 +98,7 @@ class FeatureEngineer:
                 "breach_rate": 0.0,
             }
         
-        now = datetime.now()
+        now = now or datetime.now()
         breaches = sum(1 for check in covenant_checks if check.is_breached)
         at_risk = sum(1 for check in covenant_checks if check.status == "at_risk")
         
@@ -84,10 +120,11 @@ class FeatureEngineer:
     def extract_temporal_features(
         self,
         loan: Loan,
-        prediction_horizon_days: int
+        prediction_horizon_days: int,
+        now: Optional[datetime] = None
     ) -> Dict[str, float]:
         """Extract time-based features for prediction horizon"""
-        now = datetime.now()
+        now = now or datetime.now()
         
         # Days until next covenant check
         next_check_dates = [
@@ -113,54 +150,181 @@ class FeatureEngineer:
         self,
         loan: Loan,
         covenant_checks: List[CovenantCheck],
-        prediction_horizon_days: int = 30
+        prediction_horizon_days: int = 30,
+        now: Optional[datetime] = None
     ) -> np.ndarray:
         """
         Engineer complete feature vector for risk prediction
         
+        Args:
+            now: Reference time (default: current time)
+        
         Returns:
             Feature vector as numpy array
         """
-        loan_features = self.extract_loan_features(loan)
-        history_features = self.extract_covenant_history_features(covenant_checks)
-        temporal_features = self.extract_temporal_features(loan, prediction_horizon_days)
+        now = now or datetime.now()
+        loan_features = self.extract_loan_features(loan, now)
+        history_features = self.extract_covenant_history_features(covenant_checks, now)
+        temporal_features = self.extract_temporal_features(loan, prediction_horizon_days, now)
         
         # Combine all features
         all_features = {**loan_features, **history_features, **temporal_features}
         
         # Convert to array in consistent order
-        feature_order = [
-            "loan_amount",
-            "interest_rate",
-            "loan_age_years",
-            "days_to_maturity",
-            "total_covenants",
-            "financial_covenants",
-            "operational_covenants",
-            "total_esg_clauses",
-            "environmental_clauses",
-            "social_clauses",
-            "governance_clauses",
-            "historical_breaches",
-            "historical_at_risk",
-            "avg_days_since_check",
-            "breach_rate",
-            "days_to_next_check",
-            "prediction_horizon_days",
-            "days_to_maturity_at_horizon",
-        ]
+        feature_vector = np.array([all_features.get(key, 0.0) for key in FEATURE_ORDER])
         
-        feature_vector = np.array([all_features.get(key, 0.0) for key in feature_order])
-        
-        # Normalize features (simple min-max normalization)
-        # In production, use fitted scaler
+        # Fitted scaler when there is one, per-vector normalization otherwise
         feature_vector = self._normalize_features(feature_vector)
         
         return feature_vector
     
-    def _normalize_features(self, features: np.ndarray) -> np.ndarray:
-        """Simple normalization (in production, use fitted scaler)"""
+    def build_feature_block(self, loan: Loan, covenant_checks: List[CovenantCheck]) -> "LoanFeatureBlock":
+        """
+        Everything about a loan the features need, minus the reference time
+        Counts and rates are final; dates are kept as µs so any now can be applied later
+        """
+        covenant_types = [c.type for c in loan.covenants]
+        categories = [e.category for e in loan.esg_clauses]
+        breaches = sum(1 for check in covenant_checks if check.is_breached)
+        return LoanFeatureBlock(
+            (
+                loan.loan_amount,
+                loan.interest_rate,
+                len(covenant_types),
+                covenant_types.count("financial"),
+                covenant_types.count("operational"),
+                len(categories),
+                categories.count("environmental"),
+                categories.count("social"),
+                categories.count("governance"),
+                breaches,
+                sum(1 for check in covenant_checks if check.status == "at_risk"),
+                breaches / len(covenant_checks) if covenant_checks else 0.0
+            ),
+            to_micros(loan.start_date),
+            to_micros(loan.maturity_date),
+            tuple(to_micros(check.check_date) for check in covenant_checks),
+            tuple(to_micros(c.next_check_date) for c in loan.covenants)
+        )
+    
+    def engineer_features_batch(
+        self,
+        loans: Sequence[Loan],
+        covenant_checks: Mapping[str, List[CovenantCheck]],
+        prediction_horizons: Sequence[int],
+        now: Optional[datetime] = None,
+        normalize: bool = True
+    ) -> np.ndarray:
+        """
+        engineer_features for every (loan, horizon) pair in one pass
+        Same values as engineer_features with the same now - see features_from_blocks
+        
+        Args:
+            covenant_checks: loan_id -> that loan's covenant checks
+            now: Reference time for every row (default: current time)
+            normalize: False for raw feature values (what the scaler is fitted on)
+        
+        Returns:
+            (len(loans) * len(prediction_horizons), len(FEATURE_ORDER)) array, loan-major -
+            row i * len(prediction_horizons) + j is loans[i] at prediction_horizons[j]
+        """
+        blocks = [self.build_feature_block(loan, covenant_checks.get(loan.id) or []) for loan in loans]
+        return self.features_from_blocks(blocks, prediction_horizons, now, normalize)
+    
+    def features_from_blocks(
+        self,
+        blocks: Sequence["LoanFeatureBlock"],
+        prediction_horizons: Sequence[int],
+        now: Optional[datetime] = None,
+        normalize: bool = True,
+        scaler: Optional[FeatureScaler] = None
+    ) -> np.ndarray:
+        """
+        Feature rows from prepared blocks - only the time-dependent columns are computed here
+        
+        Dates are integer µs columns, per-check values are reduced per loan with bincount,
+        and the temporal block is broadcast across horizons. Floors match timedelta.days,
+        so rows equal engineer_features with the same now bit for bit.
+        
+        Args:
+            scaler: Normalize with this one instead of self.scaler (a model's own training scaler)
+        
+        Returns:
+            (len(blocks) * len(prediction_horizons), len(FEATURE_ORDER)) array, loan-major
+        """
+        now_us = to_micros(now or datetime.now())
+        horizons = np.asarray(prediction_horizons, dtype=np.int64)
+        n = len(blocks)
+        
+        static = np.empty((n, STATIC_FEATURE_COUNT))
+        static[:, _FIXED_COLUMNS] = np.array([block.fixed for block in blocks], dtype=float).reshape(n, len(_FIXED_COLUMNS))
+        start_us = np.fromiter((block.start_us for block in blocks), dtype=np.int64, count=n)
+        days_to_maturity = (np.fromiter((block.maturity_us for block in blocks), dtype=np.int64, count=n) - now_us) // _DAY_MICROS
+        static[:, 2] = ((now_us - start_us) // _DAY_MICROS) / 365.0
+        static[:, 3] = days_to_maturity
+        
+        # Average whole days since each covenant check
+        check_owner = _owners([len(block.check_us) for block in blocks])
+        check_counts = np.bincount(check_owner, minlength=n)
+        days_since = (now_us - np.fromiter(chain.from_iterable(block.check_us for block in blocks), dtype=np.int64, count=len(check_owner))) // _DAY_MICROS
+        static[:, 13] = np.where(
+            check_counts > 0,
+            np.bincount(check_owner, weights=days_since, minlength=n) / np.maximum(check_counts, 1),
+            0.0
+        )
+        
+        # Days to the next future covenant check - 365 when none is scheduled
+        covenant_owner = _owners([len(block.next_check_us) for block in blocks])
+        until_next = np.fromiter(chain.from_iterable(block.next_check_us for block in blocks), dtype=np.int64, count=len(covenant_owner)) - now_us
+        future = until_next > 0
+        days_to_next_check = np.full(n, np.inf)
+        np.minimum.at(days_to_next_check, covenant_owner[future], until_next[future] // _DAY_MICROS)
+        days_to_next_check[np.isinf(days_to_next_check)] = 365.0
+        
+        features = np.empty((n, len(horizons), len(FEATURE_ORDER)))
+        features[:, :, :STATIC_FEATURE_COUNT] = static[:, None, :]
+        features[:, :, 15] = days_to_next_check[:, None]
+        features[:, :, 16] = horizons
+        # Whole-day shifts commute with the floor in timedelta.days
+        features[:, :, 17] = days_to_maturity[:, None] - horizons
+        
+        features = features.reshape(n * len(horizons), len(FEATURE_ORDER))
+        return self._normalize_features(features, scaler) if normalize else features
+    
+    def _normalize_features(self, features: np.ndarray, scaler: Optional[FeatureScaler] = None) -> np.ndarray:
+        """Fitted scaler transform - falls back to dividing each value by its own magnitude"""
+        scaler = scaler or self.scaler
+        if scaler is not None and scaler.fitted:
+            return scaler.transform(features)
         # Avoid division by zero
         max_vals = np.maximum(np.abs(features), 1e-6)
         return features / max_vals
 
+
+def _owners(counts: List[int]) -> np.ndarray:
+    """Row index of the owning loan for each item of a flattened per-loan list"""
+    return np.repeat(np.arange(len(counts)), counts)
+
+
+class LoanFeatureBlock:
+    """
+    One loan's feature inputs with the reference time left out - see build_feature_block
+    Dates are µs since epoch; datetime64 conversion of whole columns is slower than this
+    """
+    
+    __slots__ = ("fixed", "start_us", "maturity_us", "check_us", "next_check_us")
+    
+    def __init__(
+        self,
+        fixed: Tuple[float, ...],
+        start_us: int,
+        maturity_us: int,
+        check_us: Tuple[int, ...],
+        next_check_us: Tuple[int, ...]
+    ):
+        # Values for _FIXED_COLUMNS, in that order
+        self.fixed = fixed
+        self.start_us = start_us
+        self.maturity_us = maturity_us
+        self.check_us = check_us
+        self.next_check_us = next_check_us
@@ -0,0 +1,141 @@
+"""
+Fitted feature scaler - replaces per-vector normalization
+Per-column mean/variance (Welford, merged batch by batch) and min/max over the portfolio's
+feature matrix, persisted as a small versioned .npz artifact and applied as one affine transform
+"""
+import os
+from datetime import datetime
+from typing import List, Optional
+import numpy as np
+
+SCALER_METHODS = ("standard", "minmax")
+# Artifact layout version - bump when the saved fields change
+ARTIFACT_FORMAT = 1
+
+
+class FeatureScaler:
+    """
+    Streaming column statistics -> (X - shift) * inv_scale
+    standard: shift = mean, scale = std; minmax: shift = min, scale = max - min
+    Constant columns get scale 1 so they come out as 0 instead of inf
+    """
+    
+    def __init__(self, feature_order: List[str], method: str = "standard"):
+        if method not in SCALER_METHODS:
+            raise ValueError(f"Unknown scaler method {method!r} - expected one of {SCALER_METHODS}")
+        self.feature_order = list(feature_order)
+        self.method = method
+        n = len(self.feature_order)
+        self.count = 0
+        self.mean = np.zeros(n)
+        # Sum of squared deviations from the mean
+        self.m2 = np.zeros(n)
+        self.minimum = np.full(n, np.inf)
+        self.maximum = np.full(n, -np.inf)
+        # Bumped on every update - identifies the statistics a prediction was made with
+        self.version = 0
+        self.fitted_at: Optional[str] = None
+        self._affine = (np.zeros(n), np.ones(n))
+    
+    @property
+    def fitted(self) -> bool:
+        return self.count > 0
+    
+    def partial_fit(self, rows: np.ndarray) -> "FeatureScaler":
+        """
+        Fold a batch of raw feature rows into the statistics - no earlier rows needed
+        Batches merge with Chan et al.'s parallel form of Welford's update
+        """
+        rows = np.atleast_2d(np.asarray(rows, dtype=float))
+        n = rows.shape[0]
+        if n == 0:
+            return self
+        batch_mean = rows.mean(axis=0)
+        batch_m2 = ((rows - batch_mean) ** 2).sum(axis=0)
+        
+        total = self.count + n
+        delta = batch_mean - self.mean
+        self.mean = self.mean + delta * (n / total)
+        self.m2 = self.m2 + batch_m2 + delta ** 2 * (self.count * n / total)
+        self.count = total
+        self.minimum = np.minimum(self.minimum, rows.min(axis=0))
+        self.maximum = np.maximum(self.maximum, rows.max(axis=0))
+        self.fitted_at = datetime.now().isoformat()
+        self.version += 1
+        self._update_affine()
+        return self
+    
+    def _update_affine(self) -> None:
+        if self.method == "standard":
+            shift, scale = self.mean, np.sqrt(self.m2 / self.count)
+        else:
+            shift, scale = self.minimum, self.maximum - self.minimum
+        scale = np.where(scale > 1e-12, scale, 1.0)
+        # One tuple assignment - concurrent transforms see old or new, never a mix
+        self._affine = (shift.copy(), 1.0 / scale)
+    
+    def transform(self, features: np.ndarray) -> np.ndarray:
+        """Scale one feature vector or a (rows, features) matrix"""
+        shift, inv_scale = self._affine
+        return (features - shift) * inv_scale
+    
+    def save(self, path: str) -> int:
+        """
+        Write the artifact atomically (temp file + rename)
+        
+        Returns:
+            The saved version
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            np.savez(
+                f,
+                format=ARTIFACT_FORMAT,
+                version=self.version,
+                method=self.method,
+                feature_order=np.array(self.feature_order),
+                count=self.count,
+                mean=self.mean,
+                m2=self.m2,
+                minimum=self.minimum,
+                maximum=self.maximum,
+                fitted_at=self.fitted_at or ""
+            )
+        os.replace(temp_path, path)
+        return self.version
+    
+    @classmethod
+    def load(cls, path: str, feature_order: Optional[List[str]] = None) -> "FeatureScaler":
+        """
+        Read a saved artifact
+        
+        Raises:
+            ValueError: If it was fitted on a different feature order than expected
+        """
+        with np.load(path) as data:
+            saved_order = [str(name) for name in data["feature_order"]]
+            if feature_order is not None and saved_order != list(feature_order):
+                raise ValueError(f"Scaler at {path} was fitted on a different feature order")
+            scaler = cls(saved_order, method=str(data["method"]))
+            scaler.version = int(data["version"])
+            scaler.count = int(data["count"])
+            scaler.mean = data["mean"].astype(float)
+            scaler.m2 = data["m2"].astype(float)
+            scaler.minimum = data["minimum"].astype(float)
+            scaler.maximum = data["maximum"].astype(float)
+            scaler.fitted_at = str(data["fitted_at"]) or None
+        if scaler.fitted:
+            scaler._update_affine()
+        return scaler
+    
+    def to_dict(self) -> dict:
+        return {
+            "method": self.method,
+            "version": self.version,
+            "count": self.count,
+            "fitted_at": self.fitted_at,
+            "features": len(self.feature_order)
+        }
@@ -0,0 +1,138 @@
+"""
+Model registry - versioned breach model artifacts on disk
+Each version is a directory: weights.npy (memory-mapped on load - one row, or one row per
+trained horizon), scaler.npz (FeatureScaler) and manifest.json (feature order, bias, horizons,
+metrics). An ACTIVE file names the version every
+worker process should serve.
+"""
+import json
+import os
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import numpy as np
+from app.ai.feature_scaler import FeatureScaler
+from app.ai.risk_model import RiskPredictionModel
+
+ARTIFACT_FORMAT = 1
+ACTIVE_FILE = "ACTIVE"
+# Version names become directory names
+VERSION_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$")
+
+
+class ModelRegistry:
+    """Directory of model versions plus the ACTIVE pointer"""
+    
+    def __init__(self, root: str):
+        self.root = root
+    
+    def _path(self, version: str, name: str = "") -> str:
+        if not VERSION_PATTERN.match(version):
+            raise ValueError(f"Invalid model version {version!r}")
+        return os.path.join(self.root, version, name)
+    
+    def save(
+        self,
+        version: str,
+        weights: np.ndarray,
+        bias: float,
+        feature_order: List[str],
+        scaler: Optional[FeatureScaler] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        horizons: Optional[List[int]] = None
+    ) -> Dict[str, Any]:
+        """
+        Write a new version - never overwrites one that exists
+        
+        Args:
+            weights: (features,), or (len(horizons), features) with bias per horizon
+            horizons: Horizons in days the weight rows were trained for
+        
+        Returns:
+            The version's manifest
+        """
+        directory = self._path(version)
+        if os.path.exists(directory):
+            raise ValueError(f"Model version {version} already exists")
+        weights = np.ascontiguousarray(weights, dtype=np.float64)
+        if weights.shape[-1] != len(feature_order):
+            raise ValueError(f"Weights have {weights.shape[-1]} columns for {len(feature_order)} features")
+        if (weights.ndim == 2) != (horizons is not None) or (horizons is not None and len(horizons) != weights.shape[0]):
+            raise ValueError("Per-horizon weights need exactly one row per horizon")
+        
+        # Written under a temp name and renamed - a half-written version is never visible
+        temp_directory = f"{directory.rstrip(os.sep)}.{os.getpid()}.tmp"
+        os.makedirs(temp_directory)
+        np.save(os.path.join(temp_directory, "weights.npy"), weights)
+        if scaler is not None:
+            scaler.save(os.path.join(temp_directory, "scaler.npz"))
+        manifest = {
+            "format": ARTIFACT_FORMAT,
+            "version": version,
+            "feature_order": list(feature_order),
+            "bias": np.asarray(bias, dtype=float).tolist(),
+            "horizons": None if horizons is None else [int(h) for h in horizons],
+            "has_scaler": scaler is not None,
+            "created_at": datetime.now().isoformat(),
+            **(metadata or {})
+        }
+        with open(os.path.join(temp_directory, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(temp_directory, directory)
+        return manifest
+    
+    def manifest(self, version: str) -> Dict[str, Any]:
+        with open(self._path(version, "manifest.json")) as f:
+            return json.load(f)
+    
+    def list_versions(self) -> List[Dict[str, Any]]:
+        """Manifests of every complete version, oldest first"""
+        if not os.path.isdir(self.root):
+            return []
+        manifests = []
+        for name in os.listdir(self.root):
+            if VERSION_PATTERN.match(name) and os.path.isfile(os.path.join(self.root, name, "manifest.json")):
+                manifests.append(self.manifest(name))
+        return sorted(manifests, key=lambda manifest: manifest.get("created_at", ""))
+    
+    def load(self, version: str, feature_order: List[str], noise: str = "deterministic") -> RiskPredictionModel:
+        """
+        Build the model for a version - weights stay memory-mapped, so every worker
+        process shares one copy of the pages
+        
+        Raises:
+            FileNotFoundError: Unknown version
+            ValueError: Fitted on a different feature order
+        """
+        manifest = self.manifest(version)
+        if manifest["feature_order"] != list(feature_order):
+            raise ValueError(f"Model {version} was trained on a different feature order")
+        weights = np.load(self._path(version, "weights.npy"), mmap_mode="r")
+        scaler = None
+        if manifest.get("has_scaler"):
+            scaler = FeatureScaler.load(self._path(version, "scaler.npz"), feature_order)
+        return RiskPredictionModel(
+            # Trained models record noise "off" - the demo noise is for the demo weights
+            noise=manifest.get("noise", noise),
+            weights=weights,
+            bias=manifest["bias"],
+            version=version,
+            scaler=scaler,
+            horizons=manifest.get("horizons")
+        )
+    
+    def active_version(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.root, ACTIVE_FILE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+    
+    def set_active(self, version: str) -> None:
+        """Point ACTIVE at a version (atomic rename) - the version must exist"""
+        self.manifest(version)
+        os.makedirs(self.root, exist_ok=True)
+        temp_path = os.path.join(self.root, f"{ACTIVE_FILE}.{os.getpid()}.tmp")
+        with open(temp_path, "w") as f:
+            f.write(version)
+        os.replace(temp_path, os.path.join(self.root, ACTIVE_FILE))
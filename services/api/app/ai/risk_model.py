@@ -3,22 +3,109 @@ Risk prediction model - simulated ML for hackathon demo
 Production would use trained XGBoost/RandomForest with historical breach data
 """
 import numpy as np
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Sequence, Tuple
 from datetime import datetime, timedelta
 from app.models import Loan, CovenantCheck
+from app.ai.feature_scaler import FeatureScaler
+
+# random: fresh draw per call (outputs can't be cached); deterministic: drawn from a hash
+# of the features and horizon, so the same inputs always give the same probability
+NOISE_MODES = ("random", "deterministic", "off")
+NOISE_STD = 0.05
+# Version of the built-in demo weights - always the same seed-42 draw
+DEMO_VERSION = "demo-seed42"
+
+_HASH_SEED = np.uint64(0x9E3779B97F4A7C15)
+
+# Upper bounds of low / medium / high - anything above is critical
+RISK_LEVEL_THRESHOLDS = np.array([0.3, 0.6, 0.8])
+RISK_LEVELS = np.array(["low", "medium", "high", "critical"])
+
+
+def _mix64(x: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer, elementwise - uint64 arithmetic wraps"""
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
 
 
 class RiskPredictionModel:
     """
-    Simulated risk model - gives realistic predictions for demo
-    TODO: Replace with actual trained model using historical loan data
+    Linear + sigmoid breach model - trained weights from the model registry (see
+    app.ai.training), or seeded random demo weights when no version is active
     """
     
-    def __init__(self):
-        # Random weights for demo - in prod these come from training
-        np.random.seed(42)  # Reproducible for demo
-        self.weights = np.random.randn(18) * 0.1
-        self.bias = 0.0
+    def __init__(
+        self,
+        noise: str = "random",
+        weights: Optional[np.ndarray] = None,
+        bias: float = 0.0,
+        version: str = DEMO_VERSION,
+        scaler: Optional[FeatureScaler] = None,
+        horizons: Optional[Sequence[int]] = None
+    ):
+        """
+        Args:
+            weights: (features,) for one model with the demo horizon heuristic, or
+                (len(horizons), features) for one trained model per horizon
+            bias: Scalar, or one per horizon
+            horizons: Horizons (days, ascending) the weight rows were trained for -
+                others interpolate between the nearest two, clamped at the ends
+        """
+        if noise not in NOISE_MODES:
+            raise ValueError(f"Unknown noise mode {noise!r} - expected one of {NOISE_MODES}")
+        self.noise = noise
+        # Own generator, same seed-42 sequence - building a model no longer reseeds NumPy's global RNG
+        self._rng = np.random.RandomState(42)
+        if weights is None:
+            # Random weights for demo - trained ones come from the model registry
+            weights = self._rng.randn(18) * 0.1
+        self.weights = weights
+        self.bias = bias
+        self.horizons = None if horizons is None else np.asarray(horizons, dtype=float)
+        if self.horizons is not None and np.shape(weights)[0] != len(self.horizons):
+            raise ValueError(f"{np.shape(weights)[0]} weight rows for {len(self.horizons)} horizons")
+        # Identifies the weights in cache keys and prediction responses
+        self.version = version
+        # Scaler the weights were trained with - None means the service's online-fitted one
+        self.scaler = scaler
+    
+    @property
+    def cacheable(self) -> bool:
+        """Whether the same inputs always give the same output"""
+        return self.noise != "random"
+    
+    def _coefficients(self, prediction_horizons: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(weights (..., features), bias (...), score factor (...)) for each horizon"""
+        prediction_horizons = np.asarray(prediction_horizons, dtype=float)
+        if self.horizons is None:
+            # Longer horizons = more uncertainty (simple heuristic)
+            return self.weights, np.asarray(self.bias), 1.0 + (prediction_horizons / 365.0) * 0.2
+        position = np.interp(prediction_horizons, self.horizons, np.arange(len(self.horizons)))
+        lower = np.floor(position).astype(int)
+        upper = np.minimum(lower + 1, len(self.horizons) - 1)
+        fraction = position - lower
+        weights = self.weights[lower] * (1.0 - fraction)[..., None] + self.weights[upper] * fraction[..., None]
+        bias = np.asarray(self.bias, dtype=float)
+        return weights, bias[lower] * (1.0 - fraction) + bias[upper] * fraction, np.ones_like(prediction_horizons)
+    
+    def _noise(self, features: np.ndarray, prediction_horizons: np.ndarray, shape) -> np.ndarray:
+        """Demo noise for probabilities of the given shape (features has one more axis)"""
+        if self.noise == "off":
+            return np.zeros(shape)
+        if self.noise == "random":
+            return self._rng.normal(0, NOISE_STD, size=shape)
+        # Two uniforms per row from a hash of its exact feature bits and horizon -> Box-Muller
+        # Column-at-a-time splitmix64, so a 365-day curve over the portfolio is still one array pass
+        rows = np.ascontiguousarray(features, dtype=np.float64).reshape(-1, features.shape[-1]).view(np.uint64)
+        horizons = np.broadcast_to(np.asarray(prediction_horizons, dtype=np.int64), shape).reshape(-1)
+        digest = _mix64(horizons.astype(np.uint64) ^ _HASH_SEED)
+        for column in rows.T:
+            digest = _mix64(digest ^ column)
+        u1 = (digest >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+        u2 = (_mix64(digest ^ _HASH_SEED) >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+        z = np.sqrt(-2.0 * np.log1p(-u1)) * np.cos(2.0 * np.pi * u2)
+        return (NOISE_STD * z).reshape(shape)
     
     def predict_breach_probability(
         self,
@@ -29,22 +116,51 @@ class RiskPredictionModel:
         Predict breach probability - simple linear + sigmoid for demo
         Real model would use ensemble methods with feature importance
         """
-        # Basic linear combination
-        raw_score = np.dot(features, self.weights) + self.bias
+        weights, bias, horizon_factor = self._coefficients(prediction_horizon_days)
         
-        # Longer horizons = more uncertainty (simple heuristic)
-        horizon_factor = 1.0 + (prediction_horizon_days / 365.0) * 0.2
+        # Basic linear combination
+        raw_score = np.dot(features, weights) + bias
         adjusted_score = raw_score * horizon_factor
         
         # Sigmoid to bound between 0-1
         probability = 1.0 / (1.0 + np.exp(-adjusted_score))
         
         # Small noise for demo realism - remove in production
-        noise = np.random.normal(0, 0.05)
+        noise = self._noise(features, np.array(prediction_horizon_days), ())
         probability = np.clip(probability + noise, 0.0, 1.0)
         
         return float(probability)
     
+    def predict_breach_probabilities(
+        self,
+        features: np.ndarray,
+        prediction_horizons: np.ndarray,
+        noise: bool = True
+    ) -> np.ndarray:
+        """
+        predict_breach_probability over a whole batch
+        
+        Args:
+            features: (..., horizons, features) matrix
+            prediction_horizons: Horizon in days for each row of the second-to-last axis
+            noise: Add the demo noise - risk curves leave it out, a draw per day makes them jagged
+        
+        Returns:
+            (..., horizons) breach probabilities
+        """
+        weights, bias, horizon_factors = self._coefficients(prediction_horizons)
+        if weights.ndim == 1:
+            raw_scores = features @ weights + bias
+        else:
+            # One weight row per horizon
+            raw_scores = np.einsum("...hf,hf->...h", features, weights) + bias
+        probabilities = 1.0 / (1.0 + np.exp(-raw_scores * horizon_factors))
+        
+        if not noise:
+            return probabilities
+        # Same demo noise as the scalar path, drawn once for the batch
+        return np.clip(probabilities + self._noise(features, prediction_horizons, probabilities.shape), 0.0, 1.0)
+    
     def predict_risk_level(self, probability: float) -> str:
         """Convert probability to risk level"""
         if probability < 0.3:
@@ -56,6 +172,10 @@ class RiskPredictionModel:
         else:
             return "critical"
     
+    def predict_risk_levels(self, probabilities: np.ndarray) -> np.ndarray:
+        """predict_risk_level over an array of probabilities"""
+        return RISK_LEVELS[np.searchsorted(RISK_LEVEL_THRESHOLDS, probabilities, side="right")]
+    
     def identify_risk_factors(
         self,
         loan: Loan,
@@ -0,0 +1,283 @@
+"""
+Offline training for the breach model - labelled examples from covenant-check history
+Every loan is sampled at reference days step_days apart: its features as they stood that day
+(checks up to and including it) and whether a breach was recorded within each horizon after.
+One logistic regression per horizon, written to the model registry for RiskPredictionModel.
+Run from services/api: python -m app.ai.training --version <name> [--activate]
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from sklearn.ensemble import HistGradientBoostingClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import brier_score_loss, roc_auc_score
+from app.models import Loan, CovenantCheck
+from app.ai.feature_engineering import FeatureEngineer, FEATURE_ORDER, _FIXED_COLUMNS, _DAY_MICROS
+from app.ai.feature_scaler import FeatureScaler
+from app.ai.model_registry import ModelRegistry
+from app.services.covenant_series import to_micros
+
+DEFAULT_HORIZONS = [30, 60, 90]
+DEFAULT_STEP_DAYS = 30
+# Latest fraction of reference days held out for metrics - a time split, so no look-ahead
+DEFAULT_HOLDOUT = 0.2
+
+_COLUMN = {name: i for i, name in enumerate(FEATURE_ORDER)}
+# Weights pinned at 0: the horizon column is constant within a horizon's model (so rows
+# interpolated between trained horizons aren't shifted by it), and days_to_next_check
+# can't be rebuilt point-in-time (see build_examples)
+UNFITTED_COLUMNS = ("prediction_horizon_days", "days_to_next_check")
+# days_to_next_check for a loan with no upcoming check - FeatureEngineer's default
+NO_SCHEDULE_DAYS = 365.0
+
+
+def flatten_checks(
+    loans: Sequence[Loan],
+    load_checks: Callable[[str], List[CovenantCheck]]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Every loan's checks as columns, sorted by (loan, check time)
+    
+    Returns:
+        (loan index, check time µs, is_breached, at_risk) arrays
+    """
+    counts, checks = [], []
+    for loan in loans:
+        loan_checks = load_checks(loan.id)
+        counts.append(len(loan_checks))
+        checks.extend(loan_checks)
+    total = len(checks)
+    owner = np.repeat(np.arange(len(loans)), counts)
+    check_us = np.fromiter((to_micros(check.check_date) for check in checks), dtype=np.int64, count=total)
+    breached = np.fromiter((check.is_breached for check in checks), dtype=bool, count=total)
+    at_risk = np.fromiter((check.status == "at_risk" for check in checks), dtype=bool, count=total)
+    order = np.lexsort((check_us, owner))
+    return owner[order], check_us[order], breached[order], at_risk[order]
+
+
+def build_examples(
+    loans: Sequence[Loan],
+    checks: Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray],
+    horizons: Sequence[int] = DEFAULT_HORIZONS,
+    step_days: int = DEFAULT_STEP_DAYS,
+    as_of: Optional[datetime] = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Point-in-time feature rows and breach labels for every (loan, reference day)
+    
+    Reference days are midnights from step_days after a loan's start until its maturity,
+    while every horizon still ends before as_of. All per-example history values come from
+    prefix sums over the sorted checks, located with one searchsorted per column - no
+    Python loop over examples or checks.
+    
+    The covenant counts use the loan as it is now. days_to_next_check comes from the covenant
+    schedule at serving time, and there is no schedule history to rebuild it from - the next
+    recorded check would leak the label - so it is filled with the no-schedule default and
+    left out of the fit (UNFITTED_COLUMNS).
+    
+    Args:
+        checks: flatten_checks output
+        as_of: End of the observed history (default: now)
+    
+    Returns:
+        (features (examples, horizons, features) raw values, labels (examples, horizons) bool,
+        reference day µs (examples,))
+    """
+    owner, check_us, breached, at_risk = checks
+    horizon_us = np.asarray(horizons, dtype=np.int64) * _DAY_MICROS
+    step_us = step_days * _DAY_MICROS
+    n = len(loans)
+    
+    engineer = FeatureEngineer()
+    blocks = [engineer.build_feature_block(loan, ()) for loan in loans]
+    start_us = np.fromiter((block.start_us for block in blocks), dtype=np.int64, count=n)
+    maturity_us = np.fromiter((block.maturity_us for block in blocks), dtype=np.int64, count=n)
+    
+    # Whole-day reference times keep (now - check).days exact: floor((t - c) / day) = t/day - ceil(c/day)
+    first_us = -(-start_us // _DAY_MICROS) * _DAY_MICROS + step_us
+    last_us = np.minimum(maturity_us - 1, to_micros(as_of or datetime.now()) - horizon_us.max())
+    counts = np.maximum((last_us - first_us) // step_us + 1, 0)
+    example_loan = np.repeat(np.arange(n), counts)
+    within_loan = np.arange(len(example_loan)) - np.repeat(np.cumsum(counts) - counts, counts)
+    reference_us = first_us[example_loan] + within_loan * step_us
+    
+    # (loan, time) as one sortable int64 key - times are ranked first so the product can't overflow
+    horizon_end_us = reference_us[:, None] + horizon_us
+    times = np.unique(np.concatenate([check_us, reference_us, horizon_end_us.ravel()]))
+    stride = len(times) + 1
+    check_key = owner * stride + np.searchsorted(times, check_us)
+    loan_first = np.searchsorted(check_key, np.arange(n) * stride)
+    
+    def position_after(t_us: np.ndarray, loan: np.ndarray) -> np.ndarray:
+        # Index just past the loan's last check at or before t
+        return np.searchsorted(check_key, loan * stride + np.searchsorted(times, t_us), side="right")
+    
+    first = loan_first[example_loan]
+    end = position_after(reference_us, example_loan)
+    seen = end - first
+    breach_prefix = np.concatenate([[0], np.cumsum(breached)])
+    at_risk_prefix = np.concatenate([[0], np.cumsum(at_risk)])
+    ceil_day_prefix = np.concatenate([[0], np.cumsum(-(-check_us // _DAY_MICROS))])
+    breaches = breach_prefix[end] - breach_prefix[first]
+    has_history = seen > 0
+    
+    reference_day = reference_us // _DAY_MICROS
+    days_to_maturity = (maturity_us[example_loan] - reference_us) // _DAY_MICROS
+    static = np.empty((len(example_loan), len(FEATURE_ORDER)))
+    static[:, _FIXED_COLUMNS] = np.array([block.fixed for block in blocks], dtype=float).reshape(n, len(_FIXED_COLUMNS))[example_loan]
+    static[:, _COLUMN["loan_age_years"]] = ((reference_us - start_us[example_loan]) // _DAY_MICROS) / 365.0
+    static[:, _COLUMN["days_to_maturity"]] = days_to_maturity
+    static[:, _COLUMN["historical_breaches"]] = breaches
+    static[:, _COLUMN["historical_at_risk"]] = at_risk_prefix[end] - at_risk_prefix[first]
+    static[:, _COLUMN["avg_days_since_check"]] = np.where(
+        has_history,
+        (seen * reference_day - (ceil_day_prefix[end] - ceil_day_prefix[first])) / np.maximum(seen, 1),
+        0.0
+    )
+    static[:, _COLUMN["breach_rate"]] = np.where(has_history, breaches / np.maximum(seen, 1), 0.0)
+    static[:, _COLUMN["days_to_next_check"]] = NO_SCHEDULE_DAYS
+    
+    features = np.repeat(static[:, None, :], len(horizon_us), axis=1)
+    features[:, :, _COLUMN["prediction_horizon_days"]] = horizons
+    features[:, :, _COLUMN["days_to_maturity_at_horizon"]] = days_to_maturity[:, None] - np.asarray(horizons)
+    
+    # A breach recorded after the reference day and no later than the horizon's end
+    horizon_end = position_after(horizon_end_us.ravel(), np.repeat(example_loan, len(horizon_us)))
+    labels = breach_prefix[horizon_end.reshape(horizon_end_us.shape)] > breach_prefix[end][:, None]
+    return features, labels, reference_us
+
+
+def _scores(labels: np.ndarray, probabilities: np.ndarray) -> Dict[str, Optional[float]]:
+    if len(labels) == 0:
+        return {"auc": None, "brier": None}
+    return {
+        # AUC is undefined when the holdout has one class only
+        "auc": float(roc_auc_score(labels, probabilities)) if labels.min() != labels.max() else None,
+        "brier": float(brier_score_loss(labels, probabilities))
+    }
+
+
+def train_models(
+    features: np.ndarray,
+    labels: np.ndarray,
+    reference_us: np.ndarray,
+    horizons: Sequence[int] = DEFAULT_HORIZONS,
+    holdout: float = DEFAULT_HOLDOUT,
+    regularization: float = 1.0,
+    gbm_baseline: bool = False
+) -> Tuple[np.ndarray, np.ndarray, FeatureScaler, Dict[str, Any]]:
+    """
+    Fit one logistic regression per horizon on the scaled features
+    The latest holdout fraction of reference days is scored, never trained on
+    
+    Args:
+        gbm_baseline: Also fit a gradient-boosted classifier per horizon and report its
+            holdout scores - for comparison only, the artifact stays linear
+    
+    Returns:
+        (weights (horizons, features), bias (horizons,), fitted scaler, metrics per horizon)
+    
+    Raises:
+        ValueError: A horizon's training labels are all one class
+    """
+    cutoff = np.quantile(reference_us, 1.0 - holdout) if holdout > 0 else np.inf
+    train = reference_us < cutoff
+    test = ~train
+    scaler = FeatureScaler(FEATURE_ORDER).partial_fit(features[train].reshape(-1, len(FEATURE_ORDER)))
+    
+    fitted = [i for i, name in enumerate(FEATURE_ORDER) if name not in UNFITTED_COLUMNS]
+    weights = np.zeros((len(horizons), len(FEATURE_ORDER)))
+    bias = np.zeros(len(horizons))
+    metrics = {}
+    for j, horizon_days in enumerate(horizons):
+        x_train, y_train = scaler.transform(features[train, j])[:, fitted], labels[train, j]
+        if y_train.min() == y_train.max():
+            raise ValueError(f"{horizon_days}-day training labels are all {bool(y_train[0])} - not enough breach history")
+        classifier = LogisticRegression(C=regularization, max_iter=1000).fit(x_train, y_train)
+        weights[j, fitted] = classifier.coef_[0]
+        bias[j] = classifier.intercept_[0]
+        
+        y_test = labels[test, j]
+        probabilities = classifier.predict_proba(scaler.transform(features[test, j])[:, fitted])[:, 1] if test.any() else y_test
+        horizon_metrics = {
+            "train_examples": int(train.sum()),
+            "test_examples": int(test.sum()),
+            "breach_rate": float(labels[:, j].mean()),
+            **_scores(y_test, probabilities)
+        }
+        if gbm_baseline and test.any():
+            boosted = HistGradientBoostingClassifier().fit(features[train, j][:, fitted], y_train)
+            horizon_metrics["gbm_baseline"] = _scores(y_test, boosted.predict_proba(features[test, j][:, fitted])[:, 1])
+        metrics[str(horizon_days)] = horizon_metrics
+    return weights, bias, scaler, metrics
+
+
+def main():
+    from app.services.twin_store import create_twin_store
+    from app.services.prediction_service import DEFAULT_MODEL_REGISTRY_PATH
+    
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--version", required=True, help="Registry version to write")
+    parser.add_argument("--registry", default=os.getenv("MODEL_REGISTRY_PATH") or DEFAULT_MODEL_REGISTRY_PATH)
+    parser.add_argument("--horizons", type=int, nargs="+", default=DEFAULT_HORIZONS)
+    parser.add_argument("--step-days", type=int, default=DEFAULT_STEP_DAYS)
+    parser.add_argument("--holdout", type=float, default=DEFAULT_HOLDOUT)
+    parser.add_argument("--as-of", type=datetime.fromisoformat, default=None,
+                        help="End of the observed history (default: now)")
+    parser.add_argument("--gbm-baseline", action="store_true",
+                        help="Report a gradient-boosted baseline's holdout scores too")
+    parser.add_argument("--activate", action="store_true",
+                        help="Make it the served model - running workers follow on their next scheduler pass")
+    args = parser.parse_args()
+    horizons = sorted(args.horizons)
+    
+    # DATABASE_URL picks the store, as for the API
+    store = create_twin_store()
+    started = time.perf_counter()
+    loans = store.get_all_loans()
+    checks = flatten_checks(loans, store.get_covenant_checks)
+    print(f"Loaded {len(loans)} loans, {len(checks[0])} checks in {time.perf_counter() - started:.1f}s")
+    
+    started = time.perf_counter()
+    features, labels, reference_us = build_examples(loans, checks, horizons, args.step_days, args.as_of)
+    print(f"Built {len(labels)} examples x {len(horizons)} horizons in {time.perf_counter() - started:.1f}s")
+    
+    started = time.perf_counter()
+    weights, bias, scaler, metrics = train_models(
+        features, labels, reference_us, horizons, args.holdout, gbm_baseline=args.gbm_baseline
+    )
+    print(f"Trained in {time.perf_counter() - started:.1f}s")
+    for horizon_days, horizon_metrics in metrics.items():
+        print(f"  {horizon_days:>4} days: {horizon_metrics}")
+    
+    registry = ModelRegistry(args.registry)
+    registry.save(
+        args.version,
+        weights,
+        bias,
+        FEATURE_ORDER,
+        scaler=scaler,
+        horizons=horizons,
+        metadata={
+            "noise": "off",
+            "metrics": metrics,
+            "training": {
+                "loans": len(loans),
+                "checks": int(len(checks[0])),
+                "examples": int(len(labels)),
+                "step_days": args.step_days,
+                "holdout": args.holdout,
+                "as_of": (args.as_of or datetime.now()).isoformat()
+            }
+        }
+    )
+    if args.activate:
+        registry.set_active(args.version)
+    print(f"Saved {args.version} to {args.registry}{' (active)' if args.activate else ''}")
+
+
+if __name__ == "__main__":
+    main()
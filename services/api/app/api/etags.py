@@ -0,0 +1,42 @@
+"""
+Conditional GET helpers - strong ETags from store versions, 304 before any work is done
+"""
+import hashlib
+from typing import Optional
+from fastapi import Request, Response
+
+# Clients may keep responses but must revalidate - browsers then send If-None-Match on their own
+CACHE_CONTROL = "no-cache"
+
+
+def make_etag(kind: str, version_tag: str, request: Optional[Request] = None) -> str:
+    """
+    Strong ETag for a versioned resource
+    Pass the request when the response also depends on query parameters (filters, pages)
+    """
+    tag = f"{kind}-{version_tag}"
+    if request is not None and request.url.query:
+        tag += "-" + hashlib.sha1(request.url.query.encode()).hexdigest()[:12]
+    return f'"{tag}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """If-None-Match uses weak comparison - W/ prefixes are ignored"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in header.split(","))
+
+
+def conditional_response(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """
+    304 response if the client's copy is current - otherwise None, with the ETag set on
+    the response the route is about to build
+    """
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return None
@@ -2,17 +2,20 @@
 Audit API Routes
 Handles audit log retrieval
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from typing import Optional
 from datetime import datetime
 from app.services.service_instances import audit_service
 from app.services.audit_service import AuditEventType
+from app.api.etags import make_etag, conditional_response
 
 router = APIRouter()
 
 
 @router.get("/audit", response_model=list)
 async def get_audit_logs(
+    request: Request,
+    response: Response,
     loan_id: Optional[str] = None,
     event_type: Optional[str] = None,
     start_date: Optional[str] = None,
@@ -28,8 +31,14 @@ async def get_audit_logs(
         end_date: Filter by end date (ISO format)
     
     Returns:
-        List of audit log entries
+        List of audit log entries (ETag changes whenever an entry is appended)
     """
+    not_modified = conditional_response(
+        request, response, make_etag("audit", audit_service.version_tag(), request)
+    )
+    if not_modified:
+        return not_modified
+    
     # Parse dates
     start = None
     end = None
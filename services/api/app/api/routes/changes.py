@@ -0,0 +1,86 @@
+"""
+Change feed API routes
+Follow twin and audit mutations with a since=<version> cursor - long-poll JSON, or SSE
+when the client sends Accept: text/event-stream
+"""
+import json
+from typing import Optional, Tuple
+from fastapi import APIRouter, Header, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from app.services.service_instances import change_feed
+from app.services.change_feed import format_sse
+
+router = APIRouter()
+
+# SSE connections send a comment line this often so proxies don't drop them
+HEARTBEAT_SECONDS = 15.0
+
+
+def _parse_event_id(last_event_id: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """SSE ids are '<epoch>:<cursor>' so a reconnect carries both halves of the cursor"""
+    if not last_event_id:
+        return None, None
+    epoch, _, cursor = last_event_id.rpartition(":")
+    return cursor or None, epoch or None
+
+
+@router.get("/changes")
+async def get_changes(
+    request: Request,
+    since: Optional[str] = None,
+    epoch: Optional[str] = None,
+    timeout: float = Query(25.0, ge=0, le=60),
+    accept: Optional[str] = Header(None),
+    last_event_id: Optional[str] = Header(None)
+):
+    """
+    Get changes after a cursor
+    
+    Args:
+        since: Feed version the client has seen - opaque, as returned (omit to start from now)
+        epoch: Epoch returned with that version - a different epoch means the server restarted
+        timeout: Long-poll wait in seconds when there is nothing new yet
+    
+    Returns:
+        {epoch, version, events, resync_required} - on resync_required, reload the
+        resources you track and continue from version. With Accept: text/event-stream,
+        a stream of "change" events (id <epoch>:<cursor>) and "resync" events instead
+    """
+    if accept and "text/event-stream" in accept:
+        if last_event_id:
+            since, epoch = _parse_event_id(last_event_id)
+        return StreamingResponse(
+            _stream(request, since, epoch),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    
+    if since is None:
+        # Handshake - the cursor to start from, nothing to replay
+        return await run_in_threadpool(lambda: change_feed.read(change_feed.head()))
+    return await change_feed.wait(since, epoch, timeout=timeout)
+
+
+async def _stream(request: Request, since: Optional[int], epoch: Optional[str]):
+    if since is None:
+        since, epoch = await run_in_threadpool(change_feed.head), change_feed.epoch
+    while not await request.is_disconnected():
+        result = await change_feed.wait(since, epoch, timeout=HEARTBEAT_SECONDS)
+        if result["resync_required"]:
+            yield format_sse(
+                "resync",
+                json.dumps({"epoch": result["epoch"], "version": result["version"]}),
+                f"{result['epoch']}:{result['version']}"
+            )
+        elif not result["events"]:
+            yield ": keepalive\n\n"
+        for event in result["events"]:
+            yield format_sse("change", json.dumps(event), f"{result['epoch']}:{event['seq']}")
+        since, epoch = result["version"], result["epoch"]
+
+
+@router.get("/changes/stats", response_model=dict)
+async def get_change_feed_stats():
+    """Current feed version and ring buffer occupancy"""
+    return change_feed.stats()
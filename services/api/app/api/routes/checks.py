@@ -0,0 +1,33 @@
+"""
+Check ingestion API routes
+Bulk covenant observations and ESG statuses - the per-check endpoints live under loans/esg
+"""
+from fastapi import APIRouter, Query, Request
+from app.services.service_instances import twin_service, audit_service
+from app.services.check_ingestion_service import CheckIngestionService, DEFAULT_BATCH_SIZE
+
+router = APIRouter()
+
+
+@router.post("/checks/bulk", response_model=dict)
+async def bulk_ingest_checks(
+    request: Request,
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=50000),
+    user_id: str = "analyst"  # TODO: Get from JWT/auth token
+):
+    """
+    Record many covenant checks and ESG compliance checks from a streamed NDJSON body
+    
+    One record per line - covenant observations carry covenant_id + actual_value,
+    ESG statuses carry clause_id + status. Breach/at-risk status is evaluated exactly
+    as POST /loans/{loan_id}/covenant-check does.
+    
+    Args:
+        batch_size: Records evaluated and stored per write
+        user_id: User submitting the checks
+    
+    Returns:
+        Counts by outcome and per-row errors
+    """
+    ingestion = CheckIngestionService(twin_service, audit_service, batch_size=batch_size)
+    return await ingestion.ingest_stream(request.stream(), user_id)
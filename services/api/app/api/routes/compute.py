@@ -0,0 +1,20 @@
+"""
+Compute executor API routes
+Queue depth, rejections and latency of the prediction/scoring pools
+"""
+from fastapi import APIRouter
+from app.services.service_instances import compute_executor
+
+router = APIRouter()
+
+
+@router.get("/compute/stats", response_model=dict)
+async def get_compute_stats():
+    """
+    Get compute queue metrics
+    
+    Returns:
+        Per queue (threads, processes): workers, queue size, pending, completed, failed,
+        rejected (503s) and p50/p95/max wait and run times over recent calls
+    """
+    return compute_executor.stats()
@@ -2,40 +2,42 @@
 ESG API Routes
 Handles ESG scoring and compliance tracking
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
+from starlette.concurrency import run_in_threadpool
 from typing import Optional
 from datetime import datetime
-from app.models import ESGStatus
-from app.services.service_instances import twin_service, audit_service
-from app.services.esg_service import ESGService
+from app.models import ESGStatus, ESGScore
+from app.services.service_instances import twin_service, audit_service, esg_service, compute_executor
 from app.services.audit_service import AuditEventType
+from app.api.etags import make_etag, conditional_response
 
 router = APIRouter()
 
-# Initialize services
-esg_service = ESGService()
+# Horizon the background scheduler scores (ESGService.predict_esg_breach_risk default)
+SCHEDULED_ESG_HORIZON = 90
 
 
 @router.get("/esg/{loan_id}/score", response_model=dict)
-async def get_esg_score(loan_id: str):
+async def get_esg_score(loan_id: str, request: Request, response: Response):
     """
     Get ESG score for a loan
     
     Returns:
-        ESG score breakdown by category
+        ESG score breakdown by category. Unchanged loans answer If-None-Match with 304 -
+        no rescoring and no audit entry.
     """
-    loan = twin_service.get_digital_twin(loan_id)
-    if not loan:
-        raise HTTPException(status_code=404, detail="Loan not found")
-    
-    # Get compliance records
-    compliance_records = twin_service.get_esg_compliance(loan_id)
+    version_tag = twin_service.loan_version_tag(loan_id)
+    if version_tag:
+        not_modified = conditional_response(request, response, make_etag("esg-score", version_tag))
+        if not_modified:
+            return not_modified
     
-    # Calculate score
-    score = esg_service.calculate_esg_score(loan, compliance_records)
+    # Calculate score - on the compute pool, 503 if it is saturated
+    score = await compute_executor.run(_calculate_score, loan_id)
     
     # Log audit event
-    audit_service.log_event(
+    await run_in_threadpool(
+        audit_service.log_event,
         event_type=AuditEventType.ESG_SCORE_CALCULATED,
         loan_id=loan_id,
         user_id="system",
@@ -46,6 +48,17 @@ async def get_esg_score(loan_id: str):
     return score.dict()
 
 
+def _calculate_score(loan_id: str) -> ESGScore:
+    loan = twin_service.get_digital_twin(loan_id)
+    if not loan:
+        raise HTTPException(status_code=404, detail="Loan not found")
+    
+    # Get compliance records
+    compliance_records = twin_service.get_esg_compliance(loan_id)
+    
+    return esg_service.calculate_esg_score(loan, compliance_records)
+
+
 @router.get("/esg/{loan_id}/compliance", response_model=dict)
 async def get_esg_compliance_summary(loan_id: str):
     """
@@ -54,6 +67,10 @@ async def get_esg_compliance_summary(loan_id: str):
     Returns:
         Compliance status by category
     """
+    return await compute_executor.run(_compliance_summary, loan_id)
+
+
+def _compliance_summary(loan_id: str) -> dict:
     loan = twin_service.get_digital_twin(loan_id)
     if not loan:
         raise HTTPException(status_code=404, detail="Loan not found")
@@ -82,6 +99,16 @@ async def get_esg_breach_risk(
     Returns:
         ESG breach risk prediction
     """
+    # The scheduler keeps the default horizon pre-scored - serve that unless the loan changed since
+    if horizon_days == SCHEDULED_ESG_HORIZON:
+        scores = twin_service.get_fresh_scores(loan_id)
+        if scores is not None:
+            return scores["esg_breach_risk"]
+    
+    return await compute_executor.run(_predict_breach_risk, loan_id, horizon_days)
+
+
+def _predict_breach_risk(loan_id: str, horizon_days: int) -> dict:
     loan = twin_service.get_digital_twin(loan_id)
     if not loan:
         raise HTTPException(status_code=404, detail="Loan not found")
@@ -149,7 +176,8 @@ async def record_esg_compliance_check(
     
     # Log audit event
     event_type = AuditEventType.ESG_NON_COMPLIANCE if status == "non_compliant" else AuditEventType.ESG_SCORE_CALCULATED
-    audit_service.log_event(
+    await run_in_threadpool(
+        audit_service.log_event,
         event_type=event_type,
         loan_id=loan_id,
         user_id=user_id,
@@ -1,16 +1,22 @@
 """
 Loan API routes - document upload, CRUD operations
 """
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Request, Response
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
 from datetime import datetime
 import tempfile
+import base64
 import os
 
 from app.models import Loan, LoanDocument
 from app.services.ingestion_service import IngestionService
+from app.services.bulk_import_service import BulkImportService, BulkImportError, DEFAULT_BATCH_SIZE
 from app.services.service_instances import twin_service, audit_service
+from app.services.digital_twin_service import summarize_health
+from app.services.covenant_evaluation import evaluate_covenant, covenant_status
 from app.services.audit_service import AuditEventType
+from app.api.etags import make_etag, conditional_response
 
 # Optional blockchain integration - check environment variable first
 BLOCKCHAIN_ENABLED = os.getenv("BLOCKCHAIN_ENABLED", "false").lower() == "true"
@@ -30,6 +36,9 @@ if BLOCKCHAIN_ENABLED:
 
 router = APIRouter()
 
+# Upper bound for one page of GET /loans
+MAX_PAGE_SIZE = 1000
+
 # Service instances - in prod would use dependency injection
 ingestion_service = IngestionService()
 
@@ -157,16 +166,133 @@ async def upload_loan_document(
             os.unlink(tmp_path)
 
 
+@router.post("/loans/bulk", response_model=dict)
+async def bulk_import_loans(
+    request: Request,
+    format: Optional[str] = None,
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=5000),
+    user_id: str = "analyst"  # TODO: Get from JWT/auth token
+):
+    """
+    Import many loans from a streamed NDJSON or CSV body
+    
+    NDJSON: one loan object per line. CSV: header row, then one loan per row with
+    covenants/esg_clauses/metadata as JSON cells. Unknown fields/columns go into metadata;
+    covenant and ESG clause ids are generated when missing.
+    
+    Args:
+        format: ndjson or csv (default: from Content-Type, text/csv -> csv, otherwise ndjson)
+        batch_size: Loans stored (and audited) per write
+        user_id: User running the import
+    
+    Returns:
+        Row counts and per-row validation errors
+    """
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "csv" if "csv" in content_type else "ndjson"
+    
+    importer = BulkImportService(twin_service, audit_service, batch_size=batch_size)
+    try:
+        return await importer.import_stream(request.stream(), format.lower(), user_id)
+    except BulkImportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.get("/loans", response_model=List[dict])
-async def get_all_loans():
-    """Get all loan digital twins"""
-    loans = twin_service.get_all_twins()
-    return [loan.dict() for loan in loans]
+async def get_all_loans(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    industry: Optional[str] = None,
+    maturity_from: Optional[str] = None,
+    maturity_to: Optional[str] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    fields: Optional[str] = None
+):
+    """
+    Get loan digital twins - optionally paginated, filtered and projected
+    
+    Args:
+        limit: Page size; omit to get every matching loan in one response
+        cursor: Opaque cursor from the previous page's X-Next-Cursor header
+        status: Filter by loan status
+        industry: Filter by metadata.industry
+        maturity_from: Earliest maturity date (ISO format)
+        maturity_to: Latest maturity date (ISO format)
+        min_amount: Minimum loan amount
+        max_amount: Maximum loan amount
+        fields: Comma-separated loan fields to return, e.g. id,borrower_name,loan_amount
+    
+    Returns:
+        List of loans. When more pages exist, X-Next-Cursor carries the cursor for the next one.
+        ETag changes with any portfolio mutation - If-None-Match gets a 304 without listing anything.
+    """
+    # Version before data - a write in between can only make the tag older than the body, never newer
+    not_modified = conditional_response(
+        request, response, make_etag("loans", twin_service.portfolio_version_tag(), request)
+    )
+    if not_modified:
+        return not_modified
+    
+    after_seq = _decode_cursor(cursor) if cursor else 0
+    
+    # Parse dates
+    maturity_start = None
+    maturity_end = None
+    
+    if maturity_from:
+        try:
+            maturity_start = _parse_naive(maturity_from)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid maturity_from format. Use ISO format.")
+    
+    if maturity_to:
+        try:
+            maturity_end = _parse_naive(maturity_to)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid maturity_to format. Use ISO format.")
+    
+    # Projection - only serialize what the caller asked for (skips nested covenants for list views)
+    include = None
+    if fields:
+        include = {f.strip() for f in fields.split(",") if f.strip()}
+        unknown = include - set(Loan.model_fields)
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields: {sorted(unknown)}. Must be among: {list(Loan.model_fields)}"
+            )
+    
+    loans, next_seq = twin_service.list_twins(
+        after_seq=after_seq,
+        limit=limit,
+        status=status,
+        industry=industry,
+        maturity_from=maturity_start,
+        maturity_to=maturity_end,
+        min_amount=min_amount,
+        max_amount=max_amount
+    )
+    
+    if next_seq is not None:
+        response.headers["X-Next-Cursor"] = _encode_cursor(next_seq)
+    
+    return [loan.model_dump(include=include) for loan in loans]
 
 
 @router.get("/loans/{loan_id}", response_model=dict)
-async def get_loan(loan_id: str):
+async def get_loan(loan_id: str, request: Request, response: Response):
     """Get a specific loan digital twin"""
+    version_tag = twin_service.loan_version_tag(loan_id)
+    if version_tag:
+        not_modified = conditional_response(request, response, make_etag("loan", version_tag))
+        if not_modified:
+            return not_modified
+    
     loan = twin_service.get_digital_twin(loan_id)
     if not loan:
         raise HTTPException(status_code=404, detail="Loan not found")
@@ -174,42 +300,24 @@ async def get_loan(loan_id: str):
 
 
 @router.get("/loans/{loan_id}/state", response_model=dict)
-async def get_loan_state(loan_id: str):
+async def get_loan_state(loan_id: str, request: Request, response: Response):
     """Get complete digital twin state including health metrics"""
-    state = twin_service.get_twin_state(loan_id)
+    # Checks and compliance records bump the loan version too, so the tag covers the health metrics
+    version_tag = twin_service.loan_version_tag(loan_id)
+    if version_tag:
+        not_modified = conditional_response(request, response, make_etag("state", version_tag))
+        if not_modified:
+            return not_modified
+    
+    # Check histories aren't part of the response - don't load or serialize them
+    state = twin_service.get_twin_state(loan_id, sections=("loan", "health_metrics"))
     if not state:
         raise HTTPException(status_code=404, detail="Loan not found")
     
     # Transform to match frontend expectations
-    health_metrics = state.get("health_metrics", {})
-    total_covenants = health_metrics.get("total_covenants", 0)
-    breached_covenants = health_metrics.get("breached_covenants", 0)
-    at_risk_covenants = health_metrics.get("at_risk_covenants", 0)
-    compliant_covenants = total_covenants - breached_covenants - at_risk_covenants
-    
-    total_esg = health_metrics.get("total_esg_clauses", 0)
-    non_compliant_esg = health_metrics.get("non_compliant_esg", 0)
-    at_risk_esg = 0  # Not tracked separately in backend yet
-    compliant_esg = total_esg - non_compliant_esg - at_risk_esg
-    
-    # Calculate health score (0-100)
-    compliance_rate = health_metrics.get("compliance_rate", 1.0)
-    esg_compliance_rate = health_metrics.get("esg_compliance_rate", 1.0)
-    health_score = int((compliance_rate * 0.7 + esg_compliance_rate * 0.3) * 100)
-    
     return {
         "loan": state.get("loan", {}),
-        "health_score": health_score,
-        "covenant_status": {
-            "compliant": max(0, compliant_covenants),
-            "at_risk": at_risk_covenants,
-            "breached": breached_covenants
-        },
-        "esg_status": {
-            "compliant": max(0, compliant_esg),
-            "at_risk": at_risk_esg,
-            "non_compliant": non_compliant_esg
-        },
+        **summarize_health(state.get("health_metrics", {})),
         "last_updated": state.get("last_updated", "")
     }
 
@@ -241,17 +349,9 @@ async def record_covenant_check(
     if not covenant:
         raise HTTPException(status_code=404, detail="Covenant not found")
     
-    # Evaluate covenant breach
-    is_breached = _evaluate_covenant(covenant, actual_value)
-    
-    # Determine status - "at_risk" if close to threshold
-    threshold_pct_diff = abs(actual_value - covenant.threshold) / covenant.threshold if covenant.threshold != 0 else float('inf')
-    if is_breached:
-        status = "breached"
-    elif threshold_pct_diff < 0.1:  # Within 10% of threshold
-        status = "at_risk"
-    else:
-        status = "compliant"
+    # Evaluate covenant breach - "at_risk" if within 10% of threshold
+    is_breached = evaluate_covenant(covenant, actual_value)
+    status = covenant_status(is_breached, actual_value, covenant.threshold)
     
     # Record check
     check = twin_service.add_covenant_check(
@@ -267,7 +367,8 @@ async def record_covenant_check(
     
     # Log audit event
     event_type = AuditEventType.COVENANT_BREACHED if is_breached else AuditEventType.COVENANT_CHECKED
-    audit_service.log_event(
+    await run_in_threadpool(
+        audit_service.log_event,
         event_type=event_type,
         loan_id=loan_id,
         user_id=user_id,
@@ -283,24 +384,25 @@ async def record_covenant_check(
     return check.dict()
 
 
-def _evaluate_covenant(covenant, actual_value: float) -> bool:
-    """Check if covenant is breached based on operator and threshold"""
-    threshold = covenant.threshold
-    operator = covenant.operator
-    
-    # Handle different comparison operators
-    if operator == ">":
-        return actual_value <= threshold
-    elif operator == "<":
-        return actual_value >= threshold
-    elif operator == ">=":
-        return actual_value < threshold
-    elif operator == "<=":
-        return actual_value > threshold
-    elif operator == "==":
-        # Use small epsilon for float comparison
-        return abs(actual_value - threshold) > 0.01
-    else:
-        # Unknown operator - default to not breached (conservative)
-        return False
+def _parse_naive(value: str) -> datetime:
+    """ISO date to compare against stored (naive) dates - offsets are converted to naive UTC"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = (parsed - parsed.utcoffset()).replace(tzinfo=None)
+    return parsed
+
+
+def _encode_cursor(seq: int) -> str:
+    """Opaque pagination cursor - clients just hand it back"""
+    return base64.urlsafe_b64encode(f"loan:{seq}".encode()).decode().rstrip("=")
 
+
+def _decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        prefix, seq = base64.urlsafe_b64decode(padded.encode()).decode().split(":")
+        if prefix != "loan":
+            raise ValueError(prefix)
+        return int(seq)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
@@ -0,0 +1,62 @@
+"""
+Model registry API routes
+List trained model versions and hot-swap the one being served - no restart needed
+"""
+import hmac
+import os
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException
+from starlette.concurrency import run_in_threadpool
+from app.services.service_instances import prediction_service
+
+router = APIRouter()
+
+
+def _require_admin(token: Optional[str]) -> None:
+    # Closed unless a token is configured - swapping the served model is never open to anyone
+    expected = os.getenv("ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=403, detail="Model activation is disabled - ADMIN_TOKEN is not set")
+    if not token or not hmac.compare_digest(token.encode(), expected.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@router.get("/models", response_model=dict)
+async def list_models():
+    """
+    List registry model versions
+    
+    Returns:
+        Manifests (feature order, bias, metrics) with the version this worker serves
+    """
+    return {
+        "serving": prediction_service.risk_model.version,
+        "model_version": prediction_service.model_version,
+        "active": prediction_service.registry.active_version() if prediction_service.registry else None,
+        "models": await run_in_threadpool(prediction_service.list_models)
+    }
+
+
+@router.post("/models/{version}/activate", response_model=dict)
+async def activate_model(version: str, x_admin_token: Optional[str] = Header(None)):
+    """
+    Make a registry version the served model
+    
+    In-flight requests finish on the previous model; other worker processes follow
+    on their next scheduler pass
+    
+    Args:
+        version: Registry version to serve
+        x_admin_token: Must match ADMIN_TOKEN - activation is refused while it is unset
+    
+    Returns:
+        The activated version's manifest
+    """
+    _require_admin(x_admin_token)
+    try:
+        manifest = await run_in_threadpool(prediction_service.activate_model, version)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Model version {version} not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"activated": version, "model_version": prediction_service.model_version, "manifest": manifest}
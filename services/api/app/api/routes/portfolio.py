@@ -0,0 +1,88 @@
+"""
+Portfolio API routes
+Portfolio-wide views so the dashboard doesn't fan out one request per loan
+"""
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Query
+from app.services.service_instances import twin_service
+
+router = APIRouter()
+
+
+@router.get("/portfolio/summary", response_model=dict)
+async def get_portfolio_summary():
+    """
+    Get health score, covenant status and ESG status for every loan
+    
+    Same calculation as /loans/{loan_id}/state, read from the per-loan
+    health rows that are updated as checks arrive
+    
+    Returns:
+        Per-loan health summaries plus portfolio totals
+    """
+    loans = twin_service.get_portfolio_summary()
+    
+    average_health = (
+        sum(loan["health_score"] for loan in loans) / len(loans) if loans else 100.0
+    )
+    
+    return {
+        "loans": loans,
+        "total_loans": len(loans),
+        "average_health_score": round(average_health, 1),
+        "generated_at": datetime.now().isoformat()
+    }
+
+
+@router.get("/portfolio/stats", response_model=dict)
+async def get_portfolio_stats(status: Optional[str] = None):
+    """
+    Get portfolio aggregates - exposure, weighted rate, maturity buckets, clause counts
+    
+    Args:
+        status: Only include loans with this status (default: all loans)
+    
+    Returns:
+        Portfolio statistics computed over the columnar loan store
+    """
+    return {
+        **twin_service.get_portfolio_stats(status=status),
+        "generated_at": datetime.now().isoformat()
+    }
+
+
+@router.get("/portfolio/maturing", response_model=dict)
+async def get_maturing_loans(
+    within_days: int = Query(180, ge=0),
+    status: Optional[str] = "active"
+):
+    """
+    Get loans maturing within the next N days, soonest first
+    
+    Args:
+        within_days: Look-ahead window in days (default: 180, the risk model's maturity threshold)
+        status: Only loans with this status (default: active)
+    
+    Returns:
+        Maturing loans with days to maturity
+    """
+    now = datetime.now()
+    loans = twin_service.get_loans_maturing_within(within_days, status=status)
+    
+    return {
+        "within_days": within_days,
+        "total_loans": len(loans),
+        "total_exposure": sum(loan.loan_amount for loan in loans),
+        "loans": [
+            {
+                "loan_id": loan.id,
+                "borrower_name": loan.borrower_name,
+                "loan_amount": loan.loan_amount,
+                "maturity_date": loan.maturity_date.isoformat(),
+                "days_to_maturity": (loan.maturity_date - now).days,
+                "status": loan.status
+            }
+            for loan in loans
+        ]
+    }
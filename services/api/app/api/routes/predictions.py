@@ -2,23 +2,183 @@
 Risk Prediction API Routes
 Handles AI-based risk predictions
 """
-from fastapi import APIRouter, HTTPException
-from typing import List, Optional
+import base64
+import json
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+from typing import List, Literal, Optional, Union
 from app.models import Loan
-from app.services.service_instances import twin_service, audit_service
-from app.services.prediction_service import PredictionService
+from app.services.service_instances import twin_service, audit_service, prediction_service, compute_executor
 from app.services.audit_service import AuditEventType
+from app.services.compute_executor import ComputeQueue
+from app.ai.risk_model import RISK_LEVELS
+from app.services.prediction_service import (
+    DEFAULT_HORIZONS, DEFAULT_CURVE_DAYS, score_feature_blocks, risk_curves, first_crossing_days
+)
 
 router = APIRouter()
 
-# Initialize services
-prediction_service = PredictionService()
+# Horizons the background scheduler scores (PredictionService.predict_risk defaults)
+SCHEDULED_HORIZONS = "30,60,90"
+# Longest risk curve - five years of daily horizons
+MAX_CURVE_DAYS = 1825
+
+
+class BatchPredictionRequest(BaseModel):
+    """Body of POST /predictions/batch"""
+    loan_ids: Union[Literal["all"], List[str]] = "all"
+    horizons: List[int] = Field(default_factory=lambda: list(DEFAULT_HORIZONS), min_length=1)
+    # Loans scored (and streamed back) per matrix pass
+    chunk_size: int = Field(1000, ge=1, le=50000)
+
+
+class CurveBatchRequest(BaseModel):
+    """Body of POST /predictions/curves"""
+    loan_ids: Union[Literal["all"], List[str]] = "all"
+    days: int = Field(DEFAULT_CURVE_DAYS, ge=1, le=MAX_CURVE_DAYS)
+
+
+@router.post("/predictions/batch")
+async def batch_risk_predictions(request: BatchPredictionRequest, user_id: str = "system"):
+    """
+    Score many loans (or the whole portfolio) in matrix passes
+    
+    Streams NDJSON - one line per loan as each chunk finishes, in request order.
+    Unknown ids get {"loan_id", "error"} lines instead of failing the batch.
+    Chunks of COMPUTE_PROCESS_BATCH_MIN loans or more are scored in the process pool.
+    
+    Args:
+        request: loan_ids (list or "all"), horizons, chunk_size
+        user_id: User requesting the predictions
+    """
+    if request.loan_ids == "all":
+        loan_ids = await run_in_threadpool(twin_service.get_all_twin_ids)
+    else:
+        loan_ids = list(dict.fromkeys(request.loan_ids))
+    
+    # Admission is decided before the 200 goes out - once streaming, chunks wait for a slot
+    queue = compute_executor.queue_for(min(len(loan_ids), request.chunk_size))
+    queue.check()
+    
+    async def stream():
+        for start in range(0, len(loan_ids), request.chunk_size):
+            chunk = loan_ids[start:start + request.chunk_size]
+            results = await _score_chunk(chunk, request.horizons, queue)
+            by_id = {result["loan_id"]: result for result in results}
+            yield "".join(
+                json.dumps(by_id.get(loan_id) or {"loan_id": loan_id, "error": "Loan not found"}) + "\n"
+                for loan_id in chunk
+            )
+            # Audit after the chunk is on its way - the client doesn't wait on it
+            if results:
+                await run_in_threadpool(_log_batch_predictions, results, request.horizons, user_id)
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+async def _score_chunk(loan_ids: List[str], horizons: List[int], queue: ComputeQueue) -> List[dict]:
+    if queue is compute_executor.threads:
+        return await queue.run(_score_chunk_in_thread, loan_ids, horizons, wait=True)
+    # Process pool: loans and blocks come from this process's stores, only the matrix work moves
+    loans, blocks = await compute_executor.run(_load_chunk, loan_ids, wait=True)
+    model = prediction_service.risk_model
+    scaler = prediction_service.scaler_for(model)
+    probabilities = await queue.run(score_feature_blocks, blocks, horizons, model, scaler, wait=True)
+    return await compute_executor.run(
+        prediction_service.batch_results, loans, horizons, probabilities, model, scaler, wait=True
+    )
+
+
+def _load_chunk(loan_ids: List[str]) -> tuple:
+    # Versions first - loans whose feature block is stored for theirs skip loading check history
+    versions = {loan_id: twin_service.loan_version_tag(loan_id) for loan_id in loan_ids}
+    loans = [loan for loan in map(twin_service.get_digital_twin, loan_ids) if loan is not None]
+    return loans, prediction_service.feature_blocks(loans, twin_service.get_covenant_checks, versions)
+
+
+def _score_chunk_in_thread(loan_ids: List[str], horizons: List[int]) -> List[dict]:
+    versions = {loan_id: twin_service.loan_version_tag(loan_id) for loan_id in loan_ids}
+    loans = [loan for loan in map(twin_service.get_digital_twin, loan_ids) if loan is not None]
+    return prediction_service.predict_risk_batch(
+        loans,
+        twin_service.get_covenant_checks,
+        horizons,
+        versions=versions
+    )
+
+
+def _log_batch_predictions(results: List[dict], horizons: List[int], user_id: str) -> None:
+    audit_service.log_events(
+        AuditEventType.PREDICTION_GENERATED,
+        [
+            {
+                "loan_id": result["loan_id"],
+                "description": f"Batch risk prediction generated for horizons: {','.join(map(str, horizons))}",
+                "metadata": {"horizons": horizons, "overall_risk": result["overall_risk"]["level"]}
+            }
+            for result in results
+        ],
+        user_id=user_id
+    )
+
+
+@router.post("/predictions/curves", response_model=dict)
+async def portfolio_risk_curves(request: CurveBatchRequest):
+    """
+    Risk curves (horizons 1..days) for many loans (or the whole portfolio)
+    
+    Returns:
+        loan_ids in row order, the curves as one base64 little-endian float32 array of
+        shape (loans, days), first day each loan reaches medium / high / critical (null
+        if it never does) and the ids that weren't found
+    """
+    if request.loan_ids == "all":
+        loan_ids = await run_in_threadpool(twin_service.get_all_twin_ids)
+    else:
+        loan_ids = list(dict.fromkeys(request.loan_ids))
+    
+    queue = compute_executor.queue_for(len(loan_ids))
+    queue.check()
+    loans, blocks = await compute_executor.run(_load_chunk, loan_ids, wait=True)
+    model = prediction_service.risk_model
+    scaler = prediction_service.scaler_for(model)
+    curves = await queue.run(risk_curves, blocks, request.days, model, scaler, wait=True)
+    crossings = first_crossing_days(curves)
+    found = {loan.id for loan in loans}
+    return {
+        "loan_ids": [loan.id for loan in loans],
+        "days": request.days,
+        "dtype": "<f4",
+        "shape": list(curves.shape),
+        "probabilities": base64.b64encode(curves.astype("<f4").tobytes()).decode("ascii"),
+        "threshold_crossings": {
+            str(level): [int(day) or None for day in crossings[:, j]]
+            for j, level in enumerate(RISK_LEVELS[1:])
+        },
+        "missing": [loan_id for loan_id in loan_ids if loan_id not in found],
+        "model_version": prediction_service.model_version_for(model, scaler),
+        "generated_at": datetime.now().isoformat()
+    }
+
+
+@router.get("/predictions/cache/stats", response_model=dict)
+async def get_prediction_cache_stats():
+    """Prediction cache and feature store size, hit rate and eviction counters, with the current model version"""
+    return {
+        **prediction_service.cache.stats(),
+        "model_version": prediction_service.model_version,
+        "noise": prediction_service.risk_model.noise,
+        "feature_store": prediction_service.feature_store.stats()
+    }
 
 
 @router.get("/predictions/{loan_id}", response_model=dict)
 async def get_risk_predictions(
     loan_id: str,
-    horizons: Optional[str] = "30,60,90"
+    horizons: Optional[str] = SCHEDULED_HORIZONS
 ):
     """
     Get AI risk predictions for a loan
@@ -30,28 +190,26 @@ async def get_risk_predictions(
     Returns:
         Risk predictions for multiple time horizons
     """
-    loan = twin_service.get_digital_twin(loan_id)
-    if not loan:
-        raise HTTPException(status_code=404, detail="Loan not found")
-    
     # Parse horizons
     try:
         horizon_list = [int(h.strip()) for h in horizons.split(",")]
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid horizons format. Use comma-separated integers.")
     
-    # Get covenant checks
-    covenant_checks = twin_service.get_covenant_checks(loan_id)
+    # The scheduler keeps the default horizons pre-scored - serve those unless the loan changed since
+    predictions = None
+    if horizons == SCHEDULED_HORIZONS:
+        scores = twin_service.get_fresh_scores(loan_id)
+        if scores is not None and prediction_service.is_serving(scores["risk"].get("model_version")):
+            predictions = scores["risk"]
     
-    # Generate predictions
-    predictions = prediction_service.predict_risk(
-        loan=loan,
-        covenant_checks=covenant_checks,
-        prediction_horizons=horizon_list
-    )
+    # Generate predictions - on the compute pool, 503 if it is saturated
+    if predictions is None:
+        predictions = await compute_executor.run(_predict_loan, loan_id, horizon_list)
     
     # Log audit event
-    audit_service.log_event(
+    await run_in_threadpool(
+        audit_service.log_event,
         event_type=AuditEventType.PREDICTION_GENERATED,
         loan_id=loan_id,
         user_id="system",
@@ -65,6 +223,56 @@ async def get_risk_predictions(
     return predictions
 
 
+def _predict_loan(loan_id: str, horizon_list: List[int]) -> dict:
+    # Version before the inputs - a write in between can only make the cached result unreachable
+    version = twin_service.loan_version_tag(loan_id)
+    loan = twin_service.get_digital_twin(loan_id)
+    if not loan:
+        raise HTTPException(status_code=404, detail="Loan not found")
+    
+    # Get covenant checks
+    covenant_checks = twin_service.get_covenant_checks(loan_id)
+    
+    return prediction_service.predict_risk(
+        loan=loan,
+        covenant_checks=covenant_checks,
+        prediction_horizons=horizon_list,
+        version=version
+    )
+
+
+@router.get("/predictions/{loan_id}/curve", response_model=dict)
+async def get_risk_curve(
+    loan_id: str,
+    days: int = Query(DEFAULT_CURVE_DAYS, ge=1, le=MAX_CURVE_DAYS)
+):
+    """
+    Get the breach probability curve for a loan
+    
+    Args:
+        loan_id: Loan ID
+        days: Last horizon of the curve (default: 365)
+    
+    Returns:
+        Probability for every horizon from 1 to days, the first day it reaches each
+        risk level and the peak
+    """
+    return await compute_executor.run(_predict_curve, loan_id, days)
+
+
+def _predict_curve(loan_id: str, days: int) -> dict:
+    version = twin_service.loan_version_tag(loan_id)
+    loan = twin_service.get_digital_twin(loan_id)
+    if not loan:
+        raise HTTPException(status_code=404, detail="Loan not found")
+    return prediction_service.predict_risk_curve(
+        loan,
+        twin_service.get_covenant_checks(loan_id),
+        days=days,
+        version=version
+    )
+
+
 @router.get("/predictions/{loan_id}/covenant/{covenant_id}", response_model=dict)
 async def get_covenant_specific_prediction(
     loan_id: str,
@@ -82,20 +290,32 @@ async def get_covenant_specific_prediction(
     Returns:
         Risk prediction for the specific covenant
     """
+    return await compute_executor.run(_predict_covenant, loan_id, covenant_id, horizon_days)
+
+
+def _predict_covenant(loan_id: str, covenant_id: str, horizon_days: int) -> dict:
+    version = twin_service.loan_version_tag(loan_id)
     loan = twin_service.get_digital_twin(loan_id)
     if not loan:
         raise HTTPException(status_code=404, detail="Loan not found")
     
-    # Get covenant checks
+    # Get covenant checks - the last 3 for this covenant come straight from its series
     covenant_checks = twin_service.get_covenant_checks(loan_id)
+    recent_checks = twin_service.get_recent_covenant_checks(loan_id, covenant_id, 3)
     
     # Generate prediction
-    prediction = prediction_service.predict_covenant_specific_risk(
-        loan=loan,
-        covenant_id=covenant_id,
-        covenant_checks=covenant_checks,
-        horizon_days=horizon_days
-    )
+    try:
+        prediction = prediction_service.predict_covenant_specific_risk(
+            loan=loan,
+            covenant_id=covenant_id,
+            covenant_checks=covenant_checks,
+            horizon_days=horizon_days,
+            recent_checks=recent_checks,
+            historical_check_count=twin_service.count_covenant_checks(loan_id, covenant_id),
+            version=version
+        )
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Covenant not found")
     
     return prediction
 
@@ -115,6 +335,11 @@ async def get_prediction_explanation(
     Returns:
         Detailed explanation of the prediction
     """
+    return await compute_executor.run(_explain_prediction, loan_id, horizon_days)
+
+
+def _explain_prediction(loan_id: str, horizon_days: int) -> dict:
+    version = twin_service.loan_version_tag(loan_id)
     loan = twin_service.get_digital_twin(loan_id)
     if not loan:
         raise HTTPException(status_code=404, detail="Loan not found")
@@ -126,7 +351,8 @@ async def get_prediction_explanation(
     predictions = prediction_service.predict_risk(
         loan=loan,
         covenant_checks=covenant_checks,
-        prediction_horizons=[horizon_days]
+        prediction_horizons=[horizon_days],
+        version=version
     )
     
     # Return the explanation for the requested horizon
@@ -0,0 +1,114 @@
+"""
+Schedule API routes
+Upcoming covenant checks and ESG reports across the portfolio, plus rescheduling
+"""
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from starlette.concurrency import run_in_threadpool
+from app.services.service_instances import twin_service, audit_service
+from app.services.audit_service import AuditEventType
+from app.services.schedule_index import SCHEDULE_KINDS
+
+router = APIRouter()
+
+
+@router.get("/schedule/due", response_model=dict)
+async def get_due_items(
+    within_days: int = Query(7, ge=0),
+    limit: int = Query(100, ge=1, le=10000),
+    kind: Optional[str] = None,
+    status: Optional[str] = "active",
+    include_overdue: bool = True
+):
+    """
+    Get covenant checks and ESG reports due within the next N days, soonest first
+    
+    Args:
+        within_days: Look-ahead window in days (default: 7)
+        limit: Maximum items to return
+        kind: covenant_check or esg_report (default: both)
+        status: Only items on loans with this status (default: active)
+        include_overdue: Include items whose date has already passed
+    
+    Returns:
+        Due items with days until due
+    """
+    if kind is not None and kind not in SCHEDULE_KINDS:
+        raise HTTPException(status_code=400, detail=f"Invalid kind. Must be one of: {list(SCHEDULE_KINDS)}")
+    
+    items = twin_service.get_due_items(
+        within_days,
+        limit=limit,
+        kind=kind,
+        status=status,
+        include_overdue=include_overdue
+    )
+    return {
+        "within_days": within_days,
+        "total_items": len(items),
+        "items": [{**item, "due_date": item["due_date"].isoformat()} for item in items],
+        "generated_at": datetime.now().isoformat()
+    }
+
+
+@router.put("/loans/{loan_id}/covenants/{covenant_id}/next-check", response_model=dict)
+async def reschedule_covenant(
+    loan_id: str,
+    covenant_id: str,
+    next_check_date: datetime,
+    user_id: str = "analyst"
+):
+    """
+    Move a covenant's next check date
+    
+    Args:
+        loan_id: Loan ID
+        covenant_id: Covenant ID
+        next_check_date: New check date (ISO format)
+        user_id: User making the change
+    """
+    covenant = twin_service.reschedule_covenant(loan_id, covenant_id, next_check_date)
+    if covenant is None:
+        raise HTTPException(status_code=404, detail="Loan or covenant not found")
+    
+    await run_in_threadpool(
+        audit_service.log_event,
+        event_type=AuditEventType.LOAN_UPDATED,
+        loan_id=loan_id,
+        user_id=user_id,
+        description=f"Covenant {covenant.name} next check moved to {next_check_date.date().isoformat()}",
+        metadata={"covenant_id": covenant_id, "next_check_date": next_check_date.isoformat()}
+    )
+    return covenant.dict()
+
+
+@router.put("/loans/{loan_id}/esg-clauses/{clause_id}/next-report", response_model=dict)
+async def reschedule_esg_clause(
+    loan_id: str,
+    clause_id: str,
+    next_report_date: datetime,
+    user_id: str = "analyst"
+):
+    """
+    Move an ESG clause's next report date
+    
+    Args:
+        loan_id: Loan ID
+        clause_id: ESG clause ID
+        next_report_date: New report date (ISO format)
+        user_id: User making the change
+    """
+    clause = twin_service.reschedule_esg_clause(loan_id, clause_id, next_report_date)
+    if clause is None:
+        raise HTTPException(status_code=404, detail="Loan or ESG clause not found")
+    
+    await run_in_threadpool(
+        audit_service.log_event,
+        event_type=AuditEventType.LOAN_UPDATED,
+        loan_id=loan_id,
+        user_id=user_id,
+        description=f"ESG {clause.category} report moved to {next_report_date.date().isoformat()}",
+        metadata={"clause_id": clause_id, "next_report_date": next_report_date.isoformat()}
+    )
+    return clause.dict()
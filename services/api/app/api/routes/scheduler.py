@@ -0,0 +1,30 @@
+"""
+Scheduler API routes
+Status of the background scoring scheduler, plus a manual trigger
+"""
+from fastapi import APIRouter
+from app.services.service_instances import scoring_scheduler
+
+router = APIRouter()
+
+
+@router.get("/scheduler/status", response_model=dict)
+async def get_scheduler_status():
+    """
+    Get background scheduler state
+    
+    Returns:
+        Whether it is running and holds the lease, queue sizes, next due date and run counters
+    """
+    return scoring_scheduler.status()
+
+
+@router.post("/scheduler/run", response_model=dict)
+async def run_scheduler():
+    """
+    Run one scoring pass now - due items first, then loans whose inputs changed
+    
+    Returns:
+        Counts for the pass (scored is 0 if another worker holds the scheduler lease)
+    """
+    return await scoring_scheduler.run_once()
@@ -3,14 +3,30 @@ LoanLife Edge API - main FastAPI app
 Backend for digital twin loan monitoring system
 """
 import os
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.routes import loans, predictions, esg, audit
+from fastapi.responses import JSONResponse
+from app.api.routes import loans, predictions, esg, audit, portfolio, checks, schedule, scheduler, changes, models, compute
+from app.services.compute_executor import ExecutorSaturated
+from app.services.service_instances import scoring_scheduler, compute_executor
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background scoring - with several workers, the scheduler lease keeps it to one of them
+    if os.getenv("SCHEDULER_ENABLED", "true").lower() == "true":
+        scoring_scheduler.start()
+    yield
+    await scoring_scheduler.stop()
+    compute_executor.shutdown()
+
 
 app = FastAPI(
     title="LoanLife Edge API",
     description="Backend API for LoanLife Edge - Digital Twin Loan Monitoring System",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS for Electron app - allow all for hackathon, restrict in production
@@ -20,13 +36,31 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Retry-After"],  # GET /loans pagination cursor, conditional GETs, 503s
 )
 
+
+@app.exception_handler(ExecutorSaturated)
+async def executor_saturated_handler(request: Request, exc: ExecutorSaturated):
+    """Compute queue full - shed load instead of queueing without bound"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "queue": exc.queue},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 # Register API routes
 app.include_router(loans.router, prefix="/api/v1", tags=["loans"])
 app.include_router(predictions.router, prefix="/api/v1", tags=["predictions"])
 app.include_router(esg.router, prefix="/api/v1", tags=["esg"])
 app.include_router(audit.router, prefix="/api/v1", tags=["audit"])
+app.include_router(portfolio.router, prefix="/api/v1", tags=["portfolio"])
+app.include_router(checks.router, prefix="/api/v1", tags=["checks"])
+app.include_router(schedule.router, prefix="/api/v1", tags=["schedule"])
+app.include_router(scheduler.router, prefix="/api/v1", tags=["scheduler"])
+app.include_router(changes.router, prefix="/api/v1", tags=["changes"])
+app.include_router(models.router, prefix="/api/v1", tags=["models"])
+app.include_router(compute.router, prefix="/api/v1", tags=["compute"])
 
 # Seed demo data if requested (for hackathon demo)
 if os.getenv("SEED_DATA", "false").lower() == "true":
@@ -96,6 +130,7 @@ async def health():
             "digital_twin": "operational",
             "ai_prediction": "operational",
             "esg_scoring": "operational",
+            "scheduler": "running" if scoring_scheduler.running else "stopped",
             "blockchain": blockchain_status
         },
         "blockchain": {
@@ -4,10 +4,12 @@ Manages immutable audit logs for all system actions
 Integrates with blockchain for immutable audit trail
 """
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Callable, Dict, Any, List, Optional
 from enum import Enum
 import uuid
 import os
+import threading
+from app.services.audit_store import InMemoryAuditStore
 
 # Import blockchain client (optional - graceful fallback if not available)
 try:
@@ -34,12 +36,34 @@ class AuditEventType(str, Enum):
     REMEDIATION_ACTION = "remediation_action"
 
 
+# Event type -> blockchain action type
+BLOCKCHAIN_ACTION_TYPES = {
+    AuditEventType.LOAN_CREATED: 1,
+    AuditEventType.LOAN_UPDATED: 2,
+    AuditEventType.DOCUMENT_UPLOADED: 3,
+    AuditEventType.COVENANT_CHECKED: 4,
+    AuditEventType.COVENANT_BREACHED: 5,
+    AuditEventType.PREDICTION_GENERATED: 6,
+    AuditEventType.ESG_SCORE_CALCULATED: 7,
+    AuditEventType.ESG_NON_COMPLIANCE: 8,
+    AuditEventType.GOVERNANCE_ACTION: 9,
+    AuditEventType.APPROVAL_REQUESTED: 10,
+    AuditEventType.APPROVAL_GRANTED: 11,
+    AuditEventType.APPROVAL_DENIED: 12,
+    AuditEventType.REMEDIATION_ACTION: 13,
+}
+
+
 class AuditService:
     """Service for managing audit logs"""
     
-    def __init__(self):
-        # In-memory storage for demo (replace with blockchain/immutable storage in production)
-        self.audit_logs: List[Dict[str, Any]] = []
+    def __init__(self, store=None):
+        # In-memory by default - pass a SQLiteAuditStore to share the trail across workers/restarts
+        self.store = store or InMemoryAuditStore()
+        # Called with (loan_id, event_type) for every appended entry, local or replayed by refresh()
+        self._subscribers: List[Callable[[Optional[str], str], None]] = []
+        self._synced_version = self.store.current_version()
+        self._refresh_lock = threading.Lock()
         
         # Initialize blockchain client if available
         self.blockchain_client = None
@@ -71,60 +95,137 @@ class AuditService:
         Returns:
             Created audit log entry
         """
-        log_entry = {
-            "id": str(uuid.uuid4()),
-            "event_type": event_type.value,
-            "loan_id": loan_id,
-            "user_id": user_id,
-            "timestamp": datetime.now().isoformat(),
-            "description": description,
-            "metadata": metadata or {},
-            "hash": self._calculate_hash(event_type, loan_id, description, metadata)
-        }
-        
-        self.audit_logs.append(log_entry)
+        log_entry = self._build_entry(event_type, loan_id, user_id, description, metadata)
         
         # Try to log to blockchain (non-blocking, graceful fallback)
         if self.blockchain_client:
             try:
-                # Map event types to blockchain action types
-                action_type_map = {
-                    AuditEventType.LOAN_CREATED: 1,
-                    AuditEventType.LOAN_UPDATED: 2,
-                    AuditEventType.DOCUMENT_UPLOADED: 3,
-                    AuditEventType.COVENANT_CHECKED: 4,
-                    AuditEventType.COVENANT_BREACHED: 5,
-                    AuditEventType.PREDICTION_GENERATED: 6,
-                    AuditEventType.ESG_SCORE_CALCULATED: 7,
-                    AuditEventType.ESG_NON_COMPLIANCE: 8,
-                    AuditEventType.GOVERNANCE_ACTION: 9,
-                    AuditEventType.APPROVAL_REQUESTED: 10,
-                    AuditEventType.APPROVAL_GRANTED: 11,
-                    AuditEventType.APPROVAL_DENIED: 12,
-                    AuditEventType.REMEDIATION_ACTION: 13,
-                }
-                
-                action_type = action_type_map.get(event_type, 0)
                 blockchain_result = self.blockchain_client.log_audit_entry(
-                    action_type=action_type,
+                    action_type=BLOCKCHAIN_ACTION_TYPES.get(event_type, 0),
                     loan_id=loan_id,
                     actor=user_id,
                     metadata=metadata or {}
                 )
-                
-                # Add blockchain transaction info if successful
-                if blockchain_result.get("success"):
-                    log_entry["blockchain_tx_hash"] = blockchain_result.get("transactionHash")
-                    log_entry["blockchain_block"] = blockchain_result.get("blockNumber")
-                else:
-                    # Log blockchain failure but don't fail the audit log
-                    log_entry["blockchain_error"] = blockchain_result.get("error")
+                self._attach_blockchain_result(log_entry, blockchain_result)
             except Exception as e:
                 # Blockchain logging failed - continue without it
                 log_entry["blockchain_error"] = str(e)
         
+        # Stored once blockchain info is attached - the persisted entry is the complete one
+        self.store.append(log_entry)
+        self._notify((log_entry,))
+        
         return log_entry
     
+    def log_events(
+        self,
+        event_type: AuditEventType,
+        events: List[Dict[str, Any]],
+        user_id: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Log a batch of events of one type - one store write and one blockchain anchor per batch
+        
+        Args:
+            event_type: Type of every event in the batch
+            events: Dicts with loan_id, description and optional metadata
+            user_id: User who triggered the events
+        
+        Returns:
+            Created audit log entries
+        """
+        log_entries = [
+            self._build_entry(event_type, event["loan_id"], user_id, event["description"], event.get("metadata"))
+            for event in events
+        ]
+        if not log_entries:
+            return log_entries
+        
+        # Anchor the batch on chain as one entry over the entry hashes instead of one call per event
+        if self.blockchain_client:
+            import hashlib
+            batch_hash = hashlib.sha256("".join(entry["hash"] for entry in log_entries).encode()).hexdigest()
+            try:
+                blockchain_result = self.blockchain_client.log_audit_entry(
+                    action_type=BLOCKCHAIN_ACTION_TYPES.get(event_type, 0),
+                    loan_id=log_entries[0]["loan_id"],
+                    actor=user_id,
+                    metadata={"batch_size": len(log_entries), "batch_hash": batch_hash}
+                )
+                for entry in log_entries:
+                    entry["blockchain_batch_hash"] = batch_hash
+                    self._attach_blockchain_result(entry, blockchain_result)
+            except Exception as e:
+                for entry in log_entries:
+                    entry["blockchain_error"] = str(e)
+        
+        self.store.append_many(log_entries)
+        self._notify(log_entries)
+        return log_entries
+    
+    def _build_entry(
+        self,
+        event_type: AuditEventType,
+        loan_id: str,
+        user_id: str,
+        description: str,
+        metadata: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        return {
+            "id": str(uuid.uuid4()),
+            "event_type": event_type.value,
+            "loan_id": loan_id,
+            "user_id": user_id,
+            "timestamp": datetime.now().isoformat(),
+            "description": description,
+            "metadata": metadata or {},
+            "hash": self._calculate_hash(event_type, loan_id, description, metadata)
+        }
+    
+    @staticmethod
+    def _attach_blockchain_result(log_entry: Dict[str, Any], blockchain_result: Dict[str, Any]) -> None:
+        # Add blockchain transaction info if successful
+        if blockchain_result.get("success"):
+            log_entry["blockchain_tx_hash"] = blockchain_result.get("transactionHash")
+            log_entry["blockchain_block"] = blockchain_result.get("blockNumber")
+        else:
+            # Log blockchain failure but don't fail the audit log
+            log_entry["blockchain_error"] = blockchain_result.get("error")
+    
+    def subscribe(self, callback: Callable[[Optional[str], str], None]) -> None:
+        """Register an append callback - receives (loan_id, event_type)"""
+        self._subscribers.append(callback)
+    
+    def _notify(self, entries: List[Dict[str, Any]]) -> None:
+        for entry in entries:
+            for callback in self._subscribers:
+                callback(entry["loan_id"], entry["event_type"])
+    
+    def refresh(self) -> int:
+        """
+        Notify subscribers of entries other worker processes appended to a shared store
+        
+        Returns:
+            Number of foreign entries seen
+        """
+        with self._refresh_lock:
+            changes = self.store.changes_since(self._synced_version)
+            if not changes:
+                return 0
+            origin = getattr(self.store, "origin", None)
+            foreign = [
+                {"loan_id": loan_id, "event_type": event_type}
+                for _, loan_id, event_type, change_origin in changes
+                if change_origin is None or change_origin != origin
+            ]
+            self._notify(foreign)
+            self._synced_version = changes[-1][0]
+            return len(foreign)
+    
+    def version_tag(self) -> str:
+        """Changes whenever an entry is appended - epoch plus the store's version"""
+        return f"{self.store.epoch}.{self.store.current_version()}"
+    
     def get_audit_logs(
         self,
         loan_id: Optional[str] = None,
@@ -144,31 +245,12 @@ class AuditService:
         Returns:
             List of audit log entries
         """
-        logs = self.audit_logs.copy()
-        
-        # Apply filters
-        if loan_id:
-            logs = [log for log in logs if log["loan_id"] == loan_id]
-        
-        if event_type:
-            logs = [log for log in logs if log["event_type"] == event_type.value]
-        
-        if start_date:
-            logs = [
-                log for log in logs
-                if datetime.fromisoformat(log["timestamp"]) >= start_date
-            ]
-        
-        if end_date:
-            logs = [
-                log for log in logs
-                if datetime.fromisoformat(log["timestamp"]) <= end_date
-            ]
-        
-        # Sort by timestamp (newest first)
-        logs.sort(key=lambda x: x["timestamp"], reverse=True)
-        
-        return logs
+        return self.store.query(
+            loan_id=loan_id,
+            event_type=event_type.value if event_type else None,
+            start_date=start_date,
+            end_date=end_date
+        )
     
     def get_audit_summary(self, loan_id: str) -> Dict[str, Any]:
         """Get audit summary for a loan"""
@@ -0,0 +1,192 @@
+"""
+Audit log storage backends
+In-memory list by default, SQLite so every worker process appends to and reads the same trail
+"""
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from app.services.twin_store import open_sqlite, store_epoch
+from app.services.compact_records import AuditRecord
+
+
+class InMemoryAuditStore:
+    """Audit entries in a list - lost on restart, private to the process"""
+    
+    def __init__(self):
+        # Compact records in append order - entry dicts are rebuilt for query results only
+        self.audit_logs: List[AuditRecord] = []
+        self.epoch = uuid.uuid4().hex[:8]
+    
+    def current_version(self) -> int:
+        """Entries appended so far - grows with every append"""
+        return len(self.audit_logs)
+    
+    def changes_since(self, version: int) -> List[Tuple[int, Optional[str], str, Optional[str]]]:
+        """Single process - every append is seen as it happens"""
+        return []
+    
+    def append(self, entry: Dict[str, Any]) -> None:
+        self.audit_logs.append(AuditRecord(entry))
+    
+    def append_many(self, entries: List[Dict[str, Any]]) -> None:
+        self.audit_logs.extend(AuditRecord(entry) for entry in entries)
+    
+    def query(
+        self,
+        loan_id: Optional[str] = None,
+        event_type: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """Matching entries, newest first"""
+        logs = self.audit_logs.copy()
+        
+        if loan_id:
+            logs = [log for log in logs if log.loan_id == loan_id]
+        
+        if event_type:
+            logs = [log for log in logs if log.event_type == event_type]
+        
+        if start_date:
+            logs = [
+                log for log in logs
+                if log.timestamp >= start_date
+            ]
+        
+        if end_date:
+            logs = [
+                log for log in logs
+                if log.timestamp <= end_date
+            ]
+        
+        logs.sort(key=lambda x: x.timestamp, reverse=True)
+        return [log.to_entry() for log in logs]
+    
+    def close(self) -> None:
+        pass
+
+
+class SQLiteAuditStore:
+    """
+    Append-only audit table - full entry as JSON, filter columns indexed
+    Timestamps are ISO strings, so string order is time order
+    """
+    
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS audit_logs (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        id TEXT NOT NULL UNIQUE,
+        loan_id TEXT,
+        event_type TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        data TEXT NOT NULL,
+        origin TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_audit_loan ON audit_logs(loan_id, timestamp);
+    CREATE INDEX IF NOT EXISTS idx_audit_event_type ON audit_logs(event_type, timestamp);
+    CREATE INDEX IF NOT EXISTS idx_audit_timestamp ON audit_logs(timestamp);
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = open_sqlite(path)
+        self._lock = threading.RLock()
+        self._conn.executescript(self.SCHEMA)
+        self.epoch = store_epoch(self._conn)
+        # Identifies this process's appends, as in the twin change log
+        self.origin = uuid.uuid4().hex
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(audit_logs)")}
+        if "origin" not in columns:
+            self._conn.execute("ALTER TABLE audit_logs ADD COLUMN origin TEXT")
+    
+    def current_version(self) -> int:
+        """Latest seq - every append from any worker bumps it"""
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM audit_logs").fetchone()[0]
+    
+    def changes_since(self, version: int) -> List[Tuple[int, Optional[str], str, Optional[str]]]:
+        """(seq, loan_id, event_type, origin) for entries appended after version, oldest first"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT seq, loan_id, event_type, origin FROM audit_logs WHERE seq > ? ORDER BY seq",
+                (version,)
+            ).fetchall()
+    
+    def feed_entries(self, version: int, limit: int) -> List[Tuple[int, Optional[str], str, str]]:
+        """(seq, loan_id, event_type, timestamp) for up to limit entries after version - the change feed's audit half"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT seq, loan_id, event_type, timestamp FROM audit_logs WHERE seq > ? ORDER BY seq LIMIT ?",
+                (version, limit)
+            ).fetchall()
+    
+    def append(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO audit_logs (id, loan_id, event_type, timestamp, data, origin) VALUES (?, ?, ?, ?, ?, ?)",
+                (entry["id"], entry["loan_id"], entry["event_type"], entry["timestamp"], json.dumps(entry), self.origin)
+            )
+    
+    def append_many(self, entries: List[Dict[str, Any]]) -> None:
+        """One transaction for the whole batch"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO audit_logs (id, loan_id, event_type, timestamp, data, origin) VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (
+                            entry["id"], entry["loan_id"], entry["event_type"], entry["timestamp"],
+                            json.dumps(entry), self.origin
+                        )
+                        for entry in entries
+                    ]
+                )
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+    
+    def query(
+        self,
+        loan_id: Optional[str] = None,
+        event_type: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """Matching entries, newest first"""
+        clauses, params = [], []
+        if loan_id:
+            clauses.append("loan_id = ?")
+            params.append(loan_id)
+        if event_type:
+            clauses.append("event_type = ?")
+            params.append(event_type)
+        if start_date:
+            clauses.append("timestamp >= ?")
+            params.append(start_date.isoformat())
+        if end_date:
+            clauses.append("timestamp <= ?")
+            params.append(end_date.isoformat())
+        
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT data FROM audit_logs {where} ORDER BY timestamp DESC, seq DESC", params
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+    
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def create_audit_store(database_url: Optional[str] = None):
+    """Same DATABASE_URL as the twin store - sqlite:///path -> SQLiteAuditStore, else in-memory"""
+    database_url = database_url or os.getenv("DATABASE_URL", "")
+    if database_url.startswith("sqlite:///"):
+        return SQLiteAuditStore(database_url[len("sqlite:///"):])
+    return InMemoryAuditStore()
@@ -0,0 +1,260 @@
+"""
+Bulk Loan Import Service
+Streams an NDJSON or CSV body of loans into digital twins - parsed line by line,
+validated per row, stored and audited in batches, so memory stays flat for any file size
+"""
+import codecs
+import csv
+import json
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from app.models import Loan
+from app.services.audit_service import AuditEventType
+
+SUPPORTED_FORMATS = ("ndjson", "csv")
+
+# Loan fields a row may set - anything else goes into metadata
+LOAN_FIELDS = (
+    "id", "borrower_name", "loan_amount", "interest_rate", "start_date",
+    "maturity_date", "status", "covenants", "esg_clauses", "metadata"
+)
+# CSV cells holding JSON
+JSON_COLUMNS = ("covenants", "esg_clauses", "metadata")
+
+DEFAULT_BATCH_SIZE = 500
+# Per-row errors beyond this are counted, not listed
+MAX_REPORTED_ERRORS = 1000
+# A single record longer than this is rejected rather than buffered
+MAX_RECORD_CHARS = 1024 * 1024
+
+
+class BulkImportError(ValueError):
+    """Body can't be imported at all (bad format, missing CSV header)"""
+
+
+class _OversizedRecord:
+    """Placeholder yielded instead of a record longer than MAX_RECORD_CHARS"""
+
+
+OVERSIZED = _OversizedRecord()
+
+
+class BulkImportService:
+    """Imports a stream of loan records into the twin store"""
+    
+    def __init__(self, twin_service, audit_service, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.twin_service = twin_service
+        self.audit_service = audit_service
+        self.batch_size = batch_size
+    
+    async def import_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        fmt: str,
+        user_id: str
+    ) -> Dict[str, Any]:
+        """
+        Import every record in the stream
+        
+        Args:
+            chunks: Request body as it arrives
+            fmt: "ndjson" or "csv" (first line is the header)
+            user_id: User running the import, recorded on audit events
+        
+        Returns:
+            Counts plus per-row errors (row numbers are 1-based data rows, CSV header excluded)
+        """
+        if fmt not in SUPPORTED_FORMATS:
+            raise BulkImportError(f"Unsupported format '{fmt}'. Supported: {', '.join(SUPPORTED_FORMATS)}")
+        
+        result = {"format": fmt, "total_rows": 0, "created": 0, "failed": 0, "errors": []}
+        batch: List[Loan] = []
+        # Ids taken by earlier rows of this import that aren't in the store yet
+        batch_ids = set()
+        
+        records = _iter_records(iter_text_lines(chunks), fmt)
+        async for row_number, record in records:
+            result["total_rows"] = row_number
+            try:
+                loan = _loan_from_record(record)
+                if loan.id in batch_ids or self.twin_service.get_digital_twin(loan.id):
+                    raise ValueError(f"loan id '{loan.id}' already exists")
+            except (ValueError, ValidationError) as e:
+                record_row_error(result, row_number, e)
+                continue
+            
+            batch.append(loan)
+            batch_ids.add(loan.id)
+            if len(batch) >= self.batch_size:
+                await self._flush(batch, user_id, result)
+                batch, batch_ids = [], set()
+        
+        if batch:
+            await self._flush(batch, user_id, result)
+        return result
+    
+    async def _flush(self, batch: List[Loan], user_id: str, result: Dict[str, Any]) -> None:
+        # Store and audit writes are blocking - keep them off the event loop
+        await run_in_threadpool(self._store_batch, batch, user_id)
+        result["created"] += len(batch)
+    
+    def _store_batch(self, batch: List[Loan], user_id: str) -> None:
+        self.twin_service.import_digital_twins(batch)
+        self.audit_service.log_events(
+            AuditEventType.LOAN_CREATED,
+            [
+                {
+                    "loan_id": loan.id,
+                    "description": f"Loan digital twin created for {loan.borrower_name} (bulk import)",
+                    "metadata": {"loan_amount": loan.loan_amount, "covenants_count": len(loan.covenants)}
+                }
+                for loan in batch
+            ],
+            user_id=user_id
+        )
+
+
+def record_row_error(result: Dict[str, Any], row_number: int, error: Exception) -> None:
+    result["failed"] += 1
+    if len(result["errors"]) < MAX_REPORTED_ERRORS:
+        result["errors"].append({"row": row_number, "error": _describe(error)})
+    else:
+        result["errors_truncated"] = True
+
+
+def _describe(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" for e in error.errors()
+        )
+    return str(error)
+
+
+async def iter_text_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    """Decode byte chunks and yield complete lines (without line endings)"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    oversized = False
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            if oversized:
+                # Tail of a record that was already rejected
+                oversized = False
+                continue
+            yield line.rstrip("\r")
+        if len(buffer) > MAX_RECORD_CHARS:
+            if not oversized:
+                yield OVERSIZED
+            oversized = True
+            buffer = ""
+    buffer += decoder.decode(b"", final=True)
+    if buffer and not oversized:
+        yield buffer.rstrip("\r")
+
+
+async def _iter_records(lines: AsyncIterator[Any], fmt: str) -> AsyncIterator[Tuple[int, Any]]:
+    """(row_number, record) - a dict, OVERSIZED, or the exception that stopped the row from parsing"""
+    row_number = 0
+    if fmt == "ndjson":
+        async for line in lines:
+            if line is not OVERSIZED and not line.strip():
+                continue
+            row_number += 1
+            if line is OVERSIZED:
+                yield row_number, line
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                record = ValueError(f"invalid JSON: {e}")
+            if not isinstance(record, (dict, Exception)):
+                record = ValueError("each line must be a JSON object")
+            yield row_number, record
+        return
+    
+    header: Optional[List[str]] = None
+    pending = ""
+    async for line in lines:
+        if line is OVERSIZED:
+            pending = ""
+            row_number += 1
+            yield row_number, line
+            continue
+        # Quoted cells may contain newlines - a record is complete once its quotes balance
+        pending = f"{pending}\n{line}" if pending else line
+        if pending.count('"') % 2:
+            if len(pending) > MAX_RECORD_CHARS:
+                pending = ""
+                row_number += 1
+                yield row_number, OVERSIZED
+            continue
+        text, pending = pending, ""
+        if not text.strip():
+            continue
+        cells = next(csv.reader([text]))
+        if header is None:
+            header = [cell.strip() for cell in cells]
+            if "borrower_name" not in header:
+                raise BulkImportError("CSV header must include borrower_name")
+            continue
+        row_number += 1
+        if len(cells) != len(header):
+            yield row_number, ValueError(f"expected {len(header)} columns, got {len(cells)}")
+            continue
+        yield row_number, _record_from_cells(header, cells)
+    if pending:
+        yield row_number + 1, ValueError("unterminated quoted field")
+
+
+def _record_from_cells(header: List[str], cells: List[str]) -> Any:
+    record: Dict[str, Any] = {}
+    for column, value in zip(header, cells):
+        if value == "":
+            continue
+        if column in JSON_COLUMNS:
+            try:
+                value = json.loads(value)
+            except ValueError as e:
+                return ValueError(f"{column}: invalid JSON: {e}")
+        record[column] = value
+    return record
+
+
+def _loan_from_record(record: Any) -> Loan:
+    """Validate one parsed record into a Loan - raises ValueError/ValidationError"""
+    if record is OVERSIZED:
+        raise ValueError(f"record longer than {MAX_RECORD_CHARS} characters")
+    if isinstance(record, Exception):
+        raise record
+    
+    fields = {key: value for key, value in record.items() if key in LOAN_FIELDS}
+    extra = {key: value for key, value in record.items() if key not in LOAN_FIELDS}
+    metadata = fields.get("metadata") or {}
+    if not isinstance(metadata, dict):
+        raise ValueError("metadata must be a JSON object")
+    
+    # Clauses without ids get one, as document ingestion does
+    for key in ("covenants", "esg_clauses"):
+        clauses = fields.get(key) or []
+        if not isinstance(clauses, list):
+            raise ValueError(f"{key} must be a JSON array")
+        fields[key] = [
+            {"id": str(uuid.uuid4()), **clause} if isinstance(clause, dict) and "id" not in clause else clause
+            for clause in clauses
+        ]
+    
+    loan = Loan.model_validate({
+        **fields,
+        "id": str(fields.get("id") or uuid.uuid4()),
+        "status": fields.get("status") or "active",
+        "metadata": {**metadata, **extra}
+    })
+    if loan.loan_amount <= 0:
+        raise ValueError("loan_amount must be positive")
+    if loan.maturity_date <= loan.start_date:
+        raise ValueError("maturity_date must be after start_date")
+    return loan
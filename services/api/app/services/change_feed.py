@@ -0,0 +1,217 @@
+"""
+Change feed - twin and audit mutations after a cursor
+Clients follow it with a since=<cursor> cursor (long-poll or SSE) instead of re-polling every
+endpoint. In memory the feed is a bounded ring buffer, and a client that falls further behind
+than it holds is told to resync. With a shared SQLite store the feed reads the twin_changes
+and audit_logs tables directly, so every worker process serves the same cursors.
+"""
+import asyncio
+import threading
+import uuid
+from collections import deque
+from datetime import datetime
+from itertools import islice
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+DEFAULT_CAPACITY = 10000
+# Most events returned by one long-poll response
+MAX_BATCH = 500
+# Waiting consumers re-check other workers' writes this often
+POLL_SECONDS = 1.0
+
+
+class ChangeFeed:
+    """
+    Ring buffer of (seq, event) - seqs are contiguous, so a cursor maps to a buffer offset
+    Publishing is thread-safe; waiting is asyncio
+    """
+    
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, refresh: Optional[Callable[[], Any]] = None):
+        self.capacity = capacity
+        # Seqs restart with the process - cursors from another epoch always resync
+        self.epoch = uuid.uuid4().hex[:8]
+        self.seq = 0
+        self._events: Deque[Tuple[int, Dict[str, Any]]] = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        # Pulls in other workers' changes (which publish through the subscriptions)
+        self._refresh = refresh
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._changed: Optional[asyncio.Event] = None
+        self._signal_pending = False
+    
+    def publish_twin_change(self, loan_id: str, kind: str) -> None:
+        """DigitalTwinService subscriber"""
+        self.publish({"type": kind, "loan_id": loan_id})
+    
+    def publish_audit_entry(self, loan_id: Optional[str], event_type: str) -> None:
+        """AuditService subscriber"""
+        self.publish({"type": "audit_entry", "loan_id": loan_id, "event_type": event_type})
+    
+    def publish(self, event: Dict[str, Any]) -> int:
+        with self._lock:
+            self.seq += 1
+            self._events.append((self.seq, {"seq": self.seq, **event, "at": datetime.now().isoformat()}))
+            seq = self.seq
+        self._signal()
+        return seq
+    
+    def _signal(self) -> None:
+        # One wake-up per burst - a 50k-row import doesn't queue 50k callbacks on the loop
+        with self._lock:
+            signal = self._loop is not None and not self._signal_pending
+            if signal:
+                self._signal_pending = True
+        if signal:
+            try:
+                self._loop.call_soon_threadsafe(self._wake_waiters)
+            except RuntimeError:
+                # Loop closed (shutdown) - nobody is waiting
+                self._signal_pending = False
+    
+    def head(self) -> str:
+        """Cursor for everything published so far - where a new client starts"""
+        return str(self.seq)
+    
+    def _wake_waiters(self) -> None:
+        with self._lock:
+            self._signal_pending = False
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+    
+    def read(self, since: str, epoch: Optional[str] = None, limit: int = MAX_BATCH) -> Dict[str, Any]:
+        """
+        Events after the since cursor, oldest first
+        
+        Returns:
+            {epoch, version, events, resync_required} - resync_required means events after
+            since were already dropped (or the cursor is from another epoch); reload state
+            and continue from version
+        """
+        try:
+            since = int(since)
+        except ValueError:
+            since = -1
+        with self._lock:
+            head = self.seq
+            oldest = self._events[0][0] if self._events else head + 1
+            if (epoch is not None and epoch != self.epoch) or since > head or since < oldest - 1:
+                return {"epoch": self.epoch, "version": head, "events": [], "resync_required": True}
+            start = since - oldest + 1
+            events = [event for _, event in islice(self._events, start, start + limit)]
+        version = events[-1]["seq"] if events else head
+        return {"epoch": self.epoch, "version": version, "events": events, "resync_required": False}
+    
+    async def wait(self, since: str, epoch: Optional[str] = None, timeout: float = 25.0) -> Dict[str, Any]:
+        """read(), but wait up to timeout for the first event after since"""
+        self._bind_loop()
+        deadline = asyncio.get_running_loop().time() + timeout
+        while True:
+            changed = self._changed
+            result = await self._poll(since, epoch)
+            remaining = deadline - asyncio.get_running_loop().time()
+            if result["events"] or result["resync_required"] or remaining <= 0:
+                return result
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=min(remaining, POLL_SECONDS))
+            except asyncio.TimeoutError:
+                pass
+    
+    async def _poll(self, since: str, epoch: Optional[str]) -> Dict[str, Any]:
+        if self._refresh is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self._refresh)
+        return self.read(since, epoch)
+    
+    def _bind_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._changed = asyncio.Event()
+            with self._lock:
+                self._loop = loop
+                self._signal_pending = False
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "epoch": self.epoch,
+                "version": self.seq,
+                "capacity": self.capacity,
+                "buffered": len(self._events),
+                "oldest": self._events[0][0] if self._events else None
+            }
+
+
+class SQLiteChangeFeed(ChangeFeed):
+    """
+    Feed over the shared store's own logs - cursors are '<twin version>.<audit seq>' under the
+    database's epoch, valid on every worker, and never fall out of a buffer
+    Local writes still publish, but only to wake waiters; other workers' writes are picked
+    up by polling the logs
+    """
+    
+    def __init__(self, twin_store, audit_store):
+        super().__init__(capacity=0)
+        self._twin_store = twin_store
+        self._audit_store = audit_store
+        self.epoch = twin_store.epoch if twin_store.epoch == audit_store.epoch else f"{twin_store.epoch}{audit_store.epoch}"
+    
+    def publish(self, event: Dict[str, Any]) -> int:
+        self._signal()
+        return 0
+    
+    def _positions(self) -> Tuple[int, int]:
+        return self._twin_store.current_version(), self._audit_store.current_version()
+    
+    def head(self) -> str:
+        return "%d.%d" % self._positions()
+    
+    def read(self, since: str, epoch: Optional[str] = None, limit: int = MAX_BATCH) -> Dict[str, Any]:
+        """Twin changes then audit entries after since - see ChangeFeed.read"""
+        twin_head, audit_head = self._positions()
+        try:
+            twin_since, audit_since = (int(part) for part in since.split("."))
+        except ValueError:
+            twin_since = audit_since = -1
+        if (
+            (epoch is not None and epoch != self.epoch)
+            or not 0 <= twin_since <= twin_head
+            or not 0 <= audit_since <= audit_head
+        ):
+            return {"epoch": self.epoch, "version": f"{twin_head}.{audit_head}", "events": [], "resync_required": True}
+        
+        # Each event's seq is the cursor just past it, so an SSE reconnect resumes mid-batch
+        events = []
+        for version, loan_id, kind, at in self._twin_store.feed_entries(twin_since, limit):
+            twin_since = version
+            events.append({"seq": f"{twin_since}.{audit_since}", "type": kind, "loan_id": loan_id, "at": at})
+        for seq, loan_id, event_type, at in self._audit_store.feed_entries(audit_since, limit - len(events)):
+            audit_since = seq
+            events.append({
+                "seq": f"{twin_since}.{audit_since}", "type": "audit_entry", "loan_id": loan_id,
+                "event_type": event_type, "at": at
+            })
+        version = f"{twin_since}.{audit_since}" if events else f"{twin_head}.{audit_head}"
+        return {"epoch": self.epoch, "version": version, "events": events, "resync_required": False}
+    
+    async def _poll(self, since: str, epoch: Optional[str]) -> Dict[str, Any]:
+        return await asyncio.get_running_loop().run_in_executor(None, self.read, since, epoch)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "sqlite", "epoch": self.epoch, "version": self.head()}
+
+
+def create_change_feed(twin_store, audit_store, capacity: int = DEFAULT_CAPACITY, refresh: Optional[Callable[[], Any]] = None):
+    """SQLiteChangeFeed when both stores are shared SQLite logs, else the in-memory ring buffer"""
+    if hasattr(twin_store, "feed_entries") and hasattr(audit_store, "feed_entries"):
+        return SQLiteChangeFeed(twin_store, audit_store)
+    return ChangeFeed(capacity=capacity, refresh=refresh)
+
+
+def format_sse(event: str, data: str, event_id: Optional[str] = None) -> str:
+    """One server-sent event frame"""
+    lines: List[str] = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {data}")
+    return "\n".join(lines) + "\n\n"
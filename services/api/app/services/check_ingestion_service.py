@@ -0,0 +1,215 @@
+"""
+Bulk Check Ingestion Service
+Streams NDJSON covenant observations and ESG compliance statuses (quarter-end loads) -
+each batch is evaluated with NumPy, appended in one store write and audited in bulk
+"""
+import json
+import math
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+from app.models import ESGCompliance, ESGStatus
+from app.services.audit_service import AuditEventType
+from app.services.bulk_import_service import OVERSIZED, MAX_RECORD_CHARS, iter_text_lines, record_row_error
+from app.services.covenant_evaluation import BATCH_STATUSES, BREACHED, AT_RISK, evaluate_covenants
+
+DEFAULT_BATCH_SIZE = 5000
+
+
+class CheckIngestionService:
+    """Evaluates and records streamed covenant/ESG checks batch by batch"""
+    
+    def __init__(self, twin_service, audit_service, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.twin_service = twin_service
+        self.audit_service = audit_service
+        self.batch_size = batch_size
+    
+    async def ingest_stream(self, chunks: AsyncIterator[bytes], user_id: str) -> Dict[str, Any]:
+        """
+        Ingest every NDJSON record in the stream
+        
+        Covenant observation: {"loan_id", "covenant_id", "actual_value", "check_date"?, "notes"?}
+        ESG status: {"loan_id", "clause_id", "status", "check_date"?, "evidence"?, "notes"?}
+        
+        Returns:
+            Counts plus per-row errors (row numbers are 1-based, blank lines skipped)
+        """
+        result = {
+            "total_rows": 0,
+            "covenant_checks": 0,
+            "esg_checks": 0,
+            "breached": 0,
+            "at_risk": 0,
+            "non_compliant": 0,
+            "failed": 0,
+            "errors": []
+        }
+        pending: List[Tuple[int, Any]] = []
+        row_number = 0
+        
+        async for line in iter_text_lines(chunks):
+            if line is not OVERSIZED and not line.strip():
+                continue
+            row_number += 1
+            pending.append((row_number, _parse_line(line)))
+            if len(pending) >= self.batch_size:
+                # Evaluation and writes are blocking - keep them off the event loop
+                await run_in_threadpool(self._process_batch, pending, user_id, result)
+                pending = []
+        
+        if pending:
+            await run_in_threadpool(self._process_batch, pending, user_id, result)
+        result["total_rows"] = row_number
+        return result
+    
+    def _process_batch(self, records: List[Tuple[int, Any]], user_id: str, result: Dict[str, Any]) -> None:
+        loans: Dict[str, Any] = {}
+        observations: List[Tuple[str, Any, float, datetime, Optional[str]]] = []
+        compliances: List[Tuple[ESGCompliance, Any]] = []
+        
+        for row_number, record in records:
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                loan = self._loan(loans, record.get("loan_id"))
+                if "covenant_id" in record:
+                    observations.append(_observation(loan, record))
+                elif "clause_id" in record:
+                    compliances.append(_compliance(loan, record))
+                else:
+                    raise ValueError("record needs covenant_id (covenant observation) or clause_id (ESG status)")
+            except ValueError as e:
+                record_row_error(result, row_number, e)
+        
+        if observations:
+            self._record_observations(observations, user_id, result)
+        if compliances:
+            self._record_compliances(compliances, user_id, result)
+    
+    def _loan(self, loans: Dict[str, Any], loan_id: Any):
+        if not isinstance(loan_id, str) or not loan_id:
+            raise ValueError("loan_id is required")
+        if loan_id not in loans:
+            loans[loan_id] = self.twin_service.get_digital_twin(loan_id)
+        loan = loans[loan_id]
+        if loan is None:
+            raise ValueError(f"loan '{loan_id}' not found")
+        return loan
+    
+    def _record_observations(
+        self,
+        observations: List[Tuple[str, Any, float, datetime, Optional[str]]],
+        user_id: str,
+        result: Dict[str, Any]
+    ) -> None:
+        is_breached, status_codes = evaluate_covenants(
+            np.fromiter((actual for _, _, actual, _, _ in observations), dtype=np.float64, count=len(observations)),
+            np.fromiter((c.threshold for _, c, _, _, _ in observations), dtype=np.float64, count=len(observations)),
+            [c.operator for _, c, _, _, _ in observations]
+        )
+        breached_flags = is_breached.tolist()
+        statuses = [BATCH_STATUSES[code] for code in status_codes.tolist()]
+        
+        self.twin_service.add_covenant_checks([
+            (loan_id, covenant.id, check_date, status, actual, covenant.threshold, breached, notes, None)
+            for (loan_id, covenant, actual, check_date, notes), status, breached
+            in zip(observations, statuses, breached_flags)
+        ])
+        
+        events: Dict[AuditEventType, List[Dict[str, Any]]] = {}
+        for (loan_id, covenant, actual, _, _), breached in zip(observations, breached_flags):
+            event_type = AuditEventType.COVENANT_BREACHED if breached else AuditEventType.COVENANT_CHECKED
+            events.setdefault(event_type, []).append({
+                "loan_id": loan_id,
+                "description": f"Covenant check: {covenant.name} - {'BREACHED' if breached else 'Compliant'}",
+                "metadata": {
+                    "covenant_id": covenant.id,
+                    "actual_value": actual,
+                    "threshold": covenant.threshold,
+                    "is_breached": breached
+                }
+            })
+        for event_type, batch in events.items():
+            self.audit_service.log_events(event_type, batch, user_id=user_id)
+        
+        result["covenant_checks"] += len(observations)
+        result["breached"] += int(np.count_nonzero(status_codes == BREACHED))
+        result["at_risk"] += int(np.count_nonzero(status_codes == AT_RISK))
+    
+    def _record_compliances(
+        self,
+        compliances: List[Tuple[ESGCompliance, Any]],
+        user_id: str,
+        result: Dict[str, Any]
+    ) -> None:
+        self.twin_service.add_esg_compliances([compliance for compliance, _ in compliances])
+        
+        events: Dict[AuditEventType, List[Dict[str, Any]]] = {}
+        for compliance, clause in compliances:
+            status = compliance.status.value
+            event_type = (
+                AuditEventType.ESG_NON_COMPLIANCE if status == "non_compliant" else AuditEventType.ESG_SCORE_CALCULATED
+            )
+            events.setdefault(event_type, []).append({
+                "loan_id": compliance.loan_id,
+                "description": f"ESG compliance check: {clause.category} - {status}",
+                "metadata": {"clause_id": clause.id, "status": status, "category": clause.category}
+            })
+        for event_type, batch in events.items():
+            self.audit_service.log_events(event_type, batch, user_id=user_id)
+        
+        result["esg_checks"] += len(compliances)
+        result["non_compliant"] += len(events.get(AuditEventType.ESG_NON_COMPLIANCE, []))
+
+
+def _parse_line(line: Any) -> Any:
+    """Parsed record dict, or the ValueError explaining why the line isn't one"""
+    if line is OVERSIZED:
+        return ValueError(f"record longer than {MAX_RECORD_CHARS} characters")
+    try:
+        record = json.loads(line)
+    except ValueError as e:
+        return ValueError(f"invalid JSON: {e}")
+    if not isinstance(record, dict):
+        return ValueError("each line must be a JSON object")
+    return record
+
+
+def _check_date(record: Dict[str, Any]) -> datetime:
+    value = record.get("check_date")
+    if value is None:
+        return datetime.now()
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        raise ValueError("check_date must be ISO format")
+
+
+def _observation(loan, record: Dict[str, Any]) -> Tuple[str, Any, float, datetime, Optional[str]]:
+    covenant = next((c for c in loan.covenants if c.id == record["covenant_id"]), None)
+    if covenant is None:
+        raise ValueError(f"covenant '{record['covenant_id']}' not found on loan '{loan.id}'")
+    actual = record.get("actual_value")
+    if isinstance(actual, bool) or not isinstance(actual, (int, float)) or not math.isfinite(actual):
+        raise ValueError("actual_value must be a finite number")
+    return loan.id, covenant, float(actual), _check_date(record), record.get("notes")
+
+
+def _compliance(loan, record: Dict[str, Any]) -> Tuple[ESGCompliance, Any]:
+    clause = next((c for c in loan.esg_clauses if c.id == record["clause_id"]), None)
+    if clause is None:
+        raise ValueError(f"ESG clause '{record['clause_id']}' not found on loan '{loan.id}'")
+    try:
+        status = ESGStatus(record.get("status"))
+    except ValueError:
+        raise ValueError(f"Invalid status. Must be one of: {[s.value for s in ESGStatus]}")
+    compliance = ESGCompliance(
+        clause_id=clause.id,
+        loan_id=loan.id,
+        check_date=_check_date(record),
+        status=status,
+        evidence=record.get("evidence"),
+        notes=record.get("notes")
+    )
+    return compliance, clause
@@ -0,0 +1,146 @@
+"""
+Compact in-memory record types for the hot append-only logs
+ESG compliance records and audit entries are kept as __slots__ objects with interned
+repeated strings and packed ids/hashes; pydantic models and dicts are only built on read
+(covenant checks already live in typed arrays - see covenant_series)
+"""
+import sys
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple, Union
+from app.models import ESGCompliance
+
+# Audit entry fields with a slot of their own - anything else (blockchain results) goes in extra
+AUDIT_FIELDS = ("id", "event_type", "loan_id", "user_id", "timestamp", "description", "metadata", "hash")
+
+
+def intern_str(value: Optional[str]) -> Optional[str]:
+    """
+    One shared object per distinct string instead of one per record - only for
+    low-cardinality fields (status, event type, clause id, user id); interning near-unique
+    values just pins them in the intern table
+    """
+    return sys.intern(value) if type(value) is str else value
+
+
+# Metadata key tuples seen so far - records with the same keys share one tuple
+_METADATA_SHAPES: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+
+def pack_metadata(metadata: Optional[Dict[str, Any]]) -> Optional[Tuple[Tuple[str, ...], Tuple[Any, ...]]]:
+    """(shared key tuple, value tuple) instead of a dict per record - None when empty"""
+    if not metadata:
+        return None
+    keys = tuple(metadata)
+    return _METADATA_SHAPES.setdefault(keys, keys), tuple(metadata.values())
+
+
+def unpack_metadata(packed: Optional[Tuple[Tuple[str, ...], Tuple[Any, ...]]]) -> Dict[str, Any]:
+    return dict(zip(*packed)) if packed else {}
+
+
+def _pack_uuid(value: str) -> Union[bytes, str]:
+    """16 bytes instead of a 36-char str - only when unpacking gives the same text back"""
+    try:
+        packed = uuid.UUID(value).bytes
+    except (ValueError, AttributeError, TypeError):
+        return value
+    return packed if str(uuid.UUID(bytes=packed)) == value else value
+
+
+def _unpack_uuid(value: Union[bytes, str]) -> str:
+    return str(uuid.UUID(bytes=value)) if type(value) is bytes else value
+
+
+def _pack_hex(value: str) -> Union[bytes, str]:
+    """32 bytes instead of a 64-char sha256 hex digest - only for lowercase hex that round-trips"""
+    try:
+        packed = bytes.fromhex(value)
+    except (ValueError, TypeError):
+        return value
+    return packed if packed.hex() == value else value
+
+
+def _unpack_hex(value: Union[bytes, str]) -> str:
+    return value.hex() if type(value) is bytes else value
+
+
+class ComplianceRecord:
+    """One ESG compliance check - loan_id is the key of the log it's stored in"""
+    
+    __slots__ = ("clause_id", "check_date", "status", "evidence", "notes", "metadata")
+    
+    def __init__(
+        self,
+        clause_id: str,
+        check_date: datetime,
+        status: str,
+        evidence: Optional[str] = None,
+        notes: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ):
+        self.clause_id = intern_str(clause_id)
+        self.check_date = check_date
+        self.status = intern_str(status)
+        self.evidence = evidence
+        self.notes = notes
+        self.metadata = pack_metadata(metadata)
+    
+    @classmethod
+    def from_model(cls, compliance: ESGCompliance) -> "ComplianceRecord":
+        return cls(
+            compliance.clause_id,
+            compliance.check_date,
+            compliance.status.value,
+            compliance.evidence,
+            compliance.notes,
+            compliance.metadata
+        )
+    
+    def to_model(self, loan_id: str) -> ESGCompliance:
+        return ESGCompliance(
+            clause_id=self.clause_id,
+            loan_id=loan_id,
+            check_date=self.check_date,
+            status=self.status,
+            evidence=self.evidence,
+            notes=self.notes,
+            metadata=unpack_metadata(self.metadata)
+        )
+
+
+class AuditRecord:
+    """One audit entry - to_entry() gives back exactly the dict AuditService built"""
+    
+    __slots__ = AUDIT_FIELDS + ("extra",)
+    
+    def __init__(self, entry: Dict[str, Any]):
+        self.id = _pack_uuid(entry["id"])
+        self.event_type = intern_str(entry["event_type"])
+        self.loan_id = entry["loan_id"]
+        self.user_id = intern_str(entry["user_id"])
+        # datetime, so query filters compare without parsing
+        self.timestamp = datetime.fromisoformat(entry["timestamp"])
+        self.description = entry["description"]
+        self.metadata = pack_metadata(entry.get("metadata"))
+        self.hash = _pack_hex(entry["hash"])
+        extra = {key: value for key, value in entry.items() if key not in AUDIT_FIELDS}
+        if self.timestamp.isoformat() != entry["timestamp"]:
+            # Not in isoformat() form - hand back the original text
+            extra["timestamp"] = entry["timestamp"]
+        self.extra = extra or None
+    
+    def to_entry(self) -> Dict[str, Any]:
+        entry = {
+            "id": _unpack_uuid(self.id),
+            "event_type": self.event_type,
+            "loan_id": self.loan_id,
+            "user_id": self.user_id,
+            "timestamp": self.timestamp.isoformat(),
+            "description": self.description,
+            "metadata": unpack_metadata(self.metadata),
+            "hash": _unpack_hex(self.hash)
+        }
+        if self.extra:
+            entry.update(self.extra)
+        return entry
@@ -0,0 +1,198 @@
+"""
+Bounded executors for prediction and scoring work
+NumPy inference and explanation building run here instead of on the event loop; audit
+writes, which block on the blockchain bridge, go to the default threadpool. A thread pool takes single-loan work, a process pool large
+batches; each admits at most workers + queue_size calls and rejects the rest, so a
+saturated worker answers 503 with Retry-After instead of queueing without bound.
+"""
+import asyncio
+import math
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+import numpy as np
+from starlette.exceptions import HTTPException
+
+DEFAULT_THREADS = min(4, os.cpu_count() or 1)
+# Spare cores only - with one core a process pool just adds pickling
+DEFAULT_PROCESSES = max((os.cpu_count() or 1) - 1, 0)
+DEFAULT_QUEUE_SIZE = 64
+# Batches of at least this many loans go to the process pool
+DEFAULT_PROCESS_BATCH_MIN = 5000
+# Recent calls kept per queue for the latency percentiles
+LATENCY_SAMPLES = 1000
+
+
+class ExecutorSaturated(Exception):
+    """A queue is full - the API answers 503 with Retry-After"""
+    
+    def __init__(self, queue: str, retry_after: int):
+        super().__init__(f"{queue} queue is full - retry in {retry_after}s")
+        self.queue = queue
+        self.retry_after = retry_after
+
+
+def _timed_call(fn: Callable, args: tuple) -> tuple:
+    # Runs in the worker - CLOCK_MONOTONIC is system-wide, so a process pool's times compare too
+    started = time.monotonic()
+    result = fn(*args)
+    return started, time.monotonic(), result
+
+
+class ComputeQueue:
+    """One executor with admission control and wait/run latency samples"""
+    
+    def __init__(self, name: str, make_executor: Callable[[], Executor], workers: int, queue_size: int):
+        self.name = name
+        self.workers = workers
+        self.queue_size = queue_size
+        # Created on first use - importing the app (tools, the reloader) shouldn't start workers
+        self._make_executor = make_executor
+        self._executor: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._wait_ms: deque = deque(maxlen=LATENCY_SAMPLES)
+        self._run_ms: deque = deque(maxlen=LATENCY_SAMPLES)
+    
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.queue_size
+    
+    @property
+    def full(self) -> bool:
+        return self.pending >= self.capacity
+    
+    def retry_after(self) -> int:
+        """Seconds until the queue has likely drained enough for one more call"""
+        run_seconds = float(np.mean(self._run_ms)) / 1000 if self._run_ms else 1.0
+        queued = max(self.pending - self.workers + 1, 1)
+        return max(1, math.ceil(queued * run_seconds / self.workers))
+    
+    def check(self) -> None:
+        """
+        Raises:
+            ExecutorSaturated: No room for another call
+        """
+        if self.full:
+            self.rejected += 1
+            raise ExecutorSaturated(self.name, self.retry_after())
+    
+    async def run(self, fn: Callable, *args: Any, wait: bool = False) -> Any:
+        """
+        Run fn(*args) on the pool
+        
+        Args:
+            wait: Wait for a slot instead of raising when the queue is full - for background
+                work and for requests already admitted with check()
+        
+        Raises:
+            ExecutorSaturated: Queue full and wait is False
+        """
+        if not wait:
+            self.check()
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.capacity)
+        # Pending from admission - callers still waiting for a slot count towards full and retry_after
+        self.pending += 1
+        submitted = time.monotonic()
+        try:
+            async with self._slots:
+                if self._executor is None:
+                    self._executor = self._make_executor()
+                started, finished, result = await asyncio.wrap_future(
+                    self._executor.submit(_timed_call, fn, args)
+                )
+        except HTTPException as e:
+            # A 4xx from fn (unknown loan, bad input) is an answer, not a pool failure
+            if e.status_code >= 500:
+                self.failed += 1
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.pending -= 1
+        self.completed += 1
+        self._wait_ms.append((started - submitted) * 1000)
+        self._run_ms.append((finished - started) * 1000)
+        return result
+    
+    def stats(self) -> Dict[str, Any]:
+        def percentiles(samples: deque) -> Dict[str, Optional[float]]:
+            if not samples:
+                return {"p50": None, "p95": None, "max": None}
+            p50, p95 = np.percentile(samples, [50, 95])
+            return {"p50": round(float(p50), 2), "p95": round(float(p95), 2), "max": round(max(samples), 2)}
+        
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "started": self._executor is not None,
+            "pending": self.pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "wait_ms": percentiles(self._wait_ms),
+            "run_ms": percentiles(self._run_ms)
+        }
+    
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+class ComputeExecutor:
+    """Thread queue for per-loan work, process queue (when enabled) for large batches"""
+    
+    def __init__(
+        self,
+        threads: int = DEFAULT_THREADS,
+        processes: int = DEFAULT_PROCESSES,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        process_batch_min: int = DEFAULT_PROCESS_BATCH_MIN
+    ):
+        self.process_batch_min = process_batch_min
+        self.threads = ComputeQueue(
+            "threads",
+            lambda: ThreadPoolExecutor(max_workers=threads, thread_name_prefix="compute"),
+            threads,
+            queue_size
+        )
+        self.processes = None
+        if processes > 0:
+            # spawn - forking a process with live threads and SQLite connections isn't safe
+            self.processes = ComputeQueue(
+                "processes",
+                lambda: ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn")),
+                processes,
+                queue_size
+            )
+    
+    def queue_for(self, batch_size: int) -> ComputeQueue:
+        """The queue a batch of batch_size loans runs on"""
+        if self.processes is not None and batch_size >= self.process_batch_min:
+            return self.processes
+        return self.threads
+    
+    async def run(self, fn: Callable, *args: Any, wait: bool = False) -> Any:
+        """Per-loan work on the thread queue - see ComputeQueue.run"""
+        return await self.threads.run(fn, *args, wait=wait)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "process_batch_min": self.process_batch_min,
+            "threads": self.threads.stats(),
+            "processes": self.processes.stats() if self.processes else None
+        }
+    
+    def shutdown(self) -> None:
+        self.threads.shutdown()
+        if self.processes is not None:
+            self.processes.shutdown()
@@ -0,0 +1,95 @@
+"""
+Covenant evaluation - breach and at-risk status for observed values
+Scalar form for single checks, NumPy form for bulk ingestion; both give the same answers
+"""
+from typing import Sequence, Tuple
+import numpy as np
+
+# Within this fraction of the threshold a compliant value is "at_risk"
+AT_RISK_MARGIN = 0.1
+# "==" covenants tolerate this much absolute difference
+EQUALITY_TOLERANCE = 0.01
+
+
+def evaluate_covenant(covenant, actual_value: float) -> bool:
+    """Check if covenant is breached based on operator and threshold"""
+    threshold = covenant.threshold
+    operator = covenant.operator
+
+    # Handle different comparison operators
+    if operator == ">":
+        return actual_value <= threshold
+    elif operator == "<":
+        return actual_value >= threshold
+    elif operator == ">=":
+        return actual_value < threshold
+    elif operator == "<=":
+        return actual_value > threshold
+    elif operator == "==":
+        # Use small epsilon for float comparison
+        return abs(actual_value - threshold) > EQUALITY_TOLERANCE
+    else:
+        # Unknown operator - default to not breached (conservative)
+        return False
+
+
+def covenant_status(is_breached: bool, actual_value: float, threshold: float) -> str:
+    """breached, at_risk if close to threshold, otherwise compliant"""
+    threshold_pct_diff = abs(actual_value - threshold) / threshold if threshold != 0 else float('inf')
+    if is_breached:
+        return "breached"
+    elif threshold_pct_diff < AT_RISK_MARGIN:
+        return "at_risk"
+    return "compliant"
+
+
+# Breach condition per operator, applied to whole arrays
+_BREACH_TESTS = {
+    ">": lambda actual, threshold: actual <= threshold,
+    "<": lambda actual, threshold: actual >= threshold,
+    ">=": lambda actual, threshold: actual < threshold,
+    "<=": lambda actual, threshold: actual > threshold,
+    "==": lambda actual, threshold: np.abs(actual - threshold) > EQUALITY_TOLERANCE,
+}
+
+# Status codes returned by evaluate_covenants - index into BATCH_STATUSES
+BATCH_STATUSES = ("compliant", "at_risk", "breached")
+COMPLIANT, AT_RISK, BREACHED = 0, 1, 2
+
+
+def evaluate_covenants(
+    actual_values: np.ndarray,
+    thresholds: np.ndarray,
+    operators: Sequence[str]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Evaluate a batch of observations - one comparison per distinct operator
+
+    Args:
+        actual_values: float64 observed values
+        thresholds: float64 covenant thresholds
+        operators: Covenant operator per observation
+
+    Returns:
+        (is_breached bool array, status code array - see BATCH_STATUSES)
+    """
+    actual_values = np.asarray(actual_values, dtype=np.float64)
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    operator_names, operator_codes = np.unique(np.asarray(operators, dtype=object).astype(str), return_inverse=True)
+
+    is_breached = np.zeros(len(actual_values), dtype=bool)
+    for code, operator in enumerate(operator_names):
+        test = _BREACH_TESTS.get(operator)
+        if test is None:
+            continue  # unknown operator - not breached, as in evaluate_covenant
+        mask = operator_codes == code
+        is_breached[mask] = test(actual_values[mask], thresholds[mask])
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct_diff = np.where(
+            thresholds != 0,
+            np.abs(actual_values - thresholds) / np.where(thresholds != 0, thresholds, 1.0),
+            np.inf
+        )
+    statuses = np.where(is_breached, BREACHED, np.where(pct_diff < AT_RISK_MARGIN, AT_RISK, COMPLIANT))
+    return is_breached, statuses
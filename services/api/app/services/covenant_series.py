@@ -0,0 +1,286 @@
+"""
+Per-covenant check history in typed arrays
+Replaces per-loan lists of CovenantCheck models in the in-memory store - models are only
+built when an API response asks for them
+"""
+from array import array
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from app.models import CovenantCheck, CovenantStatus
+from app.services.mvcc import visible_count
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+# Status codes stored in the int64 column - low byte is the status, BREACHED_FLAG marks is_breached
+STATUS_NAMES = tuple(s.value for s in CovenantStatus)
+STATUS_CODES = {name: code for code, name in enumerate(STATUS_NAMES)}
+BREACHED_FLAG = 1 << 8
+
+# Int column layout: check time (µs since epoch), status code, per-loan sequence number
+_TIME, _STATUS, _SEQ = 0, 1, 2
+# Float column layout: actual value (NaN when not measured), threshold
+_ACTUAL, _THRESHOLD = 0, 1
+
+_EMPTY_INTS = np.zeros((0, 3), dtype=np.int64)
+_EMPTY_FLOATS = np.zeros((0, 2), dtype=np.float64)
+
+
+def to_micros(dt: datetime) -> int:
+    """Exact µs since epoch - naive datetimes are kept as-is, aware ones converted to naive UTC"""
+    if dt.tzinfo is not None:
+        dt = (dt - dt.utcoffset()).replace(tzinfo=None)
+    return (dt - _EPOCH) // _MICROSECOND
+
+
+def from_micros(micros: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=int(micros))
+
+
+def encode_status(status: str, is_breached: bool) -> int:
+    code = STATUS_CODES[CovenantStatus(status).value]
+    return code | BREACHED_FLAG if is_breached else code
+
+
+class CovenantSeries:
+    """
+    Check history for one covenant, ordered by check date
+    In-order appends are amortized O(1); latest() is O(1); windows and ranges are a bisect plus a slice
+    
+    Rows below size are never rewritten in place - back-dated inserts and growth build new
+    arrays - and (ints, floats, size) is swapped as one tuple, so a concurrent reader
+    always sees a consistent prefix
+    """
+    
+    __slots__ = ("_state",)
+    
+    def __init__(self, capacity: int = 4):
+        self._state = (
+            np.zeros((capacity, 3), dtype=np.int64),
+            np.zeros((capacity, 2), dtype=np.float64),
+            0
+        )
+    
+    def __len__(self) -> int:
+        return self._state[2]
+    
+    @property
+    def size(self) -> int:
+        return self._state[2]
+    
+    @property
+    def check_times(self) -> np.ndarray:
+        ints, _, size = self._state
+        return ints[:size, _TIME]
+    
+    @property
+    def status_codes(self) -> np.ndarray:
+        ints, _, size = self._state
+        return ints[:size, _STATUS]
+    
+    @property
+    def seqs(self) -> np.ndarray:
+        ints, _, size = self._state
+        return ints[:size, _SEQ]
+    
+    @property
+    def actual_values(self) -> np.ndarray:
+        _, floats, size = self._state
+        return floats[:size, _ACTUAL]
+    
+    @property
+    def thresholds(self) -> np.ndarray:
+        _, floats, size = self._state
+        return floats[:size, _THRESHOLD]
+    
+    def append(
+        self,
+        check_micros: int,
+        status_code: int,
+        seq: int,
+        actual_value: Optional[float],
+        threshold_value: float
+    ) -> None:
+        ints, floats, size = self._state
+        int_row = (check_micros, status_code, seq)
+        float_row = (np.nan if actual_value is None else actual_value, threshold_value)
+        
+        # Checks usually arrive in date order - write past the end, then publish the new size
+        if not size or ints[size - 1, _TIME] <= check_micros:
+            if size == len(ints):
+                ints, floats = self._grown(ints, floats, size, len(ints) * 2)
+            ints[size] = int_row
+            floats[size] = float_row
+            self._state = (ints, floats, size + 1)
+            return
+        
+        # Back-dated check - build shifted copies so readers of the old arrays are untouched
+        position = int(np.searchsorted(ints[:size, _TIME], check_micros, side="right"))
+        capacity = len(ints) * 2 if size == len(ints) else len(ints)
+        new_ints = np.zeros((capacity, 3), dtype=np.int64)
+        new_floats = np.zeros((capacity, 2), dtype=np.float64)
+        new_ints[:position] = ints[:position]
+        new_floats[:position] = floats[:position]
+        new_ints[position] = int_row
+        new_floats[position] = float_row
+        new_ints[position + 1:size + 1] = ints[position:size]
+        new_floats[position + 1:size + 1] = floats[position:size]
+        self._state = (new_ints, new_floats, size + 1)
+    
+    @staticmethod
+    def _grown(ints: np.ndarray, floats: np.ndarray, size: int, capacity: int):
+        new_ints = np.zeros((capacity, 3), dtype=np.int64)
+        new_floats = np.zeros((capacity, 2), dtype=np.float64)
+        new_ints[:size] = ints[:size]
+        new_floats[:size] = floats[:size]
+        return new_ints, new_floats
+    
+    def latest_value(self) -> Optional[float]:
+        """Most recent actual value - O(1)"""
+        _, floats, size = self._state
+        if not size:
+            return None
+        value = floats[size - 1, _ACTUAL]
+        return None if np.isnan(value) else float(value)
+    
+    def last(self, n: int) -> range:
+        """Row positions of the n most recent checks, oldest first"""
+        size = self.size
+        return range(max(0, size - n), size)
+    
+    def between(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> range:
+        """Row positions of checks with start <= check_date <= end"""
+        times = self.check_times
+        lo = int(np.searchsorted(times, to_micros(start), side="left")) if start else 0
+        hi = int(np.searchsorted(times, to_micros(end), side="right")) if end else len(times)
+        return range(lo, max(lo, hi))
+    
+    def rows(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(ints, floats) views of the current rows - stable even if a writer appends meanwhile"""
+        ints, floats, size = self._state
+        return ints[:size], floats[:size]
+
+
+def _row(ints: np.ndarray, floats: np.ndarray, position: int) -> Tuple[int, int, int, float, float]:
+    """(check_micros, status_code, seq, actual_value, threshold) for one row"""
+    int_row = ints[position]
+    float_row = floats[position]
+    return int(int_row[0]), int(int_row[1]), int(int_row[2]), float(float_row[0]), float(float_row[1])
+
+
+class LoanCheckLog:
+    """
+    All covenant series for one loan, plus the rarely-set text fields kept sparsely by seq
+    seq is the per-loan insertion counter, so the original append order can be rebuilt
+    
+    versions[seq] is the store version that wrote the check - read methods take
+    visible (a seq count from visible_at) to answer as of a snapshot
+    """
+    
+    __slots__ = ("series", "next_seq", "notes", "metadata", "versions")
+    
+    def __init__(self):
+        self.series: Dict[str, CovenantSeries] = {}
+        self.next_seq = 0
+        self.notes: Dict[int, str] = {}
+        self.metadata: Dict[int, Dict[str, Any]] = {}
+        self.versions = array("q")
+    
+    def __len__(self) -> int:
+        return self.next_seq
+    
+    def append(
+        self,
+        covenant_id: str,
+        check_date: datetime,
+        status: str,
+        actual_value: Optional[float],
+        threshold_value: float,
+        is_breached: bool,
+        notes: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        version: int = 0
+    ) -> int:
+        """Record a check, returns its seq"""
+        seq = self.next_seq
+        series = self.series.get(covenant_id)
+        if series is None:
+            series = self.series[covenant_id] = CovenantSeries()
+        series.append(to_micros(check_date), encode_status(status, is_breached), seq, actual_value, threshold_value)
+        if notes is not None:
+            self.notes[seq] = notes
+        if metadata:
+            self.metadata[seq] = metadata
+        # Published last - snapshots count checks by version, so the row stays hidden until here
+        self.versions.append(version)
+        self.next_seq += 1
+        return seq
+    
+    def visible_at(self, version: int) -> int:
+        """Number of checks (by seq) written at or before version"""
+        return visible_count(self.versions, version)
+    
+    def _rows(self, covenant_id: str, visible: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+        series = self.series.get(covenant_id)
+        if series is None:
+            return _EMPTY_INTS, _EMPTY_FLOATS
+        ints, floats = series.rows()
+        if visible is not None:
+            mask = ints[:, _SEQ] < visible
+            if not mask.all():
+                ints, floats = ints[mask], floats[mask]
+        return ints, floats
+    
+    def _model(self, covenant_id: str, ints: np.ndarray, floats: np.ndarray, position: int) -> CovenantCheck:
+        """Build the API model for one stored row"""
+        micros, code, seq, actual, threshold = _row(ints, floats, position)
+        return CovenantCheck(
+            covenant_id=covenant_id,
+            check_date=from_micros(micros),
+            status=STATUS_NAMES[code & 0xFF],
+            actual_value=None if np.isnan(actual) else actual,
+            threshold_value=threshold,
+            is_breached=bool(code & BREACHED_FLAG),
+            notes=self.notes.get(seq),
+            metadata=dict(self.metadata.get(seq, {}))
+        )
+    
+    def checks(self, visible: Optional[int] = None) -> List[CovenantCheck]:
+        """Every check in original insertion order"""
+        ordered = []
+        for covenant_id in list(self.series):
+            ints, floats = self._rows(covenant_id, visible)
+            for position, seq in enumerate(ints[:, _SEQ].tolist()):
+                ordered.append((seq, covenant_id, ints, floats, position))
+        ordered.sort(key=lambda entry: entry[0])
+        return [self._model(covenant_id, ints, floats, position) for _, covenant_id, ints, floats, position in ordered]
+    
+    def latest(self, covenant_id: str, visible: Optional[int] = None) -> Optional[CovenantCheck]:
+        ints, floats = self._rows(covenant_id, visible)
+        if not len(ints):
+            return None
+        return self._model(covenant_id, ints, floats, len(ints) - 1)
+    
+    def recent(self, covenant_id: str, n: int, visible: Optional[int] = None) -> List[CovenantCheck]:
+        ints, floats = self._rows(covenant_id, visible)
+        return [self._model(covenant_id, ints, floats, position) for position in range(max(0, len(ints) - n), len(ints))]
+    
+    def between(
+        self,
+        covenant_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        visible: Optional[int] = None
+    ) -> List[CovenantCheck]:
+        ints, floats = self._rows(covenant_id, visible)
+        times = ints[:, _TIME]
+        lo = int(np.searchsorted(times, to_micros(start), side="left")) if start else 0
+        hi = int(np.searchsorted(times, to_micros(end), side="right")) if end else len(times)
+        return [self._model(covenant_id, ints, floats, position) for position in range(lo, hi)]
+    
+    def count(self, covenant_id: str, visible: Optional[int] = None) -> int:
+        if visible is None:
+            series = self.series.get(covenant_id)
+            return series.size if series else 0
+        return len(self._rows(covenant_id, visible)[0])
@@ -1,22 +1,95 @@
 """
 Digital twin service - manages loan state and lifecycle
-Using in-memory dicts for hackathon, would use DB in production
+Storage is pluggable - in-memory dicts by default, SQLite via twin_store
 """
 import uuid
-from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional
+import threading
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Any, Iterable, List, Optional, Tuple
 from app.models import Loan, Covenant, ESGClause, CovenantCheck, ESGCompliance
+from app.services.twin_store import InMemoryTwinStore, HEALTH_COUNTERS, loan_matches
+from app.services.twin_indexes import TwinIndexes
+from app.services.portfolio_columns import PortfolioColumns
+from app.services.schedule_index import ScheduleIndex, next_occurrence
+
+# Sections get_twin_state can return - callers pick the ones they render
+TWIN_STATE_SECTIONS = ("loan", "covenant_checks", "esg_compliance", "health_metrics")
 
 
 class DigitalTwinService:
     """Manages loan digital twins - state, checks, compliance records"""
     
-    def __init__(self):
-        # In-memory for demo - easy to swap for DB later
-        self.twins: Dict[str, Loan] = {}
-        self.covenant_checks: Dict[str, List[CovenantCheck]] = {}
-        self.esg_compliance: Dict[str, List[ESGCompliance]] = {}
-        # TODO: Add persistence layer (SQLite for demo, Postgres for prod)
+    def __init__(self, store=None):
+        # In-memory by default - pass a SQLiteTwinStore to persist across restarts
+        self.store = store or InMemoryTwinStore()
+        # Secondary indexes - status/metadata equality and maturity/start ranges without a full scan
+        self.indexes = TwinIndexes()
+        # Columnar mirror of the scalar loan fields for vectorized portfolio aggregates
+        self.columns = PortfolioColumns()
+        # Upcoming covenant checks and ESG reports across the portfolio, soonest first
+        self.schedule = ScheduleIndex()
+        # Read the change log position first - anything committed while building is replayed by refresh()
+        self._synced_version = self.store.current_version()
+        self._refresh_lock = threading.Lock()
+        # Called with (loan_id, change kind) after every write, local or replayed by refresh()
+        self._subscribers: List[Callable[[str, str], None]] = []
+        for seq, loan in self.store.list_loans():
+            self.indexes.add(loan, seq)
+            self.columns.add(loan)
+            self.schedule.add_loan(loan)
+    
+    def subscribe(self, callback: Callable[[str, str], None]) -> None:
+        """Register a change callback - kinds are twin_store.CHANGE_KINDS"""
+        self._subscribers.append(callback)
+    
+    def _notify(self, loan_ids: Iterable[str], kind: str) -> None:
+        if not self._subscribers:
+            return
+        for loan_id in loan_ids:
+            for callback in self._subscribers:
+                callback(loan_id, kind)
+    
+    def refresh(self) -> int:
+        """
+        Apply changes other worker processes committed to the shared store
+        Indexes and columns live per process - the store's change log keeps them in step
+        
+        Returns:
+            Number of change log entries applied
+        """
+        with self._refresh_lock:
+            changes = self.store.changes_since(self._synced_version)
+            if not changes:
+                return 0
+            
+            # This process's own writes were applied (and notified) when they were made
+            origin = getattr(self.store, "origin", None)
+            touched: Dict[str, set] = {}
+            for _, loan_id, kind, change_origin in changes:
+                if change_origin is None or change_origin != origin:
+                    touched.setdefault(loan_id, set()).add(kind)
+            
+            for loan_id, kinds in touched.items():
+                for kind in kinds:
+                    self._notify((loan_id,), kind)
+                if not kinds & {"loan_created", "status_changed", "loan_updated"}:
+                    continue
+                loan = self.store.get_loan(loan_id)
+                if loan is None:
+                    continue
+                if "loan_created" in kinds:
+                    seq = self.store.get_loan_seq(loan_id)
+                    self.indexes.add(loan, seq)
+                    self.columns.add(loan)
+                # Re-indexing from the current loan replaces whatever was scheduled before
+                self.schedule.add_loan(loan)
+                # Current status from the store, so replay order doesn't matter
+                self.indexes.update_status(loan_id, loan.status)
+                self.columns.update_status(loan_id, loan.status)
+            
+            self._synced_version = changes[-1][0]
+            return len(changes)
     
     def create_digital_twin(
         self,
@@ -60,26 +133,285 @@ class DigitalTwinService:
             metadata=metadata or {}
         )
         
-        self.twins[loan_id] = loan
-        self.covenant_checks[loan_id] = []
-        self.esg_compliance[loan_id] = []
+        seq = self.store.put_loan(loan)
+        self.indexes.add(loan, seq)
+        self.columns.add(loan)
+        self.schedule.add_loan(loan)
+        self._notify((loan.id,), "loan_created")
         
         return loan
     
+    def import_digital_twins(self, loans: List[Loan]) -> List[int]:
+        """
+        Store a batch of already-validated loans (bulk import) in one store write
+        
+        Returns:
+            Store seqs of the created loans, in order
+        """
+        seqs = self.store.put_loans(loans)
+        for loan, seq in zip(loans, seqs):
+            self.indexes.add(loan, seq)
+            self.columns.add(loan)
+            self.schedule.add_loan(loan)
+        self._notify((loan.id for loan in loans), "loan_created")
+        return seqs
+    
+    def loan_version_tag(self, loan_id: str) -> Optional[str]:
+        """
+        Changes whenever the loan, its checks or its compliance records change -
+        None if the loan was never written
+        """
+        version = self.store.loan_version(loan_id)
+        return f"{self.store.epoch}.{version}" if version else None
+    
+    def portfolio_version_tag(self) -> str:
+        """Changes on every twin mutation anywhere in the portfolio"""
+        return f"{self.store.epoch}.{self.store.current_version()}"
+    
     def get_digital_twin(self, loan_id: str) -> Optional[Loan]:
         """Retrieve a digital twin by ID"""
-        return self.twins.get(loan_id)
+        return self.store.get_loan(loan_id)
     
     def get_all_twins(self) -> List[Loan]:
         """Get all digital twins"""
-        return list(self.twins.values())
+        return self.store.get_all_loans()
+    
+    def get_all_twin_ids(self) -> List[str]:
+        """Ids of all digital twins, in creation order - cheaper than loading the twins"""
+        return self.store.list_loan_ids()
+    
+    def list_twins(
+        self,
+        after_seq: int = 0,
+        limit: Optional[int] = None,
+        **filters
+    ) -> Tuple[List[Loan], Optional[int]]:
+        """
+        One page of digital twins in creation order
+        
+        Args:
+            after_seq: Resume after this position (0 = from the start)
+            limit: Page size (None = everything that matches)
+            **filters: status, industry, maturity_from, maturity_to, min_amount, max_amount
+        
+        Returns:
+            (loans, next_seq) - next_seq is None on the last page
+        """
+        self.refresh()
+        candidates = self._indexed_candidates(filters)
+        if candidates is not None:
+            return self._page_from_candidates(candidates, after_seq, limit, filters)
+        
+        # Nothing indexable - scan the store. Ask for one extra row to know whether another page exists
+        rows = self.store.list_loans(
+            after_seq=after_seq,
+            limit=limit + 1 if limit is not None else None,
+            **filters
+        )
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            return [loan for _, loan in rows], rows[-1][0]
+        return [loan for _, loan in rows], None
+    
+    def _indexed_candidates(self, filters: Dict[str, Any]) -> Optional[List[int]]:
+        """
+        Seq-sorted candidate list from the most selective usable index,
+        or None when no filter is indexed
+        """
+        options = []
+        if filters.get("status") is not None:
+            options.append(self.indexes.seqs_with_status(filters["status"]))
+        if filters.get("industry") is not None:
+            options.append(self.indexes.seqs_with_metadata("industry", filters["industry"]))
+        
+        maturity_from = filters.get("maturity_from")
+        maturity_to = filters.get("maturity_to")
+        if maturity_from is not None or maturity_to is not None:
+            # Only materialize the range if it beats the posting lists
+            in_range = self.indexes.count_between(maturity_from, maturity_to)
+            if not options or in_range < min(len(o) for o in options):
+                options.append(sorted(self.indexes.seqs_maturing_between(maturity_from, maturity_to)))
+        
+        if not options:
+            return None
+        return min(options, key=len)
+    
+    def _page_from_candidates(
+        self,
+        candidates: List[int],
+        after_seq: int,
+        limit: Optional[int],
+        filters: Dict[str, Any]
+    ) -> Tuple[List[Loan], Optional[int]]:
+        """Walk a seq-sorted candidate list from the cursor, applying the remaining filters"""
+        loans: List[Loan] = []
+        last_seq = None
+        for seq in candidates[bisect_right(candidates, after_seq):]:
+            loan = self.store.get_loan(self.indexes.loan_id(seq))
+            if loan is None or not loan_matches(loan, filters):
+                continue
+            if limit is not None and len(loans) == limit:
+                return loans, last_seq
+            loans.append(loan)
+            last_seq = seq
+        return loans, None
+    
+    def get_loans_maturing_within(
+        self,
+        days: int,
+        status: Optional[str] = "active"
+    ) -> List[Loan]:
+        """
+        Loans maturing between now and now + days, soonest first
+        Same signal RiskPredictionModel flags per loan (< 180 days), answered portfolio-wide from the index
+        """
+        self.refresh()
+        now = datetime.now()
+        loans = []
+        for seq in self.indexes.seqs_maturing_between(now, now + timedelta(days=days)):
+            loan_id = self.indexes.loan_id(seq)
+            if status is not None and self.indexes.status_of(loan_id) != status:
+                continue
+            loan = self.store.get_loan(loan_id)
+            if loan:
+                loans.append(loan)
+        return loans
+    
+    def get_due_items(
+        self,
+        within_days: int,
+        limit: Optional[int] = 100,
+        kind: Optional[str] = None,
+        status: Optional[str] = "active",
+        include_overdue: bool = True
+    ) -> List[Dict[str, Any]]:
+        """
+        Covenant checks and ESG reports due between now and now + within_days, soonest first
+        Walks the schedule index from the window start and stops after limit items
+        
+        Args:
+            within_days: Look-ahead window in days
+            limit: Maximum items to return (None = all in the window)
+            kind: Only "covenant_check" or "esg_report" items (default: both)
+            status: Only items on loans with this status (default: active)
+            include_overdue: Also return items whose date has already passed
+        """
+        self.refresh()
+        now = datetime.now()
+        items = []
+        for item in self.schedule.due_between(None if include_overdue else now, now + timedelta(days=within_days)):
+            if kind is not None and item["kind"] != kind:
+                continue
+            if status is not None and self.indexes.status_of(item["loan_id"]) != status:
+                continue
+            if limit is not None and len(items) == limit:
+                break
+            items.append({
+                **item,
+                "days_until_due": (item["due_date"] - now).days,
+                "overdue": item["due_date"] < now
+            })
+        return items
+    
+    def reschedule_covenant(self, loan_id: str, covenant_id: str, next_check_date: datetime) -> Optional[Covenant]:
+        """Move a covenant's next check date - returns the updated covenant, None if loan or covenant is unknown"""
+        loan = self.store.get_loan(loan_id)
+        if loan is None or not any(c.id == covenant_id for c in loan.covenants):
+            return None
+        loan = loan.model_copy(update={"covenants": [
+            c.model_copy(update={"next_check_date": next_check_date}) if c.id == covenant_id else c
+            for c in loan.covenants
+        ]})
+        if not self.store.update_loan(loan):
+            return None
+        self.schedule.add_loan(loan)
+        self._notify((loan.id,), "loan_updated")
+        return next(c for c in loan.covenants if c.id == covenant_id)
+    
+    def reschedule_esg_clause(self, loan_id: str, clause_id: str, next_report_date: datetime) -> Optional[ESGClause]:
+        """Move an ESG clause's next report date - returns the updated clause, None if loan or clause is unknown"""
+        loan = self.store.get_loan(loan_id)
+        if loan is None or not any(e.id == clause_id for e in loan.esg_clauses):
+            return None
+        loan = loan.model_copy(update={"esg_clauses": [
+            e.model_copy(update={"next_report_date": next_report_date}) if e.id == clause_id else e
+            for e in loan.esg_clauses
+        ]})
+        if not self.store.update_loan(loan):
+            return None
+        self.schedule.add_loan(loan)
+        self._notify((loan.id,), "loan_updated")
+        return next(e for e in loan.esg_clauses if e.id == clause_id)
+    
+    def advance_schedule(self, loan_id: str, now: Optional[datetime] = None) -> Optional[Loan]:
+        """
+        Move every covenant check and ESG report dated at or before now to its next
+        occurrence on the clause's frequency - one store write for the whole loan
+        
+        Returns:
+            The loan as stored afterwards, None if it doesn't exist
+        """
+        now = now or datetime.now()
+        loan = self.store.get_loan(loan_id)
+        if loan is None:
+            return None
+        covenants = [
+            c.model_copy(update={"next_check_date": next_occurrence(c.next_check_date, c.frequency, now)})
+            if c.next_check_date <= now else c
+            for c in loan.covenants
+        ]
+        esg_clauses = [
+            e.model_copy(update={"next_report_date": next_occurrence(e.next_report_date, e.reporting_frequency, now)})
+            if e.next_report_date <= now else e
+            for e in loan.esg_clauses
+        ]
+        if covenants == loan.covenants and esg_clauses == loan.esg_clauses:
+            return loan
+        loan = loan.model_copy(update={"covenants": covenants, "esg_clauses": esg_clauses})
+        if not self.store.update_loan(loan):
+            return None
+        self.schedule.add_loan(loan)
+        self._notify((loan.id,), "loan_updated")
+        return loan
+    
+    def next_due_date(self) -> Optional[datetime]:
+        """Earliest covenant check or ESG report date in the portfolio"""
+        return self.schedule.next_due()
+    
+    def save_scores(self, loan_id: str, input_version: int, scores: Dict[str, Any]) -> None:
+        """Store precomputed predictions along with the loan version they were computed from"""
+        self.store.put_loan_scores(loan_id, {
+            **scores,
+            "input_version": input_version,
+            "scored_at": datetime.now().isoformat()
+        })
+    
+    def get_fresh_scores(self, loan_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Precomputed predictions, or None if there are none, the loan changed since or they
+        were scored on an earlier day - loan age and days to maturity/next check move with
+        the date even when the loan is never written
+        """
+        scores = self.store.get_loan_scores(loan_id)
+        if scores is None or scores.get("input_version") != self.store.loan_version(loan_id):
+            return None
+        if scores.get("scored_at", "")[:10] != date.today().isoformat():
+            return None
+        return scores
+    
+    def get_portfolio_stats(self, status: Optional[str] = None) -> Dict[str, Any]:
+        """Vectorized portfolio aggregates from the columnar store"""
+        self.refresh()
+        return self.columns.summary(status=status)
     
     def update_twin_status(self, loan_id: str, status: str) -> bool:
         """Update the status of a digital twin"""
-        if loan_id in self.twins:
-            self.twins[loan_id].status = status
-            return True
-        return False
+        updated = self.store.update_loan_status(loan_id, status)
+        if updated:
+            self.indexes.update_status(loan_id, status)
+            self.columns.update_status(loan_id, status)
+            self._notify((loan_id,), "status_changed")
+        return updated
     
     def add_covenant_check(
         self,
@@ -93,7 +425,8 @@ class DigitalTwinService:
         notes: Optional[str] = None
     ) -> CovenantCheck:
         """Record a covenant check result"""
-        check = CovenantCheck(
+        self.store.append_covenant_check(
+            loan_id=loan_id,
             covenant_id=covenant_id,
             check_date=check_date,
             status=status,
@@ -102,16 +435,49 @@ class DigitalTwinService:
             is_breached=is_breached,
             notes=notes
         )
+        self._notify((loan_id,), "covenant_check")
         
-        if loan_id not in self.covenant_checks:
-            self.covenant_checks[loan_id] = []
-        
-        self.covenant_checks[loan_id].append(check)
-        return check
+        # Stored as raw columns - the model is only for the caller's response
+        return CovenantCheck(
+            covenant_id=covenant_id,
+            check_date=check_date,
+            status=status,
+            actual_value=actual_value,
+            threshold_value=threshold_value,
+            is_breached=is_breached,
+            notes=notes
+        )
+    
+    def add_covenant_checks(self, rows: List[Tuple]) -> None:
+        """Record a batch of evaluated checks - tuples in twin_store.CHECK_ROW_FIELDS order"""
+        self.store.append_covenant_checks(rows)
+        self._notify(dict.fromkeys(row[0] for row in rows), "covenant_check")
     
     def get_covenant_checks(self, loan_id: str) -> List[CovenantCheck]:
         """Get all covenant checks for a loan"""
-        return self.covenant_checks.get(loan_id, [])
+        return self.store.get_covenant_checks(loan_id)
+    
+    def get_latest_covenant_check(self, loan_id: str, covenant_id: str) -> Optional[CovenantCheck]:
+        """Most recent check (by check date) for one covenant"""
+        return self.store.get_latest_covenant_check(loan_id, covenant_id)
+    
+    def get_recent_covenant_checks(self, loan_id: str, covenant_id: str, n: int) -> List[CovenantCheck]:
+        """Last n checks (by check date) for one covenant, oldest first"""
+        return self.store.get_recent_covenant_checks(loan_id, covenant_id, n)
+    
+    def get_covenant_checks_between(
+        self,
+        loan_id: str,
+        covenant_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> List[CovenantCheck]:
+        """Checks for one covenant with start <= check_date <= end"""
+        return self.store.get_covenant_checks_between(loan_id, covenant_id, start, end)
+    
+    def count_covenant_checks(self, loan_id: str, covenant_id: str) -> int:
+        """Number of checks recorded for one covenant"""
+        return self.store.count_covenant_checks(loan_id, covenant_id)
     
     def add_esg_compliance(
         self,
@@ -132,51 +498,143 @@ class DigitalTwinService:
             notes=notes
         )
         
-        if loan_id not in self.esg_compliance:
-            self.esg_compliance[loan_id] = []
-        
-        self.esg_compliance[loan_id].append(compliance)
+        self.store.append_esg_compliance(loan_id, compliance)
+        self._notify((loan_id,), "esg_compliance")
         return compliance
     
+    def add_esg_compliances(self, records: List[ESGCompliance]) -> None:
+        """Record a batch of ESG compliance checks"""
+        self.store.append_esg_compliances([(record.loan_id, record) for record in records])
+        self._notify(dict.fromkeys(record.loan_id for record in records), "esg_compliance")
+    
     def get_esg_compliance(self, loan_id: str) -> List[ESGCompliance]:
         """Get all ESG compliance records for a loan"""
-        return self.esg_compliance.get(loan_id, [])
+        return self.store.get_esg_compliance(loan_id)
     
-    def get_twin_state(self, loan_id: str) -> Dict[str, Any]:
-        """Get full twin state with health metrics - used by frontend dashboard"""
-        loan = self.get_digital_twin(loan_id)
-        if not loan:
-            return None
+    def get_twin_state(
+        self,
+        loan_id: str,
+        sections: Optional[Iterable[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Get twin state with health metrics - used by frontend dashboard
         
-        covenant_checks = self.get_covenant_checks(loan_id)
-        esg_compliance = self.get_esg_compliance(loan_id)
-        
-        # Calculate health metrics
-        total_covenants = len(loan.covenants)
-        breached_covenants = sum(1 for check in covenant_checks if check.is_breached)
-        at_risk_covenants = sum(1 for check in covenant_checks if check.status == "at_risk")
-        
-        # ESG metrics
-        total_esg_clauses = len(loan.esg_clauses)
-        non_compliant_esg = sum(1 for comp in esg_compliance if comp.status == "non_compliant")
-        
-        # Avoid division by zero
-        compliance_rate = (total_covenants - breached_covenants) / total_covenants if total_covenants > 0 else 1.0
-        esg_compliance_rate = (total_esg_clauses - non_compliant_esg) / total_esg_clauses if total_esg_clauses > 0 else 1.0
-        
-        return {
-            "loan": loan.dict(),
-            "covenant_checks": [check.dict() for check in covenant_checks],
-            "esg_compliance": [comp.dict() for comp in esg_compliance],
-            "health_metrics": {
-                "total_covenants": total_covenants,
-                "breached_covenants": breached_covenants,
-                "at_risk_covenants": at_risk_covenants,
-                "compliance_rate": compliance_rate,
-                "total_esg_clauses": total_esg_clauses,
-                "non_compliant_esg": non_compliant_esg,
-                "esg_compliance_rate": esg_compliance_rate
-            },
-            "last_updated": datetime.now().isoformat()
-        }
+        Args:
+            loan_id: Loan ID
+            sections: Subset of TWIN_STATE_SECTIONS to include (default: all).
+                Check histories are only loaded and serialized when asked for.
+        """
+        sections = set(TWIN_STATE_SECTIONS if sections is None else sections)
+        # One snapshot so the counters agree with the histories returned next to them
+        with self.snapshot() as view:
+            loan = view.get_loan(loan_id)
+            if not loan:
+                return None
+            
+            state: Dict[str, Any] = {}
+            if "loan" in sections:
+                state["loan"] = loan.model_dump()
+            if "covenant_checks" in sections:
+                state["covenant_checks"] = [check.model_dump() for check in view.get_covenant_checks(loan_id)]
+            if "esg_compliance" in sections:
+                state["esg_compliance"] = [comp.model_dump() for comp in view.get_esg_compliance(loan_id)]
+            if "health_metrics" in sections:
+                state["health_metrics"] = self.get_health_metrics(loan, view)
+        state["last_updated"] = datetime.now().isoformat()
+        
+        return state
+    
+    def snapshot(self):
+        """
+        Consistent read-only view of the store for long reads (aggregates, exports, rescoring)
+        Context manager - the view has the store's read methods and a version attribute
+        """
+        return self.store.snapshot()
+    
+    def get_health_metrics(self, loan: Loan, view=None) -> Dict[str, Any]:
+        """Health metrics from the per-loan counters - O(1), no rescan of check history"""
+        row = (view or self.store).get_health_row(loan.id)
+        if row is None:
+            # Nothing recorded against this loan yet
+            row = {
+                "total_covenants": len(loan.covenants),
+                "total_esg_clauses": len(loan.esg_clauses),
+                **dict.fromkeys(HEALTH_COUNTERS, 0)
+            }
+        return _health_metrics_from_row(row)
+    
+    def get_portfolio_summary(self) -> List[Dict[str, Any]]:
+        """
+        Health summary for every loan from the materialized health rows
+        One pass over the rows of a single snapshot - no loan decoding, no check history
+        """
+        summaries = []
+        with self.snapshot() as view:
+            rows = view.get_health_rows()
+        for row in rows:
+            summaries.append({
+                "loan_id": row["loan_id"],
+                "borrower_name": row["borrower_name"],
+                "status": row["status"],
+                **summarize_health(_health_metrics_from_row(row))
+            })
+        return summaries
+
+
+def _health_metrics_from_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    total_covenants = row["total_covenants"]
+    breached_covenants = row["breached_covenants"]
+    at_risk_covenants = row["at_risk_covenants"]
+    
+    # ESG metrics
+    total_esg_clauses = row["total_esg_clauses"]
+    non_compliant_esg = row["non_compliant_esg"]
+    
+    # Avoid division by zero
+    compliance_rate = (total_covenants - breached_covenants) / total_covenants if total_covenants > 0 else 1.0
+    esg_compliance_rate = (total_esg_clauses - non_compliant_esg) / total_esg_clauses if total_esg_clauses > 0 else 1.0
+    
+    return {
+        "total_covenants": total_covenants,
+        "breached_covenants": breached_covenants,
+        "at_risk_covenants": at_risk_covenants,
+        "compliance_rate": compliance_rate,
+        "total_esg_clauses": total_esg_clauses,
+        "non_compliant_esg": non_compliant_esg,
+        "esg_compliance_rate": esg_compliance_rate
+    }
 
+
+def summarize_health(health_metrics: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Health score (0-100) plus covenant/ESG status buckets as the frontend shows them
+    Shared by /loans/{id}/state and /portfolio/summary so both agree
+    """
+    total_covenants = health_metrics.get("total_covenants", 0)
+    breached_covenants = health_metrics.get("breached_covenants", 0)
+    at_risk_covenants = health_metrics.get("at_risk_covenants", 0)
+    compliant_covenants = total_covenants - breached_covenants - at_risk_covenants
+    
+    total_esg = health_metrics.get("total_esg_clauses", 0)
+    non_compliant_esg = health_metrics.get("non_compliant_esg", 0)
+    at_risk_esg = 0  # Not tracked separately in backend yet
+    compliant_esg = total_esg - non_compliant_esg - at_risk_esg
+    
+    # Calculate health score (0-100)
+    compliance_rate = health_metrics.get("compliance_rate", 1.0)
+    esg_compliance_rate = health_metrics.get("esg_compliance_rate", 1.0)
+    health_score = int((compliance_rate * 0.7 + esg_compliance_rate * 0.3) * 100)
+    
+    return {
+        "health_score": health_score,
+        "covenant_status": {
+            "compliant": max(0, compliant_covenants),
+            "at_risk": at_risk_covenants,
+            "breached": breached_covenants
+        },
+        "esg_status": {
+            "compliant": max(0, compliant_esg),
+            "at_risk": at_risk_esg,
+            "non_compliant": non_compliant_esg
+        }
+    }
@@ -0,0 +1,92 @@
+"""
+Loan feature store - per-loan feature blocks (counts, rates, check dates) keyed by loan version
+A prediction only computes the reference-time and horizon columns from a stored block; the
+walk over covenants, clauses and check history happens once per loan version
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+from app.ai.feature_engineering import LoanFeatureBlock
+
+DEFAULT_MAX_LOANS = 50000
+
+
+class FeatureStore:
+    """Thread-safe LRU of loan_id -> (version, LoanFeatureBlock)"""
+    
+    def __init__(self, max_loans: int = DEFAULT_MAX_LOANS):
+        self.max_loans = max_loans
+        self._blocks: "OrderedDict[str, Tuple[str, LoanFeatureBlock]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Check dates held across all blocks - the part of a block that grows
+        self._check_dates = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return self.max_loans > 0
+    
+    def get(self, loan_id: str, version: str) -> Optional[LoanFeatureBlock]:
+        """The block for this exact version, or None"""
+        with self._lock:
+            entry = self._blocks.get(loan_id)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                if entry is not None:
+                    self.stale += 1
+                return None
+            self._blocks.move_to_end(loan_id)
+            self.hits += 1
+            return entry[1]
+    
+    def put(self, loan_id: str, version: str, block: LoanFeatureBlock) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            previous = self._blocks.pop(loan_id, None)
+            if previous is not None:
+                self._check_dates -= len(previous[1].check_us)
+            self._blocks[loan_id] = (version, block)
+            self._check_dates += len(block.check_us)
+            while len(self._blocks) > self.max_loans:
+                _, (_, evicted) = self._blocks.popitem(last=False)
+                self._check_dates -= len(evicted.check_us)
+                self.evictions += 1
+    
+    def get_or_build(
+        self,
+        loan_id: str,
+        version: Optional[str],
+        build: Callable[[], LoanFeatureBlock]
+    ) -> LoanFeatureBlock:
+        """Stored block for the version, else build() and store it (no version: never stored)"""
+        if version is None:
+            return build()
+        block = self.get(loan_id, version)
+        if block is None:
+            block = build()
+            self.put(loan_id, version, block)
+        return block
+    
+    def invalidate_loan(self, loan_id: str, kind: Optional[str] = None) -> None:
+        """Free a loan's block once a write makes it stale - DigitalTwinService subscriber"""
+        with self._lock:
+            entry = self._blocks.pop(loan_id, None)
+            if entry is not None:
+                self._check_dates -= len(entry[1].check_us)
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "loans": len(self._blocks),
+            "max_loans": self.max_loans,
+            "check_dates_held": self._check_dates,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions
+        }
@@ -0,0 +1,124 @@
+"""
+Multi-version building blocks for the in-memory twin store
+Writers never mutate a value a reader might hold - they install a new version and,
+while snapshots are pinned, keep the old one on a per-key chain until no reader needs it
+"""
+import threading
+from bisect import bisect_right
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Tuple
+
+# Returned by VersionedMap.get_at when the key didn't exist at that version
+MISSING = object()
+
+
+class SnapshotRegistry:
+    """Pinned snapshot versions with reference counts"""
+    
+    def __init__(self):
+        self._pins: Dict[int, int] = {}
+        self._lock = threading.Lock()
+    
+    def __bool__(self) -> bool:
+        return bool(self._pins)
+    
+    def __len__(self) -> int:
+        return sum(self._pins.values())
+    
+    def pin(self, version: int) -> None:
+        with self._lock:
+            self._pins[version] = self._pins.get(version, 0) + 1
+    
+    def release(self, version: int) -> None:
+        with self._lock:
+            count = self._pins[version] - 1
+            if count:
+                self._pins[version] = count
+            else:
+                del self._pins[version]
+    
+    def oldest(self) -> Optional[int]:
+        with self._lock:
+            return min(self._pins) if self._pins else None
+
+
+class VersionedMap:
+    """
+    Dict whose entries carry the version they were written at
+    Latest reads are a plain dict lookup; get_at(key, version) walks the key's chain of
+    superseded values, newest first. Chains only exist while snapshots are pinned.
+    """
+    
+    __slots__ = ("_head", "_chains")
+    
+    def __init__(self):
+        # key -> (written_at, value) - one tuple so readers never see a torn pair
+        self._head: Dict[Hashable, Tuple[int, Any]] = {}
+        # key -> superseded (written_at, value), oldest first. Replaced wholesale, never mutated by GC
+        self._chains: Dict[Hashable, List[Tuple[int, Any]]] = {}
+    
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._head
+    
+    def __len__(self) -> int:
+        return len(self._head)
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._head.get(key)
+        return entry[1] if entry is not None else default
+    
+    def values(self) -> Iterator[Any]:
+        return (value for _, value in list(self._head.values()))
+    
+    def put(self, key: Hashable, value: Any, version: int, keep_old: bool) -> None:
+        """Install value as of version - keep_old preserves the replaced value for pinned readers"""
+        old = self._head.get(key)
+        if keep_old and old is not None:
+            # Chain first, head second - a reader that sees the new head finds the old value
+            self._chains[key] = self._chains.get(key, []) + [old]
+        self._head[key] = (version, value)
+    
+    def get_at(self, key: Hashable, version: int) -> Any:
+        """Value as of version, or MISSING if the key was written later"""
+        entry = self._head.get(key)
+        if entry is None:
+            return MISSING
+        if entry[0] <= version:
+            return entry[1]
+        for written_at, value in reversed(self._chains.get(key, ())):
+            if written_at <= version:
+                return value
+        return MISSING
+    
+    def collect(self, oldest: Optional[int]) -> int:
+        """
+        Drop superseded values no pinned snapshot can see - call under the writers' lock
+        oldest: oldest pinned version, None when nothing is pinned
+        
+        Returns:
+            Number of values dropped
+        """
+        if oldest is None:
+            dropped = sum(len(chain) for chain in self._chains.values())
+            self._chains = {}
+            return dropped
+        
+        dropped = 0
+        chains = {}
+        for key, chain in self._chains.items():
+            # An old value is still visible to the oldest reader only if its successor came later
+            successors = [written_at for written_at, _ in chain[1:]] + [self._head[key][0]]
+            kept = [entry for entry, superseded_at in zip(chain, successors) if superseded_at > oldest]
+            dropped += len(chain) - len(kept)
+            if kept:
+                chains[key] = kept
+        self._chains = chains
+        return dropped
+    
+    def chained(self) -> int:
+        """Superseded values currently retained"""
+        return sum(len(chain) for chain in self._chains.values())
+
+
+def visible_count(versions: List[int], version: int) -> int:
+    """Prefix of an append-only log (parallel list of write versions) visible at version"""
+    return bisect_right(versions, version)
@@ -0,0 +1,198 @@
+"""
+Columnar portfolio mirror - scalar loan fields in growable NumPy arrays
+Lets portfolio aggregates run as single vectorized passes instead of Python loops over Loan objects
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+from app.models import Loan, CovenantType, ESGCategory
+
+SECONDS_PER_DAY = 86400
+
+# Column order for the per-type count matrices - anything unrecognised lands in "other"
+COVENANT_TYPES = tuple(t.value for t in CovenantType) + ("other",)
+ESG_CATEGORIES = tuple(c.value for c in ESGCategory) + ("other",)
+
+# Default maturity buckets (days from today) - overdue, <90d, <180d, <1y, <2y, <5y, 5y+
+DEFAULT_MATURITY_EDGES = (0, 90, 180, 365, 730, 1825)
+
+
+def epoch_day(dt: datetime) -> int:
+    """Whole days since the Unix epoch"""
+    return int(dt.timestamp() // SECONDS_PER_DAY)
+
+
+class PortfolioColumns:
+    """
+    One row per loan, rows never move (loan_id -> row map), arrays double when full
+    Kept in sync by DigitalTwinService on create and status change
+    """
+    
+    def __init__(self, initial_capacity: int = 1024):
+        self.size = 0
+        self._capacity = max(1, initial_capacity)
+        self.row_of: Dict[str, int] = {}
+        self.loan_ids: List[str] = []
+        self.status_names: List[str] = []
+        self._status_codes: Dict[str, int] = {}
+        
+        self._loan_amount = np.zeros(self._capacity, dtype=np.float64)
+        self._interest_rate = np.zeros(self._capacity, dtype=np.float64)
+        self._start_day = np.zeros(self._capacity, dtype=np.int64)
+        self._maturity_day = np.zeros(self._capacity, dtype=np.int64)
+        self._status = np.zeros(self._capacity, dtype=np.int16)
+        self._covenant_counts = np.zeros((self._capacity, len(COVENANT_TYPES)), dtype=np.int32)
+        self._esg_counts = np.zeros((self._capacity, len(ESG_CATEGORIES)), dtype=np.int32)
+    
+    # Views over the filled rows - cheap, no copy
+    @property
+    def loan_amount(self) -> np.ndarray:
+        return self._loan_amount[:self.size]
+    
+    @property
+    def interest_rate(self) -> np.ndarray:
+        return self._interest_rate[:self.size]
+    
+    @property
+    def start_day(self) -> np.ndarray:
+        return self._start_day[:self.size]
+    
+    @property
+    def maturity_day(self) -> np.ndarray:
+        return self._maturity_day[:self.size]
+    
+    @property
+    def status(self) -> np.ndarray:
+        return self._status[:self.size]
+    
+    @property
+    def covenant_counts(self) -> np.ndarray:
+        return self._covenant_counts[:self.size]
+    
+    @property
+    def esg_counts(self) -> np.ndarray:
+        return self._esg_counts[:self.size]
+    
+    def status_code(self, status: str) -> int:
+        """Code for a status string, allocating a new one the first time it's seen"""
+        code = self._status_codes.get(status)
+        if code is None:
+            code = len(self.status_names)
+            self._status_codes[status] = code
+            self.status_names.append(status)
+        return code
+    
+    def add(self, loan: Loan) -> int:
+        """Append a loan as a new row, returns the row number"""
+        if loan.id in self.row_of:
+            return self.row_of[loan.id]
+        if self.size == self._capacity:
+            self._grow()
+        
+        row = self.size
+        self._loan_amount[row] = loan.loan_amount
+        self._interest_rate[row] = loan.interest_rate
+        self._start_day[row] = epoch_day(loan.start_date)
+        self._maturity_day[row] = epoch_day(loan.maturity_date)
+        self._status[row] = self.status_code(loan.status)
+        for covenant in loan.covenants:
+            self._covenant_counts[row, _column(COVENANT_TYPES, covenant.type)] += 1
+        for clause in loan.esg_clauses:
+            self._esg_counts[row, _column(ESG_CATEGORIES, clause.category)] += 1
+        
+        self.row_of[loan.id] = row
+        self.loan_ids.append(loan.id)
+        self.size += 1
+        return row
+    
+    def update_status(self, loan_id: str, status: str) -> None:
+        row = self.row_of.get(loan_id)
+        if row is not None:
+            self._status[row] = self.status_code(status)
+    
+    def _grow(self) -> None:
+        self._capacity *= 2
+        for name in ("_loan_amount", "_interest_rate", "_start_day", "_maturity_day", "_status",
+                     "_covenant_counts", "_esg_counts"):
+            old = getattr(self, name)
+            new = np.zeros((self._capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+    
+    def mask(self, status: Optional[str] = None) -> np.ndarray:
+        """Boolean row mask for a status (all rows when status is None)"""
+        if status is None:
+            return np.ones(self.size, dtype=bool)
+        code = self._status_codes.get(status)
+        if code is None:
+            return np.zeros(self.size, dtype=bool)
+        return self.status == code
+    
+    def total_exposure(self, status: Optional[str] = None) -> float:
+        return float(self.loan_amount[self.mask(status)].sum())
+    
+    def weighted_average_rate(self, status: Optional[str] = None) -> float:
+        """Exposure-weighted average interest rate"""
+        mask = self.mask(status)
+        amounts = self.loan_amount[mask]
+        total = amounts.sum()
+        if total == 0:
+            return 0.0
+        return float(np.dot(amounts, self.interest_rate[mask]) / total)
+    
+    def maturity_buckets(
+        self,
+        edges_days: Sequence[int] = DEFAULT_MATURITY_EDGES,
+        reference: Optional[datetime] = None,
+        status: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Loan count and exposure per days-to-maturity bucket
+        Bucket i covers [edges[i-1], edges[i]); the first is everything before edges[0], the last everything after
+        """
+        mask = self.mask(status)
+        days_left = self.maturity_day[mask] - epoch_day(reference or datetime.now())
+        edges = np.asarray(edges_days, dtype=np.int64)
+        bucket = np.searchsorted(edges, days_left, side="right")
+        counts = np.bincount(bucket, minlength=len(edges) + 1)
+        exposure = np.bincount(bucket, weights=self.loan_amount[mask], minlength=len(edges) + 1)
+        
+        labels = [f"<{edges[0]}d"]
+        labels += [f"{lo}-{hi}d" for lo, hi in zip(edges[:-1], edges[1:])]
+        labels.append(f"{edges[-1]}d+")
+        return [
+            {"bucket": label, "loans": int(count), "exposure": float(amount)}
+            for label, count, amount in zip(labels, counts, exposure)
+        ]
+    
+    def status_breakdown(self) -> Dict[str, Dict[str, float]]:
+        """Loan count and exposure per status"""
+        codes = self.status
+        counts = np.bincount(codes, minlength=len(self.status_names))
+        exposure = np.bincount(codes, weights=self.loan_amount, minlength=len(self.status_names))
+        return {
+            name: {"loans": int(counts[code]), "exposure": float(exposure[code])}
+            for code, name in enumerate(self.status_names)
+            if counts[code]
+        }
+    
+    def summary(self, status: Optional[str] = None, reference: Optional[datetime] = None) -> Dict[str, Any]:
+        """Headline portfolio statistics - each a single pass over the columns"""
+        mask = self.mask(status)
+        return {
+            "total_loans": int(mask.sum()),
+            "total_exposure": self.total_exposure(status),
+            "weighted_average_rate": self.weighted_average_rate(status),
+            "average_loan_amount": float(self.loan_amount[mask].mean()) if mask.any() else 0.0,
+            "covenants_by_type": dict(zip(COVENANT_TYPES, self.covenant_counts[mask].sum(axis=0).tolist())),
+            "esg_clauses_by_category": dict(zip(ESG_CATEGORIES, self.esg_counts[mask].sum(axis=0).tolist())),
+            "maturity_buckets": self.maturity_buckets(reference=reference, status=status),
+            "by_status": self.status_breakdown(),
+        }
+
+
+def _column(names: Sequence[str], value: str) -> int:
+    try:
+        return names.index(value)
+    except ValueError:
+        return len(names) - 1
@@ -0,0 +1,97 @@
+"""
+Prediction result cache - LRU with a TTL
+Keys carry every input version (loan, model, reference day), so a stale entry can never be
+served; invalidate_loan just frees what a write made unreachable
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Set, Tuple
+
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_TTL_SECONDS = 3600.0
+
+
+class PredictionCache:
+    """Thread-safe LRU of (expires_at, value) - keys must start with the loan_id"""
+    
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+        # loan_id -> its keys, for invalidation without a scan
+        self._by_loan: Dict[str, Set[Tuple]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+    
+    def get(self, key: Tuple[Hashable, ...]) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] <= time.monotonic():
+                self._discard(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def put(self, key: Tuple[Hashable, ...], value: Any) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            else:
+                self._by_loan.setdefault(key[0], set()).add(key)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            while len(self._entries) > self.max_entries:
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+    
+    def invalidate_loan(self, loan_id: str, kind: Optional[str] = None) -> int:
+        """Drop every entry for a loan - DigitalTwinService subscriber signature"""
+        with self._lock:
+            keys = self._by_loan.pop(loan_id, ())
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += len(keys)
+            return len(keys)
+    
+    def _discard(self, key: Tuple) -> None:
+        del self._entries[key]
+        keys = self._by_loan.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_loan[key[0]]
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_loan.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations
+        }
@@ -1,11 +1,19 @@
 """
 Risk prediction service - orchestrates feature engineering, model prediction, and explainability
 """
-from datetime import datetime
-from typing import Dict, Any, List
+import copy
+import os
+import threading
+from datetime import date, datetime
+from typing import Callable, Dict, Any, List, Mapping, Optional
+import numpy as np
 from app.models import Loan, CovenantCheck
-from app.ai.feature_engineering import FeatureEngineer
-from app.ai.risk_model import RiskPredictionModel
+from app.ai.feature_engineering import FeatureEngineer, LoanFeatureBlock, FEATURE_ORDER
+from app.ai.feature_scaler import FeatureScaler
+from app.ai.risk_model import RiskPredictionModel, RISK_LEVELS, RISK_LEVEL_THRESHOLDS
+from app.ai.model_registry import ModelRegistry
+from app.services.prediction_cache import PredictionCache, DEFAULT_MAX_ENTRIES, DEFAULT_TTL_SECONDS
+from app.services.feature_store import FeatureStore, DEFAULT_MAX_LOANS
 from app.ai.explainability import ExplainabilityEngine
 
 # Optional blockchain integration for breach detection
@@ -15,13 +23,94 @@ try:
 except ImportError:
     BLOCKCHAIN_AVAILABLE = False
 
+DEFAULT_HORIZONS = [30, 60, 90]
+DEFAULT_SCALER_PATH = "data/feature_scaler.npz"
+DEFAULT_MODEL_REGISTRY_PATH = "data/models"
+# Upper bounds of low / medium / high overall risk (on the worst horizon)
+OVERALL_RISK_THRESHOLDS = np.array([0.4, 0.6, 0.8])
+OVERALL_RISK_LEVELS = np.array(["low", "medium", "high", "critical"])
+DEFAULT_CURVE_DAYS = 365
+# Loans per pass when building curves - bounds the (loans, days, features) matrix to ~27 MB
+CURVE_CHUNK_LOANS = 512
+
+
+def score_feature_blocks(
+    blocks: List[LoanFeatureBlock],
+    prediction_horizons: List[int],
+    model: RiskPredictionModel,
+    scaler: Optional[FeatureScaler],
+    now: Optional[datetime] = None,
+    noise: bool = True
+) -> np.ndarray:
+    """
+    (loans, horizons) breach probabilities for prepared feature blocks
+    Module-level with picklable inputs, so large batches can run it in a worker process
+    """
+    features = FeatureEngineer(scaler=scaler).features_from_blocks(
+        blocks, prediction_horizons, now
+    ).reshape(len(blocks), len(prediction_horizons), -1)
+    return model.predict_breach_probabilities(features, np.array(prediction_horizons), noise=noise)
+
+
+def risk_curves(
+    blocks: List[LoanFeatureBlock],
+    days: int,
+    model: RiskPredictionModel,
+    scaler: Optional[FeatureScaler]
+) -> np.ndarray:
+    """
+    (loans, days) float32 breach probabilities at horizons 1..days
+    The horizons are one more axis through feature building and the sigmoid - no per-day loop.
+    Without demo noise: a separate draw per day would make the curve jagged and its threshold
+    crossings noise. Picklable inputs, like score_feature_blocks.
+    """
+    horizons = np.arange(1, days + 1)
+    # One reference time for every chunk
+    now = datetime.now()
+    curves = np.empty((len(blocks), days), dtype=np.float32)
+    for start in range(0, len(blocks), CURVE_CHUNK_LOANS):
+        chunk = blocks[start:start + CURVE_CHUNK_LOANS]
+        curves[start:start + len(chunk)] = score_feature_blocks(chunk, horizons, model, scaler, now, noise=False)
+    return curves
+
+
+def first_crossing_days(curves: np.ndarray) -> np.ndarray:
+    """
+    (loans, len(RISK_LEVEL_THRESHOLDS)) first day each curve reaches medium / high / critical,
+    0 where it never does
+    """
+    reached = curves[:, :, None] >= RISK_LEVEL_THRESHOLDS.astype(curves.dtype)
+    return np.where(reached.any(axis=1), reached.argmax(axis=1) + 1, 0)
+
 
 class PredictionService:
     """Main service for risk predictions - coordinates AI components"""
     
-    def __init__(self):
-        self.feature_engineer = FeatureEngineer()
-        self.risk_model = RiskPredictionModel()
+    def __init__(
+        self,
+        scaler_path: Optional[str] = None,
+        scaler_method: str = "standard",
+        noise: str = "deterministic",
+        cache_size: int = DEFAULT_MAX_ENTRIES,
+        cache_ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        feature_store_size: int = DEFAULT_MAX_LOANS,
+        model_registry_path: Optional[str] = None
+    ):
+        # Fitted scaler artifact - loaded once here, updated by update_scaler
+        self.scaler_path = scaler_path
+        self._scaler_mtime = self._artifact_mtime()
+        self.feature_engineer = FeatureEngineer(scaler=self._load_scaler(scaler_path, scaler_method))
+        self._scaler_lock = threading.Lock()
+        # Serving model - replaced whole by activate_model/reload_model, never mutated,
+        # so a request that took a reference finishes on the model it started with
+        self.noise = noise
+        self.registry = ModelRegistry(model_registry_path) if model_registry_path else None
+        self._model_lock = threading.Lock()
+        self.risk_model = self._load_active_model() or RiskPredictionModel(noise=noise)
+        # Per-horizon predictions with explanations - only used when the model is deterministic
+        self.cache = PredictionCache(max_entries=cache_size, ttl_seconds=cache_ttl_seconds)
+        # Per-loan feature inputs shared by every horizon and covenant of a loan version
+        self.feature_store = FeatureStore(max_loans=feature_store_size)
         self.explainability = ExplainabilityEngine()
         
         # Optional blockchain client for breach detection
@@ -32,37 +121,201 @@ class PredictionService:
             except Exception:
                 pass
     
+    @staticmethod
+    def _load_scaler(path: Optional[str], method: str) -> FeatureScaler:
+        if path and os.path.exists(path):
+            try:
+                return FeatureScaler.load(path, FEATURE_ORDER)
+            except (OSError, ValueError, KeyError):
+                # Unreadable or fitted on other features - start over, the next fit replaces it
+                pass
+        return FeatureScaler(FEATURE_ORDER, method=method)
+    
+    def _artifact_mtime(self) -> Optional[float]:
+        try:
+            return os.path.getmtime(self.scaler_path) if self.scaler_path else None
+        except OSError:
+            return None
+    
+    def reload_scaler(self) -> bool:
+        """
+        Pick up the artifact if another worker process saved a newer one
+        
+        Returns:
+            True if the scaler was replaced
+        """
+        mtime = self._artifact_mtime()
+        if mtime is None or mtime == self._scaler_mtime:
+            return False
+        with self._scaler_lock:
+            self._scaler_mtime = mtime
+            self.feature_engineer.scaler = self._load_scaler(self.scaler_path, self.scaler.method)
+        return True
+    
+    @property
+    def scaler(self) -> FeatureScaler:
+        return self.feature_engineer.scaler
+    
+    @property
+    def model_version(self) -> str:
+        """Weights and scaler statistics a prediction was made with"""
+        model = self.risk_model
+        return self.model_version_for(model, self.scaler_for(model))
+    
+    def model_version_for(self, model: RiskPredictionModel, scaler: FeatureScaler) -> str:
+        """model_version of results computed with this model and scaler (scaler_for(model))"""
+        # A registry model carries its training scaler - its version alone pins both
+        if model.scaler is not None:
+            return model.version
+        return f"{model.version}+scaler.{scaler.version}"
+    
+    def is_serving(self, model_version: Optional[str]) -> bool:
+        """
+        Whether a result's model_version came from the weights served now
+        Scaler refits on the demo model don't count - only a model swap does
+        """
+        return bool(model_version) and model_version.split("+", 1)[0] == self.risk_model.version
+    
+    def _load_active_model(self) -> Optional[RiskPredictionModel]:
+        if self.registry is None:
+            return None
+        version = self.registry.active_version()
+        if version is None:
+            return None
+        try:
+            return self.registry.load(version, FEATURE_ORDER, noise=self.noise)
+        except (OSError, ValueError, KeyError):
+            # Missing or incompatible artifact - keep serving what we have
+            return None
+    
+    def list_models(self) -> List[Dict[str, Any]]:
+        """Registry versions, with the one this process serves marked"""
+        serving = self.risk_model.version
+        versions = self.registry.list_versions() if self.registry else []
+        return [{**manifest, "serving": manifest["version"] == serving} for manifest in versions]
+    
+    def activate_model(self, version: str) -> Dict[str, Any]:
+        """
+        Load a registry version, swap it in and make it the ACTIVE one for every worker
+        In-flight predictions finish on the old model; results are keyed by model version,
+        so nothing cached under the old one is served afterwards
+        
+        Raises:
+            ValueError: No registry configured, invalid version or incompatible artifact
+            FileNotFoundError: Unknown version
+        """
+        if self.registry is None:
+            raise ValueError("No model registry configured")
+        model = self.registry.load(version, FEATURE_ORDER, noise=self.noise)
+        with self._model_lock:
+            self.registry.set_active(version)
+            self.risk_model = model
+        return self.registry.manifest(version)
+    
+    def reload_model(self) -> bool:
+        """
+        Follow the registry's ACTIVE pointer if another worker process moved it
+        
+        Returns:
+            True if the model was replaced
+        """
+        if self.registry is None or self.registry.active_version() in (None, self.risk_model.version):
+            return False
+        model = self._load_active_model()
+        if model is None:
+            return False
+        with self._model_lock:
+            self.risk_model = model
+        return True
+    
+    def update_scaler(
+        self,
+        loans: List[Loan],
+        covenant_checks: Mapping[str, List[CovenantCheck]]
+    ) -> int:
+        """
+        Fold loans' raw feature rows (at the standard horizons) into the scaler and persist it
+        Called with the whole portfolio when nothing is fitted yet, then with new loans only
+        
+        Returns:
+            Scaler version after the update
+        """
+        if not loans:
+            return self.scaler.version
+        rows = self.feature_engineer.engineer_features_batch(
+            loans, covenant_checks, DEFAULT_HORIZONS, normalize=False
+        )
+        with self._scaler_lock:
+            # Fit a copy and swap it in, like a model swap - the live scaler is never mutated,
+            # so a request normalizes with the same statistics its cache key names
+            scaler = copy.deepcopy(self.scaler).partial_fit(rows)
+            if self.scaler_path:
+                scaler.save(self.scaler_path)
+                self._scaler_mtime = self._artifact_mtime()
+            self.feature_engineer.scaler = scaler
+            return scaler.version
+    
     def predict_risk(
         self,
         loan: Loan,
         covenant_checks: List[CovenantCheck],
-        prediction_horizons: List[int] = None
+        prediction_horizons: List[int] = None,
+        version: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Generate risk predictions for multiple horizons
         Returns predictions with explanations for each time window
+        
+        Args:
+            version: The loan's version tag, read before loan and checks were loaded -
+                enables the result cache and feature store (the tag advances on every loan,
+                covenant check and ESG write, so it stands for the check version too)
         """
         if prediction_horizons is None:
-            prediction_horizons = [30, 60, 90]  # Standard horizons
+            prediction_horizons = DEFAULT_HORIZONS
+        
+        # One model and scaler for the whole call, even if either is swapped meanwhile
+        model = self.risk_model
+        scaler = self.scaler_for(model)
+        model_version = self.model_version_for(model, scaler)
+        cache_prefix = None
+        if version is not None and self.cache.enabled and model.cacheable:
+            # Features count days from today - tomorrow is a different input
+            cache_prefix = (loan.id, version, model_version, date.today().isoformat())
+        
+        cached = {}
+        if cache_prefix is not None:
+            for horizon_days in prediction_horizons:
+                hit = self.cache.get(cache_prefix + (horizon_days,))
+                if hit is not None:
+                    cached[horizon_days] = dict(hit)
+        
+        # Feature rows for every horizon not cached, from the loan's stored feature block
+        missing = [horizon_days for horizon_days in prediction_horizons if horizon_days not in cached]
+        if missing:
+            block = self.feature_store.get_or_build(
+                loan.id, version, lambda: self.feature_engineer.build_feature_block(loan, covenant_checks)
+            )
+            feature_rows = dict(zip(missing, self.feature_engineer.features_from_blocks([block], missing, scaler=scaler)))
         
         predictions = {}
         
         for horizon_days in prediction_horizons:
-            # Engineer features
-            features = self.feature_engineer.engineer_features(
-                loan, covenant_checks, horizon_days
-            )
+            if horizon_days in cached:
+                predictions[f"{horizon_days}_days"] = cached[horizon_days]
+                continue
+            features = feature_rows[horizon_days]
             
             # Predict probability
-            probability = self.risk_model.predict_breach_probability(
+            probability = model.predict_breach_probability(
                 features, horizon_days
             )
             
             # Determine risk level
-            risk_level = self.risk_model.predict_risk_level(probability)
+            risk_level = model.predict_risk_level(probability)
             
             # Identify risk factors
-            risk_factors = self.risk_model.identify_risk_factors(
+            risk_factors = model.identify_risk_factors(
                 loan, covenant_checks, features
             )
             
@@ -78,6 +331,8 @@ class PredictionService:
                 "explanation": explanation,
                 "prediction_date": datetime.now().isoformat()
             }
+            if cache_prefix is not None:
+                self.cache.put(cache_prefix + (horizon_days,), dict(predictions[f"{horizon_days}_days"]))
         
         # Overall risk assessment
         overall_risk = self._calculate_overall_risk(predictions)
@@ -86,6 +341,7 @@ class PredictionService:
             "loan_id": loan.id,
             "predictions": predictions,
             "overall_risk": overall_risk,
+            "model_version": model_version,
             "generated_at": datetime.now().isoformat()
         }
         
@@ -111,6 +367,134 @@ class PredictionService:
         
         return result
     
+    def predict_risk_batch(
+        self,
+        loans: List[Loan],
+        load_checks: Callable[[str], List[CovenantCheck]],
+        prediction_horizons: List[int] = None,
+        versions: Optional[Mapping[str, Optional[str]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Score many loans at once - one (loans x horizons x features) matrix, one matmul
+        
+        Results are compact (probability and level per horizon, overall risk): no
+        explanations and no blockchain breach reporting - predict_risk gives the full
+        assessment for one loan
+        
+        Args:
+            load_checks: loan_id -> its covenant checks, only called for loans whose
+                feature block isn't stored for their version
+            versions: loan_id -> version tag, read before the loans were loaded
+        """
+        if prediction_horizons is None:
+            prediction_horizons = DEFAULT_HORIZONS
+        if not loans:
+            return []
+        
+        model = self.risk_model
+        scaler = self.scaler_for(model)
+        blocks = self.feature_blocks(loans, load_checks, versions)
+        probabilities = score_feature_blocks(blocks, prediction_horizons, model, scaler)
+        return self.batch_results(loans, prediction_horizons, probabilities, model, scaler)
+    
+    def feature_blocks(
+        self,
+        loans: List[Loan],
+        load_checks: Callable[[str], List[CovenantCheck]],
+        versions: Optional[Mapping[str, Optional[str]]] = None
+    ) -> List[LoanFeatureBlock]:
+        """Stored feature blocks for the loans' versions, building the missing ones"""
+        versions = versions or {}
+        return [
+            self.feature_store.get_or_build(
+                loan.id,
+                versions.get(loan.id),
+                lambda loan=loan: self.feature_engineer.build_feature_block(loan, load_checks(loan.id))
+            )
+            for loan in loans
+        ]
+    
+    def scaler_for(self, model: RiskPredictionModel) -> FeatureScaler:
+        """The model's training scaler, else the online-fitted one"""
+        return model.scaler or self.scaler
+    
+    def batch_results(
+        self,
+        loans: List[Loan],
+        prediction_horizons: List[int],
+        probabilities: np.ndarray,
+        model: RiskPredictionModel,
+        scaler: FeatureScaler
+    ) -> List[Dict[str, Any]]:
+        """predict_risk_batch responses from (loans, horizons) probabilities scored with model and scaler"""
+        model_version = self.model_version_for(model, scaler)
+        risk_levels = model.predict_risk_levels(probabilities)
+        
+        average = probabilities.mean(axis=1)
+        worst = probabilities.max(axis=1)
+        overall_levels = OVERALL_RISK_LEVELS[np.searchsorted(OVERALL_RISK_THRESHOLDS, worst, side="right")]
+        increasing = probabilities[:, -1] > probabilities[:, 0]
+        
+        generated_at = datetime.now().isoformat()
+        keys = [f"{horizon_days}_days" for horizon_days in prediction_horizons]
+        probability_rows = probabilities.tolist()
+        level_rows = risk_levels.tolist()
+        return [
+            {
+                "loan_id": loan.id,
+                "predictions": {
+                    key: {"horizon_days": horizon_days, "probability": probability, "risk_level": level}
+                    for key, horizon_days, probability, level in zip(
+                        keys, prediction_horizons, probability_rows[i], level_rows[i]
+                    )
+                },
+                "overall_risk": {
+                    "level": str(overall_levels[i]),
+                    "average_probability": float(average[i]),
+                    "max_probability": float(worst[i]),
+                    "trend": "increasing" if increasing[i] else "stable"
+                },
+                "model_version": model_version,
+                "generated_at": generated_at
+            }
+            for i, loan in enumerate(loans)
+        ]
+    
+    def predict_risk_curve(
+        self,
+        loan: Loan,
+        covenant_checks: List[CovenantCheck],
+        days: int = DEFAULT_CURVE_DAYS,
+        version: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Breach probability for every horizon from 1 to days, and the first day it reaches
+        each risk level - one vectorized pass over the loan's feature block
+        
+        Args:
+            version: The loan's version tag - reuses its stored feature block
+        """
+        model = self.risk_model
+        scaler = self.scaler_for(model)
+        block = self.feature_store.get_or_build(
+            loan.id, version, lambda: self.feature_engineer.build_feature_block(loan, covenant_checks)
+        )
+        curve = risk_curves([block], days, model, scaler)
+        crossings = first_crossing_days(curve)[0]
+        peak = int(curve[0].argmax())
+        return {
+            "loan_id": loan.id,
+            "days": days,
+            # float32 values - 6 decimals is all they carry
+            "probabilities": curve[0].astype(float).round(6).tolist(),
+            "threshold_crossings": {
+                str(level): int(day) or None for level, day in zip(RISK_LEVELS[1:], crossings)
+            },
+            "peak": {"day": peak + 1, "probability": round(float(curve[0, peak]), 6)},
+            "model_version": self.model_version_for(model, scaler),
+            "generated_at": datetime.now().isoformat()
+        }
+    
     def _calculate_overall_risk(self, predictions: Dict[str, Any]) -> Dict[str, Any]:
         """Calculate overall risk assessment across all horizons"""
         probabilities = [
@@ -143,11 +527,20 @@ class PredictionService:
         loan: Loan,
         covenant_id: str,
         covenant_checks: List[CovenantCheck],
-        horizon_days: int = 30
+        horizon_days: int = 30,
+        recent_checks: Optional[List[CovenantCheck]] = None,
+        historical_check_count: Optional[int] = None,
+        version: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Predict risk for a specific covenant
         
+        Args:
+            recent_checks: Last few checks for this covenant, if the caller already has them
+                from the per-covenant series - saves filtering the whole loan history
+            historical_check_count: Total checks for this covenant, paired with recent_checks
+            version: The loan's version tag - reuses its stored feature block
+        
         Returns:
             Risk prediction for the specific covenant
         """
@@ -156,32 +549,40 @@ class PredictionService:
         if not covenant:
             raise ValueError(f"Covenant {covenant_id} not found")
         
-        # Filter checks for this covenant
-        relevant_checks = [
-            check for check in covenant_checks
-            if check.covenant_id == covenant_id
-        ]
+        # Filter checks for this covenant (unless the series store already did)
+        if recent_checks is None:
+            relevant_checks = [
+                check for check in covenant_checks
+                if check.covenant_id == covenant_id
+            ]
+            recent_checks = relevant_checks[-3:]
+            historical_check_count = len(relevant_checks)
+        elif historical_check_count is None:
+            historical_check_count = len(recent_checks)
         
         # Use general prediction but focus on this covenant
-        features = self.feature_engineer.engineer_features(
-            loan, covenant_checks, horizon_days
+        model = self.risk_model
+        scaler = self.scaler_for(model)
+        block = self.feature_store.get_or_build(
+            loan.id, version, lambda: self.feature_engineer.build_feature_block(loan, covenant_checks)
         )
+        features = self.feature_engineer.features_from_blocks([block], [horizon_days], scaler=scaler)[0]
         
         # Adjust probability based on covenant-specific history
-        base_probability = self.risk_model.predict_breach_probability(
+        base_probability = model.predict_breach_probability(
             features, horizon_days
         )
         
         # Adjust based on covenant history
-        if relevant_checks:
+        if recent_checks:
             recent_breaches = sum(
-                1 for check in relevant_checks[-3:]
+                1 for check in recent_checks
                 if check.is_breached
             )
             if recent_breaches > 0:
                 base_probability = min(base_probability + 0.2, 1.0)
         
-        risk_level = self.risk_model.predict_risk_level(base_probability)
+        risk_level = model.predict_risk_level(base_probability)
         
         return {
             "covenant_id": covenant_id,
@@ -190,7 +591,8 @@ class PredictionService:
             "probability": base_probability,
             "risk_level": risk_level,
             "covenant_details": covenant.dict(),
-            "historical_checks": len(relevant_checks),
+            "historical_checks": historical_check_count,
+            "model_version": self.model_version_for(model, scaler),
             "prediction_date": datetime.now().isoformat()
         }
 
@@ -0,0 +1,150 @@
+"""
+Portfolio-wide schedule index
+Every covenant next_check_date and ESG clause next_report_date in one sorted list,
+so "what is due" is a bisect plus a slice instead of a walk over every loan
+"""
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+from itertools import count
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+from app.models import Loan
+
+# Kinds of scheduled items
+SCHEDULE_KINDS = ("covenant_check", "esg_report")
+
+# Covenant/reporting frequency -> days between occurrences (approximate calendar periods)
+FREQUENCY_DAYS = {
+    "daily": 1,
+    "weekly": 7,
+    "monthly": 30,
+    "quarterly": 91,
+    "semi-annually": 182,
+    "semi-annual": 182,
+    "annually": 365,
+    "annual": 365,
+    "yearly": 365,
+}
+# Unrecognised frequencies are treated as quarterly
+DEFAULT_PERIOD_DAYS = 91
+
+# (due timestamp, tiebreak) - tiebreak keeps entries unique and ordered by insertion
+_Key = Tuple[float, int]
+# (kind, loan_id, item_id)
+_ItemId = Tuple[str, str, str]
+
+
+class ScheduleIndex:
+    """
+    Sorted (due, tiebreak) keys with the item each one schedules
+    Items due in a window: O(log n + window). Add/reschedule: O(log n) search plus the list shift.
+    Thread-safe - loans are re-indexed from several compute workers while others read.
+    """
+    
+    def __init__(self):
+        self._keys: List[_Key] = []
+        self._items: Dict[_Key, Dict[str, Any]] = {}
+        self._key_of: Dict[_ItemId, _Key] = {}
+        # loan_id -> {(kind, item_id)} for re-indexing a loan
+        self._by_loan: Dict[str, Set[Tuple[str, str]]] = {}
+        self._tiebreak = count()
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._keys)
+    
+    def add_loan(self, loan: Loan) -> None:
+        """Index (or re-index) every covenant and ESG clause of a loan"""
+        with self._lock:
+            self._add_loan(loan)
+    
+    def _add_loan(self, loan: Loan) -> None:
+        for covenant in loan.covenants:
+            self._schedule("covenant_check", loan, covenant.id, covenant.next_check_date, {
+                "name": covenant.name,
+                "type": covenant.type,
+                "frequency": covenant.frequency
+            })
+        for clause in loan.esg_clauses:
+            self._schedule("esg_report", loan, clause.id, clause.next_report_date, {
+                "name": clause.requirement,
+                "type": clause.category,
+                "frequency": clause.reporting_frequency
+            })
+        
+        # Clauses dropped from the loan are no longer scheduled
+        current = {("covenant_check", c.id) for c in loan.covenants} | {("esg_report", e.id) for e in loan.esg_clauses}
+        for kind, item_id in self._by_loan.get(loan.id, set()) - current:
+            self._remove(kind, loan.id, item_id)
+    
+    def schedule(
+        self,
+        kind: str,
+        loan: Loan,
+        item_id: str,
+        due: datetime,
+        details: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Insert an item, or move it if it's already scheduled"""
+        with self._lock:
+            self._schedule(kind, loan, item_id, due, details)
+    
+    def _schedule(
+        self,
+        kind: str,
+        loan: Loan,
+        item_id: str,
+        due: datetime,
+        details: Optional[Dict[str, Any]]
+    ) -> None:
+        self._remove(kind, loan.id, item_id)
+        key = (due.timestamp(), next(self._tiebreak))
+        insort(self._keys, key)
+        self._items[key] = {
+            "kind": kind,
+            "loan_id": loan.id,
+            "borrower_name": loan.borrower_name,
+            "item_id": item_id,
+            "due_date": due,
+            **(details or {})
+        }
+        self._key_of[(kind, loan.id, item_id)] = key
+        self._by_loan.setdefault(loan.id, set()).add((kind, item_id))
+    
+    def remove(self, kind: str, loan_id: str, item_id: str) -> bool:
+        with self._lock:
+            return self._remove(kind, loan_id, item_id)
+    
+    def _remove(self, kind: str, loan_id: str, item_id: str) -> bool:
+        key = self._key_of.pop((kind, loan_id, item_id), None)
+        if key is None:
+            return False
+        del self._keys[bisect_left(self._keys, key)]
+        del self._items[key]
+        self._by_loan[loan_id].discard((kind, item_id))
+        return True
+    
+    def due_between(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """Items due in [start, end], soonest first - copied under the lock, so writers can't shift it"""
+        with self._lock:
+            lo = bisect_left(self._keys, (start.timestamp(), -1)) if start is not None else 0
+            hi = bisect_right(self._keys, (end.timestamp(), float("inf"))) if end is not None else len(self._keys)
+            return [self._items[key] for key in self._keys[lo:hi]]
+    
+    def next_due(self) -> Optional[datetime]:
+        """Earliest scheduled date, None when nothing is scheduled"""
+        with self._lock:
+            return self._items[self._keys[0]]["due_date"] if self._keys else None
+
+
+def next_occurrence(due: datetime, frequency: str, after: datetime) -> datetime:
+    """First date on due's frequency cycle that is later than after"""
+    if due > after:
+        return due
+    period = timedelta(days=FREQUENCY_DAYS.get(frequency.strip().lower(), DEFAULT_PERIOD_DAYS))
+    return due + period * (int((after - due) / period) + 1)
@@ -0,0 +1,277 @@
+"""
+Background scoring scheduler
+Wakes up for due covenant checks / ESG reports and for loans whose inputs changed,
+re-runs risk and ESG breach predictions off the event loop, stores the results and
+advances the schedule - dashboard reads then serve stored scores instead of running inference
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import date, datetime
+from typing import Any, Dict, Optional
+from starlette.concurrency import run_in_threadpool
+
+DEFAULT_INTERVAL_SECONDS = 30.0
+DEFAULT_CONCURRENCY = 4
+# Each sleep is the interval +/- this fraction, so workers and restarts don't wake in lockstep
+DEFAULT_JITTER = 0.2
+# Loans scored per wake-up - the rest wait for the next one
+DEFAULT_BATCH_SIZE = 200
+# Shared-store lease so only one worker process runs the scheduler
+LEASE_NAME = "scoring_scheduler"
+# Shortest sleep when something is about to come due
+MIN_SLEEP_SECONDS = 1.0
+
+
+class ScoringScheduler:
+    """In-process asyncio loop that keeps every loan's predictions current"""
+    
+    def __init__(
+        self,
+        twin_service,
+        prediction_service,
+        esg_service,
+        executor=None,
+        interval: float = DEFAULT_INTERVAL_SECONDS,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        jitter: float = DEFAULT_JITTER,
+        batch_size: int = DEFAULT_BATCH_SIZE
+    ):
+        self.twin_service = twin_service
+        self.prediction_service = prediction_service
+        self.esg_service = esg_service
+        # ComputeExecutor for score_loan - None runs it on Starlette's threadpool
+        self.executor = executor
+        self.interval = interval
+        self.concurrency = concurrency
+        self.jitter = jitter
+        self.batch_size = batch_size
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        
+        # loan_id -> change counter when last marked, so a change during scoring isn't lost
+        self._dirty: Dict[str, int] = {}
+        self._marks = 0
+        # Loans created since the last pass - folded into the feature scaler
+        self._new_loans: set = set()
+        self._dirty_lock = threading.Lock()
+        # Nothing has been scored yet - the first run queues every loan without fresh scores
+        self._seeded = False
+        # Model version and day the stored scores were last queued against - a swap requeues
+        # them, and so does a new day (their date-dependent features have moved)
+        self._queued_model: Optional[str] = None
+        self._queued_day: Optional[date] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.stats: Dict[str, Any] = {
+            "runs": 0,
+            "loans_scored": 0,
+            "due_items": 0,
+            "failures": 0,
+            "last_run_at": None,
+            "last_run_ms": None,
+            "last_error": None,
+            "leader": False
+        }
+        twin_service.subscribe(self._mark_dirty)
+    
+    def _mark_dirty(self, loan_id: str, kind: str) -> None:
+        with self._dirty_lock:
+            self._marks += 1
+            self._dirty[loan_id] = self._marks
+            if kind == "loan_created":
+                self._new_loans.add(loan_id)
+    
+    def _clear_dirty(self, loan_id: str, mark: Optional[int]) -> None:
+        with self._dirty_lock:
+            if self._dirty.get(loan_id) == mark:
+                del self._dirty[loan_id]
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    def start(self) -> None:
+        """Start the loop on the running event loop (no-op if already running)"""
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._loop())
+    
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+    
+    def wake(self) -> None:
+        """Run the next pass now instead of waiting out the sleep"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+    
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                # Keep the loop alive - the next pass retries whatever failed
+                self.stats["failures"] += 1
+                self.stats["last_error"] = str(e)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._sleep_seconds())
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+    
+    def _sleep_seconds(self) -> float:
+        sleep = self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+        next_due = self.twin_service.next_due_date()
+        if next_due is not None:
+            # Wake for the next due item rather than a whole interval late
+            until_due = (next_due - datetime.now()).total_seconds()
+            sleep = min(sleep, max(until_due, MIN_SLEEP_SECONDS))
+        return sleep
+    
+    async def run_once(self) -> Dict[str, Any]:
+        """
+        One pass - score loans with due items first, then loans whose inputs changed
+        
+        Returns:
+            Counts for this pass
+        """
+        started = time.perf_counter()
+        # Renew well before expiry - a worker that stops renewing hands over after three intervals
+        leader = await run_in_threadpool(
+            self.twin_service.store.acquire_lease, LEASE_NAME, self.owner, self.interval * 3
+        )
+        self.stats["leader"] = leader
+        # Every worker follows the registry's active model, whichever one activated it
+        await run_in_threadpool(self.prediction_service.reload_model)
+        if not leader:
+            # The leader maintains the scaler - followers pick up what it saved
+            await run_in_threadpool(self.prediction_service.reload_scaler)
+            return {"leader": False, "scored": 0}
+        
+        # Changes committed by other workers reach _mark_dirty through refresh()
+        await run_in_threadpool(self.twin_service.refresh)
+        # Scaler first, so this pass scores with statistics that include the new loans
+        await run_in_threadpool(self._update_scaler, not self._seeded)
+        serving = self.prediction_service.risk_model.version
+        now = datetime.now()
+        if not self._seeded or serving != self._queued_model or now.date() != self._queued_day:
+            await run_in_threadpool(self._queue_stale_loans)
+            self._seeded = True
+            self._queued_model = serving
+            self._queued_day = now.date()
+        
+        due_items = await run_in_threadpool(
+            self.twin_service.get_due_items, 0, limit=self.batch_size
+        )
+        loan_ids = list(dict.fromkeys(item["loan_id"] for item in due_items))
+        with self._dirty_lock:
+            for loan_id in self._dirty:
+                if len(loan_ids) >= self.batch_size:
+                    break
+                if loan_id not in loan_ids:
+                    loan_ids.append(loan_id)
+        
+        semaphore = asyncio.Semaphore(self.concurrency)
+        
+        async def score(loan_id: str) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                try:
+                    if self.executor is not None:
+                        # Waits for a slot rather than failing - background work has no client to retry
+                        return await self.executor.run(self.score_loan, loan_id, now, wait=True)
+                    return await run_in_threadpool(self.score_loan, loan_id, now)
+                except Exception as e:
+                    self.stats["failures"] += 1
+                    self.stats["last_error"] = f"{loan_id}: {e}"
+                    return None
+        
+        # No audit entry per loan - scheduled re-scoring would swamp the trail; the counters below record it
+        results = [r for r in await asyncio.gather(*(score(loan_id) for loan_id in loan_ids)) if r]
+        
+        self.stats["runs"] += 1
+        self.stats["loans_scored"] += len(results)
+        self.stats["due_items"] += len(due_items)
+        self.stats["last_run_at"] = now.isoformat()
+        self.stats["last_run_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return {"leader": True, "scored": len(results), "due_items": len(due_items)}
+    
+    def score_loan(self, loan_id: str, now: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+        """Advance the loan's due items, re-run both predictions and store them - blocking"""
+        with self._dirty_lock:
+            mark = self._dirty.get(loan_id)
+        # Closed and defaulted loans keep their schedule - GET /predictions scores them on demand
+        if self.twin_service.indexes.status_of(loan_id) != "active":
+            self._clear_dirty(loan_id, mark)
+            return None
+        
+        # Advance first - next_check_date is a model feature, and the advance itself marks the loan
+        loan = self.twin_service.advance_schedule(loan_id, now)
+        with self._dirty_lock:
+            mark = self._dirty.get(loan_id)
+        if loan is None:
+            self._clear_dirty(loan_id, mark)
+            return None
+        
+        # Read the version before the inputs - a write in between leaves the scores stale, not wrong
+        input_version = self.twin_service.store.loan_version(loan_id)
+        risk = self.prediction_service.predict_risk(
+            loan,
+            self.twin_service.get_covenant_checks(loan_id),
+            version=self.twin_service.loan_version_tag(loan_id)
+        )
+        esg_risk = self.esg_service.predict_esg_breach_risk(loan, self.twin_service.get_esg_compliance(loan_id))
+        self.twin_service.save_scores(loan_id, input_version, {"risk": risk, "esg_breach_risk": esg_risk})
+        self._clear_dirty(loan_id, mark)
+        return risk
+    
+    def _queue_stale_loans(self) -> None:
+        """Queue active loans without fresh scores (see get_fresh_scores), or scored by a model that is no longer served"""
+        for loan_id in self.twin_service.get_all_twin_ids():
+            if self.twin_service.indexes.status_of(loan_id) != "active":
+                continue
+            scores = self.twin_service.get_fresh_scores(loan_id)
+            if scores is None or not self.prediction_service.is_serving(scores["risk"].get("model_version")):
+                self._mark_dirty(loan_id, "stale_scores")
+    
+    def _update_scaler(self, first_pass: bool) -> None:
+        """Fit the feature scaler over the portfolio if nothing is fitted, else fold in new loans"""
+        with self._dirty_lock:
+            new_loan_ids, self._new_loans = self._new_loans, set()
+        if not self.prediction_service.scaler.fitted:
+            loans = self.twin_service.get_all_twins()
+        elif first_pass:
+            # Loans that existed at startup are already in the loaded artifact
+            return
+        else:
+            loans = [loan for loan in map(self.twin_service.get_digital_twin, new_loan_ids) if loan is not None]
+        if loans:
+            self.prediction_service.update_scaler(
+                loans, {loan.id: self.twin_service.get_covenant_checks(loan.id) for loan in loans}
+            )
+    
+    def status(self) -> Dict[str, Any]:
+        next_due = self.twin_service.next_due_date()
+        return {
+            "running": self.running,
+            "owner": self.owner,
+            "interval_seconds": self.interval,
+            "concurrency": self.concurrency,
+            "jitter": self.jitter,
+            "batch_size": self.batch_size,
+            "pending_loans": len(self._dirty),
+            "scheduled_items": len(self.twin_service.schedule),
+            "next_due_date": next_due.isoformat() if next_due else None,
+            "feature_scaler": self.prediction_service.scaler.to_dict(),
+            "model_version": self.prediction_service.model_version,
+            **self.stats
+        }
@@ -1,10 +1,72 @@
 """
 Shared service instances - ensures seed data and API use same instances
 """
+import os
 from app.services.digital_twin_service import DigitalTwinService
 from app.services.audit_service import AuditService
+from app.services.prediction_service import PredictionService, DEFAULT_SCALER_PATH, DEFAULT_MODEL_REGISTRY_PATH
+from app.services.prediction_cache import DEFAULT_MAX_ENTRIES, DEFAULT_TTL_SECONDS
+from app.services.feature_store import DEFAULT_MAX_LOANS
+from app.services.esg_service import ESGService
+from app.services.compute_executor import (
+    ComputeExecutor, DEFAULT_THREADS, DEFAULT_PROCESSES, DEFAULT_QUEUE_SIZE, DEFAULT_PROCESS_BATCH_MIN
+)
+from app.services.scoring_scheduler import ScoringScheduler, DEFAULT_INTERVAL_SECONDS, DEFAULT_CONCURRENCY
+from app.services.change_feed import create_change_feed, DEFAULT_CAPACITY
+from app.services.twin_store import create_twin_store
+from app.services.audit_store import create_audit_store
 
-# Create singleton instances
-twin_service = DigitalTwinService()
-audit_service = AuditService()
+# Create singleton instances - DATABASE_URL=sqlite:///loans.db persists twins and audit logs
+# across restarts and shares them between worker processes
+twin_service = DigitalTwinService(store=create_twin_store())
+audit_service = AuditService(store=create_audit_store())
+# Fitted feature scaler artifact - empty FEATURE_SCALER_PATH keeps it in memory only
+# Model registry - serves its ACTIVE version, else the demo weights; empty MODEL_REGISTRY_PATH disables it
+prediction_service = PredictionService(
+    scaler_path=os.getenv("FEATURE_SCALER_PATH", DEFAULT_SCALER_PATH) or None,
+    scaler_method=os.getenv("FEATURE_SCALER_METHOD", "standard"),
+    noise=os.getenv("PREDICTION_NOISE", "deterministic"),
+    cache_size=int(os.getenv("PREDICTION_CACHE_SIZE", DEFAULT_MAX_ENTRIES)),
+    cache_ttl_seconds=float(os.getenv("PREDICTION_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+    feature_store_size=int(os.getenv("FEATURE_STORE_SIZE", DEFAULT_MAX_LOANS)),
+    model_registry_path=os.getenv("MODEL_REGISTRY_PATH", DEFAULT_MODEL_REGISTRY_PATH) or None
+)
+# Cached predictions and feature blocks for a loan become unreachable on any write to it - free them right away
+twin_service.subscribe(prediction_service.cache.invalidate_loan)
+twin_service.subscribe(prediction_service.feature_store.invalidate_loan)
+esg_service = ESGService()
 
+# Prediction and scoring work runs here, off the event loop - full queues answer 503
+compute_executor = ComputeExecutor(
+    threads=int(os.getenv("COMPUTE_THREADS", DEFAULT_THREADS)),
+    processes=int(os.getenv("COMPUTE_PROCESSES", DEFAULT_PROCESSES)),
+    queue_size=int(os.getenv("COMPUTE_QUEUE_SIZE", DEFAULT_QUEUE_SIZE)),
+    process_batch_min=int(os.getenv("COMPUTE_PROCESS_BATCH_MIN", DEFAULT_PROCESS_BATCH_MIN))
+)
+
+# Pre-scores loans in the background - started by the app lifespan when SCHEDULER_ENABLED is true
+scoring_scheduler = ScoringScheduler(
+    twin_service,
+    prediction_service,
+    esg_service,
+    executor=compute_executor,
+    interval=float(os.getenv("SCHEDULER_INTERVAL_SECONDS", DEFAULT_INTERVAL_SECONDS)),
+    concurrency=int(os.getenv("SCHEDULER_CONCURRENCY", DEFAULT_CONCURRENCY))
+)
+
+
+def _refresh_shared_state() -> None:
+    twin_service.refresh()
+    audit_service.refresh()
+
+
+# Twin/audit mutations for GET /changes - read from the shared logs with SQLite, else a ring
+# buffer of recent ones (other workers' writes arrive through refresh())
+change_feed = create_change_feed(
+    twin_service.store,
+    audit_service.store,
+    capacity=int(os.getenv("CHANGE_FEED_CAPACITY", DEFAULT_CAPACITY)),
+    refresh=_refresh_shared_state
+)
+twin_service.subscribe(change_feed.publish_twin_change)
+audit_service.subscribe(change_feed.publish_audit_entry)
@@ -0,0 +1,137 @@
+"""
+Secondary indexes over the twin store
+Hash indexes on status and selected metadata keys, sorted indexes on maturity/start dates
+Kept in memory next to the store - rebuilt from the store on startup, refreshed from its change log
+"""
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from app.models import Loan
+
+# Metadata keys that get a hash index - others are still filterable, just by scan
+INDEXED_METADATA_KEYS = ("industry", "loan_type")
+
+
+class TwinIndexes:
+    """
+    Posting lists are seq-sorted (seq = store insertion order), so equality lookups
+    resume from a pagination cursor with one bisect. Date indexes are (timestamp, seq)
+    pairs, so range queries are O(log n + k).
+    """
+    
+    def __init__(self, metadata_keys: Iterable[str] = INDEXED_METADATA_KEYS):
+        self.metadata_keys = tuple(metadata_keys)
+        self._id_by_seq: Dict[int, str] = {}
+        self._seq_by_id: Dict[str, int] = {}
+        self._status_of: Dict[str, str] = {}
+        self._by_status: Dict[str, List[int]] = {}
+        self._by_metadata: Dict[str, Dict[Any, List[int]]] = {key: {} for key in self.metadata_keys}
+        self._by_maturity: List[Tuple[float, int]] = []
+        self._by_start: List[Tuple[float, int]] = []
+    
+    def __len__(self) -> int:
+        return len(self._seq_by_id)
+    
+    def add(self, loan: Loan, seq: int) -> None:
+        """Index a newly created loan - a loan already indexed is left alone"""
+        if loan.id in self._seq_by_id:
+            return
+        self._id_by_seq[seq] = loan.id
+        self._seq_by_id[loan.id] = seq
+        self._status_of[loan.id] = loan.status
+        _insert_seq(self._by_status.setdefault(loan.status, []), seq)
+        for key in self.metadata_keys:
+            value = loan.metadata.get(key)
+            if value is not None and _hashable(value):
+                _insert_seq(self._by_metadata[key].setdefault(value, []), seq)
+        insort(self._by_maturity, (loan.maturity_date.timestamp(), seq))
+        insort(self._by_start, (loan.start_date.timestamp(), seq))
+    
+    def update_status(self, loan_id: str, status: str) -> None:
+        """Move a loan between status posting lists"""
+        seq = self._seq_by_id.get(loan_id)
+        old_status = self._status_of.get(loan_id)
+        if seq is None or old_status == status:
+            return
+        postings = self._by_status[old_status]
+        del postings[bisect_left(postings, seq)]
+        if not postings:
+            del self._by_status[old_status]
+        _insert_seq(self._by_status.setdefault(status, []), seq)
+        self._status_of[loan_id] = status
+    
+    def loan_id(self, seq: int) -> Optional[str]:
+        return self._id_by_seq.get(seq)
+    
+    def status_of(self, loan_id: str) -> Optional[str]:
+        return self._status_of.get(loan_id)
+    
+    def seqs_with_status(self, status: str) -> List[int]:
+        """Seq-sorted posting list for a status (do not mutate)"""
+        return self._by_status.get(status, [])
+    
+    def seqs_with_metadata(self, key: str, value: Any) -> List[int]:
+        """Seq-sorted posting list for metadata[key] == value (do not mutate)"""
+        if key not in self._by_metadata:
+            raise KeyError(f"metadata key '{key}' is not indexed")
+        return self._by_metadata[key].get(value, [])
+    
+    def seqs_maturing_between(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> List[int]:
+        """Seqs of loans with start <= maturity_date <= end, ordered by maturity"""
+        return _range(self._by_maturity, start, end)
+    
+    def seqs_starting_between(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> List[int]:
+        """Seqs of loans with start <= start_date <= end, ordered by start date"""
+        return _range(self._by_start, start, end)
+    
+    def count_between(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> int:
+        """Number of loans maturing in the range - two bisects, no materialization"""
+        lo, hi = _bounds(self._by_maturity, start, end)
+        return max(0, hi - lo)
+
+
+def _insert_seq(postings: List[int], seq: int) -> None:
+    # Seqs only grow, so this is almost always a plain append
+    if not postings or postings[-1] < seq:
+        postings.append(seq)
+    else:
+        insort(postings, seq)
+
+
+def _hashable(value: Any) -> bool:
+    try:
+        hash(value)
+        return True
+    except TypeError:
+        return False
+
+
+def _bounds(
+    entries: List[Tuple[float, int]],
+    start: Optional[datetime],
+    end: Optional[datetime]
+) -> Tuple[int, int]:
+    lo = bisect_left(entries, (start.timestamp(), -1)) if start is not None else 0
+    hi = bisect_right(entries, (end.timestamp(), float("inf"))) if end is not None else len(entries)
+    return lo, hi
+
+
+def _range(
+    entries: List[Tuple[float, int]],
+    start: Optional[datetime],
+    end: Optional[datetime]
+) -> List[int]:
+    lo, hi = _bounds(entries, start, end)
+    return [seq for _, seq in entries[lo:hi]]
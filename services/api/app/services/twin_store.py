@@ -0,0 +1,1079 @@
+"""
+Twin storage backends - where DigitalTwinService keeps loans, checks and ESG records
+In-memory dicts by default, SQLite (WAL mode) when DATABASE_URL points at a sqlite file
+"""
+import os
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from array import array
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from app.models import Loan, CovenantCheck, CovenantStatus, ESGCompliance
+from app.services.covenant_series import LoanCheckLog
+from app.services.compact_records import ComplianceRecord
+from app.services.mvcc import MISSING, SnapshotRegistry, VersionedMap, visible_count
+
+# Per-loan counters kept up to date as checks arrive - get_twin_state reads these instead of rescanning
+HEALTH_COUNTERS = ("breached_covenants", "at_risk_covenants", "non_compliant_esg")
+# Materialized per-loan health row - counters plus the loan fields the portfolio summary needs
+HEALTH_ROW_FIELDS = ("loan_id", "borrower_name", "status", "total_covenants", "total_esg_clauses") + HEALTH_COUNTERS
+
+
+def _new_health_row(loan: Loan) -> Dict[str, Any]:
+    return {
+        "loan_id": loan.id,
+        "borrower_name": loan.borrower_name,
+        "status": loan.status,
+        "total_covenants": len(loan.covenants),
+        "total_esg_clauses": len(loan.esg_clauses),
+        **dict.fromkeys(HEALTH_COUNTERS, 0),
+    }
+
+
+def _check_counter_deltas(status: str, is_breached: bool) -> Dict[str, int]:
+    """How much a new covenant check moves each health counter"""
+    return {
+        "breached_covenants": 1 if is_breached else 0,
+        "at_risk_covenants": 1 if status == "at_risk" else 0,
+    }
+
+
+def _compliance_counter_deltas(compliance: ESGCompliance) -> Dict[str, int]:
+    """How much a new ESG compliance record moves each health counter"""
+    return {"non_compliant_esg": 1 if compliance.status == "non_compliant" else 0}
+
+
+def _sum_deltas(totals: Dict[str, Dict[str, int]], loan_id: str, deltas: Dict[str, int]) -> None:
+    loan_totals = totals.setdefault(loan_id, {})
+    for key, delta in deltas.items():
+        loan_totals[key] = loan_totals.get(key, 0) + delta
+
+
+# Field order of rows passed to append_covenant_checks
+CHECK_ROW_FIELDS = (
+    "loan_id", "covenant_id", "check_date", "status", "actual_value",
+    "threshold_value", "is_breached", "notes", "metadata"
+)
+
+
+# Kinds of entries in the twin change log
+CHANGE_KINDS = ("loan_created", "status_changed", "loan_updated", "covenant_check", "esg_compliance")
+
+
+def open_sqlite(path: str) -> sqlite3.Connection:
+    """
+    Connection tuned for many readers + one writer, possibly across worker processes
+    WAL lets readers run alongside the writer; busy_timeout makes writers queue instead of failing
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-65536")  # 64MB page cache
+    return conn
+
+
+def store_epoch(conn: sqlite3.Connection) -> str:
+    """
+    Random id fixed when the database file is created - versions only increase within one
+    database, so anything keyed on a version (ETags) also carries the epoch
+    """
+    conn.execute("CREATE TABLE IF NOT EXISTS store_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+    conn.execute("INSERT OR IGNORE INTO store_meta VALUES ('epoch', ?)", (uuid.uuid4().hex[:8],))
+    return conn.execute("SELECT value FROM store_meta WHERE key = 'epoch'").fetchone()[0]
+
+
+# Filters list_loans understands - all optional, combined with AND
+LOAN_FILTERS = ("status", "industry", "maturity_from", "maturity_to", "min_amount", "max_amount")
+
+
+def loan_matches(loan: Loan, filters: Dict[str, Any]) -> bool:
+    """Check a loan against list_loans filters (unset filters match everything)"""
+    if filters.get("status") is not None and loan.status != filters["status"]:
+        return False
+    if filters.get("industry") is not None and loan.metadata.get("industry") != filters["industry"]:
+        return False
+    if filters.get("maturity_from") is not None and loan.maturity_date < filters["maturity_from"]:
+        return False
+    if filters.get("maturity_to") is not None and loan.maturity_date > filters["maturity_to"]:
+        return False
+    if filters.get("min_amount") is not None and loan.loan_amount < filters["min_amount"]:
+        return False
+    if filters.get("max_amount") is not None and loan.loan_amount > filters["max_amount"]:
+        return False
+    return True
+
+
+class InMemoryTwinStore:
+    """
+    Plain dicts - fast, but everything is lost on restart
+    Every mutation bumps version; snapshot() pins one so long reads see a consistent
+    portfolio while writes carry on (see mvcc)
+    """
+    
+    def __init__(self):
+        # Loans and health rows are replaced, never mutated - old values stay reachable by version
+        self.twins = VersionedMap()
+        # Per-covenant typed-array series - CovenantCheck models are built on read
+        self.covenant_logs: Dict[str, LoanCheckLog] = {}
+        # Append-only per loan, with the version of each record alongside - ESGCompliance models are built on read
+        self.esg_compliance: Dict[str, List[ComplianceRecord]] = {}
+        self.esg_versions: Dict[str, array] = {}
+        self.health_rows = VersionedMap()
+        # Insertion order - a loan's seq is its position + 1, used as the pagination key
+        self.loan_order: List[str] = []
+        self.loan_seqs: Dict[str, int] = {}
+        self.loan_versions = array("q")
+        self.version = 0
+        # Versions restart with the process - the epoch tells one run's versions from another's
+        self.epoch = uuid.uuid4().hex[:8]
+        # loan_id -> version of the last write touching the loan (checks and compliance included)
+        self.loan_change_versions: Dict[str, int] = {}
+        # Derived results (scheduled risk/ESG scores) - not versioned, overwritten in place
+        self.loan_scores: Dict[str, Dict[str, Any]] = {}
+        self._write_lock = threading.RLock()
+        self._snapshots = SnapshotRegistry()
+    
+    def _next_version(self) -> int:
+        self.version += 1
+        return self.version
+    
+    def put_loan(self, loan: Loan) -> int:
+        """Insert a new loan with empty check/compliance histories, returns its seq"""
+        return self.put_loans([loan])[0]
+    
+    def put_loans(self, loans: List[Loan]) -> List[int]:
+        """Insert a batch of new loans as one version - snapshots see all of them or none"""
+        with self._write_lock:
+            version = self._next_version()
+            seqs = []
+            for loan in loans:
+                self.twins.put(loan.id, loan, version, keep_old=False)
+                self.covenant_logs[loan.id] = LoanCheckLog()
+                self.esg_compliance[loan.id] = []
+                self.esg_versions[loan.id] = array("q")
+                self.health_rows.put(loan.id, _new_health_row(loan), version, keep_old=False)
+                self.loan_order.append(loan.id)
+                self.loan_versions.append(version)
+                self.loan_change_versions[loan.id] = version
+                self.loan_seqs[loan.id] = len(self.loan_order)
+                seqs.append(len(self.loan_order))
+            return seqs
+    
+    def get_loan(self, loan_id: str) -> Optional[Loan]:
+        return self.twins.get(loan_id)
+    
+    def get_all_loans(self) -> List[Loan]:
+        return list(self.twins.values())
+    
+    def list_loan_ids(self) -> List[str]:
+        """Every loan id in seq order"""
+        return self.loan_order[:len(self.loan_versions)]
+    
+    def list_loans(
+        self,
+        after_seq: int = 0,
+        limit: Optional[int] = None,
+        **filters
+    ) -> List[Tuple[int, Loan]]:
+        """Loans with seq > after_seq in insertion order, filtered, at most limit of them"""
+        return _list_loans(self.loan_order[:len(self.loan_versions)], self.twins.get, after_seq, limit, filters)
+    
+    def update_loan_status(self, loan_id: str, status: str) -> bool:
+        with self._write_lock:
+            loan = self.twins.get(loan_id)
+            if loan is None:
+                return False
+            version = self._next_version()
+            keep_old = bool(self._snapshots)
+            self.twins.put(loan_id, loan.model_copy(update={"status": status}), version, keep_old)
+            row = dict(self.health_rows.get(loan_id), status=status)
+            self.health_rows.put(loan_id, row, version, keep_old)
+            self.loan_change_versions[loan_id] = version
+            return True
+    
+    def update_loan(self, loan: Loan) -> bool:
+        """Replace an existing loan (same id) - clause edits such as a rescheduled check date"""
+        with self._write_lock:
+            if loan.id not in self.twins:
+                return False
+            version = self._next_version()
+            keep_old = bool(self._snapshots)
+            self.twins.put(loan.id, loan, version, keep_old)
+            row = dict(
+                self.health_rows.get(loan.id),
+                borrower_name=loan.borrower_name,
+                status=loan.status,
+                total_covenants=len(loan.covenants),
+                total_esg_clauses=len(loan.esg_clauses)
+            )
+            self.health_rows.put(loan.id, row, version, keep_old)
+            self.loan_change_versions[loan.id] = version
+            return True
+    
+    def append_covenant_check(
+        self,
+        loan_id: str,
+        covenant_id: str,
+        check_date: datetime,
+        status: str,
+        actual_value: Optional[float],
+        threshold_value: float,
+        is_breached: bool,
+        notes: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> None:
+        self.append_covenant_checks([(
+            loan_id, covenant_id, check_date, status, actual_value,
+            threshold_value, is_breached, notes, metadata
+        )])
+    
+    def append_covenant_checks(self, rows: List[Tuple]) -> None:
+        """Append a batch of checks (CHECK_ROW_FIELDS tuples) as one version, counters bumped once per loan"""
+        with self._write_lock:
+            version = self._next_version()
+            totals: Dict[str, Dict[str, int]] = {}
+            for loan_id, covenant_id, check_date, status, actual_value, threshold_value, is_breached, notes, metadata in rows:
+                log = self.covenant_logs.get(loan_id)
+                if log is None:
+                    log = self.covenant_logs[loan_id] = LoanCheckLog()
+                log.append(
+                    covenant_id, check_date, status, actual_value, threshold_value, is_breached,
+                    notes, metadata, version=version
+                )
+                _sum_deltas(totals, loan_id, _check_counter_deltas(status, is_breached))
+            for loan_id, deltas in totals.items():
+                self._bump_counters(loan_id, deltas, version)
+                self.loan_change_versions[loan_id] = version
+    
+    def get_covenant_checks(self, loan_id: str) -> List[CovenantCheck]:
+        log = self.covenant_logs.get(loan_id)
+        return log.checks() if log else []
+    
+    def get_latest_covenant_check(self, loan_id: str, covenant_id: str) -> Optional[CovenantCheck]:
+        log = self.covenant_logs.get(loan_id)
+        return log.latest(covenant_id) if log else None
+    
+    def get_recent_covenant_checks(self, loan_id: str, covenant_id: str, n: int) -> List[CovenantCheck]:
+        log = self.covenant_logs.get(loan_id)
+        return log.recent(covenant_id, n) if log else []
+    
+    def get_covenant_checks_between(
+        self,
+        loan_id: str,
+        covenant_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> List[CovenantCheck]:
+        log = self.covenant_logs.get(loan_id)
+        return log.between(covenant_id, start, end) if log else []
+    
+    def count_covenant_checks(self, loan_id: str, covenant_id: str) -> int:
+        log = self.covenant_logs.get(loan_id)
+        return log.count(covenant_id) if log else 0
+    
+    def append_esg_compliance(self, loan_id: str, compliance: ESGCompliance) -> None:
+        self.append_esg_compliances([(loan_id, compliance)])
+    
+    def append_esg_compliances(self, records: List[Tuple[str, ESGCompliance]]) -> None:
+        """Append a batch of (loan_id, compliance) records as one version"""
+        with self._write_lock:
+            version = self._next_version()
+            totals: Dict[str, Dict[str, int]] = {}
+            for loan_id, compliance in records:
+                if loan_id not in self.esg_compliance:
+                    self.esg_compliance[loan_id] = []
+                    self.esg_versions[loan_id] = array("q")
+                self.esg_compliance[loan_id].append(ComplianceRecord.from_model(compliance))
+                self.esg_versions[loan_id].append(version)
+                _sum_deltas(totals, loan_id, _compliance_counter_deltas(compliance))
+            for loan_id, deltas in totals.items():
+                self._bump_counters(loan_id, deltas, version)
+                self.loan_change_versions[loan_id] = version
+    
+    def get_esg_compliance(self, loan_id: str) -> List[ESGCompliance]:
+        return [record.to_model(loan_id) for record in list(self.esg_compliance.get(loan_id, []))]
+    
+    def get_health_row(self, loan_id: str) -> Optional[Dict[str, Any]]:
+        row = self.health_rows.get(loan_id)
+        return dict(row) if row else None
+    
+    def get_health_rows(self) -> List[Dict[str, Any]]:
+        return [dict(row) for row in self.health_rows.values()]
+    
+    def _bump_counters(self, loan_id: str, deltas: Dict[str, int], version: int) -> None:
+        row = self.health_rows.get(loan_id)
+        if row is None:
+            return  # checks for unknown loans are kept but don't feed any health row
+        row = dict(row)
+        for key, delta in deltas.items():
+            row[key] += delta
+        self.health_rows.put(loan_id, row, version, keep_old=bool(self._snapshots))
+    
+    @contextmanager
+    def snapshot(self):
+        """
+        Pin the current version for a long read - writers are only held off while pinning
+        Superseded loans/health rows are dropped once no snapshot can see them
+        """
+        with self._write_lock:
+            version = self.version
+            self._snapshots.pin(version)
+        try:
+            yield InMemoryTwinSnapshot(self, version)
+        finally:
+            self._snapshots.release(version)
+            with self._write_lock:
+                oldest = self._snapshots.oldest()
+                self.twins.collect(oldest)
+                self.health_rows.collect(oldest)
+    
+    def current_version(self) -> int:
+        return self.version
+    
+    def changes_since(self, version: int) -> List[Tuple[int, str, str, Optional[str]]]:
+        """Single process - nothing can change behind the service's back"""
+        return []
+    
+    def get_loan_seq(self, loan_id: str) -> Optional[int]:
+        return self.loan_seqs.get(loan_id)
+    
+    def loan_version(self, loan_id: str) -> int:
+        """Version of the last write touching the loan, 0 if it was never written"""
+        return self.loan_change_versions.get(loan_id, 0)
+    
+    def put_loan_scores(self, loan_id: str, scores: Dict[str, Any]) -> None:
+        self.loan_scores[loan_id] = scores
+    
+    def get_loan_scores(self, loan_id: str) -> Optional[Dict[str, Any]]:
+        return self.loan_scores.get(loan_id)
+    
+    def acquire_lease(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        """Single process - the caller always holds the lease"""
+        return True
+    
+    def close(self) -> None:
+        pass
+
+
+class InMemoryTwinSnapshot:
+    """Read-only view of an InMemoryTwinStore as of one version - same read methods as the store"""
+    
+    def __init__(self, store: InMemoryTwinStore, version: int):
+        self._store = store
+        self.version = version
+        # Loans created after the snapshot are past this prefix of loan_order
+        self._loan_count = visible_count(store.loan_versions, version)
+    
+    def get_loan(self, loan_id: str) -> Optional[Loan]:
+        loan = self._store.twins.get_at(loan_id, self.version)
+        return None if loan is MISSING else loan
+    
+    def get_all_loans(self) -> List[Loan]:
+        return [self.get_loan(loan_id) for loan_id in self._store.loan_order[:self._loan_count]]
+    
+    def list_loan_ids(self) -> List[str]:
+        return self._store.loan_order[:self._loan_count]
+    
+    def list_loans(
+        self,
+        after_seq: int = 0,
+        limit: Optional[int] = None,
+        **filters
+    ) -> List[Tuple[int, Loan]]:
+        return _list_loans(self._store.loan_order[:self._loan_count], self.get_loan, after_seq, limit, filters)
+    
+    def _log(self, loan_id: str) -> Tuple[Optional[LoanCheckLog], int]:
+        log = self._store.covenant_logs.get(loan_id)
+        return log, (log.visible_at(self.version) if log else 0)
+    
+    def get_covenant_checks(self, loan_id: str) -> List[CovenantCheck]:
+        log, visible = self._log(loan_id)
+        return log.checks(visible) if log else []
+    
+    def get_latest_covenant_check(self, loan_id: str, covenant_id: str) -> Optional[CovenantCheck]:
+        log, visible = self._log(loan_id)
+        return log.latest(covenant_id, visible) if log else None
+    
+    def get_recent_covenant_checks(self, loan_id: str, covenant_id: str, n: int) -> List[CovenantCheck]:
+        log, visible = self._log(loan_id)
+        return log.recent(covenant_id, n, visible) if log else []
+    
+    def get_covenant_checks_between(
+        self,
+        loan_id: str,
+        covenant_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> List[CovenantCheck]:
+        log, visible = self._log(loan_id)
+        return log.between(covenant_id, start, end, visible) if log else []
+    
+    def count_covenant_checks(self, loan_id: str, covenant_id: str) -> int:
+        log, visible = self._log(loan_id)
+        return log.count(covenant_id, visible) if log else 0
+    
+    def get_esg_compliance(self, loan_id: str) -> List[ESGCompliance]:
+        versions = self._store.esg_versions.get(loan_id)
+        if not versions:
+            return []
+        records = self._store.esg_compliance[loan_id][:visible_count(versions, self.version)]
+        return [record.to_model(loan_id) for record in records]
+    
+    def get_health_row(self, loan_id: str) -> Optional[Dict[str, Any]]:
+        row = self._store.health_rows.get_at(loan_id, self.version)
+        return None if row is MISSING else dict(row)
+    
+    def get_health_rows(self) -> List[Dict[str, Any]]:
+        rows = []
+        for loan_id in self._store.loan_order[:self._loan_count]:
+            row = self.get_health_row(loan_id)
+            if row is not None:
+                rows.append(row)
+        return rows
+
+
+def _list_loans(
+    loan_ids: List[str],
+    get_loan,
+    after_seq: int,
+    limit: Optional[int],
+    filters: Dict[str, Any]
+) -> List[Tuple[int, Loan]]:
+    """Walk loan ids in seq order from after_seq, keeping loans that match filters"""
+    results = []
+    for position in range(after_seq, len(loan_ids)):
+        loan = get_loan(loan_ids[position])
+        if loan is not None and loan_matches(loan, filters):
+            results.append((position + 1, loan))
+            if limit is not None and len(results) >= limit:
+                break
+    return results
+
+
+class _SQLiteReads:
+    """
+    Read queries shared by the store (a pooled reader connection per query) and snapshots
+    (a connection held inside one read transaction)
+    """
+    
+    _conn: sqlite3.Connection
+    
+    @contextmanager
+    def _reader(self):
+        yield self._conn
+    
+    def _fetchone(self, sql: str, params: Any = ()) -> Optional[tuple]:
+        with self._reader() as conn:
+            return conn.execute(sql, params).fetchone()
+    
+    def _fetchall(self, sql: str, params: Any = ()) -> List[tuple]:
+        with self._reader() as conn:
+            return conn.execute(sql, params).fetchall()
+    
+    def get_loan(self, loan_id: str) -> Optional[Loan]:
+        row = self._fetchone(
+            "SELECT data FROM loans WHERE id = ?", (loan_id,)
+        )
+        return Loan.model_validate_json(row[0]) if row else None
+    
+    def get_all_loans(self) -> List[Loan]:
+        rows = self._fetchall("SELECT data FROM loans ORDER BY seq")
+        return [Loan.model_validate_json(row[0]) for row in rows]
+    
+    def list_loan_ids(self) -> List[str]:
+        """Every loan id in seq order - no loan JSON is decoded"""
+        return [row[0] for row in self._fetchall("SELECT id FROM loans ORDER BY seq")]
+    
+    def list_loans(
+        self,
+        after_seq: int = 0,
+        limit: Optional[int] = None,
+        **filters
+    ) -> List[Tuple[int, Loan]]:
+        """Loans with seq > after_seq in insertion order, filtered, at most limit of them"""
+        clauses = ["seq > ?"]
+        params: List[Any] = [after_seq]
+        if filters.get("status") is not None:
+            clauses.append("status = ?")
+            params.append(filters["status"])
+        if filters.get("industry") is not None:
+            clauses.append("json_extract(data, '$.metadata.industry') = ?")
+            params.append(filters["industry"])
+        if filters.get("maturity_from") is not None:
+            clauses.append("maturity_date >= ?")
+            params.append(filters["maturity_from"].isoformat())
+        if filters.get("maturity_to") is not None:
+            clauses.append("maturity_date <= ?")
+            params.append(filters["maturity_to"].isoformat())
+        if filters.get("min_amount") is not None:
+            clauses.append("loan_amount >= ?")
+            params.append(filters["min_amount"])
+        if filters.get("max_amount") is not None:
+            clauses.append("loan_amount <= ?")
+            params.append(filters["max_amount"])
+        
+        sql = f"SELECT seq, data FROM loans WHERE {' AND '.join(clauses)} ORDER BY seq"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        rows = self._fetchall(sql, params)
+        return [(row[0], Loan.model_validate_json(row[1])) for row in rows]
+    
+    _CHECK_COLUMNS = (
+        "covenant_id, check_date, status, actual_value, threshold_value, is_breached, notes, metadata"
+    )
+    
+    @staticmethod
+    def _check_from_row(row) -> CovenantCheck:
+        return CovenantCheck(
+            covenant_id=row[0],
+            check_date=datetime.fromisoformat(row[1]),
+            status=row[2],
+            actual_value=row[3],
+            threshold_value=row[4],
+            is_breached=bool(row[5]),
+            notes=row[6],
+            metadata=json.loads(row[7]) if row[7] else {}
+        )
+    
+    def get_covenant_checks(self, loan_id: str) -> List[CovenantCheck]:
+        rows = self._fetchall(
+            f"SELECT {self._CHECK_COLUMNS} FROM covenant_checks WHERE loan_id = ? ORDER BY id",
+            (loan_id,)
+        )
+        return [self._check_from_row(row) for row in rows]
+    
+    def get_latest_covenant_check(self, loan_id: str, covenant_id: str) -> Optional[CovenantCheck]:
+        row = self._fetchone(
+            f"SELECT {self._CHECK_COLUMNS} FROM covenant_checks WHERE loan_id = ? AND covenant_id = ? "
+            "ORDER BY check_date DESC, id DESC LIMIT 1",
+            (loan_id, covenant_id)
+        )
+        return self._check_from_row(row) if row else None
+    
+    def get_recent_covenant_checks(self, loan_id: str, covenant_id: str, n: int) -> List[CovenantCheck]:
+        rows = self._fetchall(
+            f"SELECT {self._CHECK_COLUMNS} FROM covenant_checks WHERE loan_id = ? AND covenant_id = ? "
+            "ORDER BY check_date DESC, id DESC LIMIT ?",
+            (loan_id, covenant_id, n)
+        )
+        return [self._check_from_row(row) for row in reversed(rows)]
+    
+    def get_covenant_checks_between(
+        self,
+        loan_id: str,
+        covenant_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> List[CovenantCheck]:
+        clauses = ["loan_id = ?", "covenant_id = ?"]
+        params: List[Any] = [loan_id, covenant_id]
+        if start is not None:
+            clauses.append("check_date >= ?")
+            params.append(start.isoformat())
+        if end is not None:
+            clauses.append("check_date <= ?")
+            params.append(end.isoformat())
+        rows = self._fetchall(
+            f"SELECT {self._CHECK_COLUMNS} FROM covenant_checks WHERE {' AND '.join(clauses)} "
+            "ORDER BY check_date, id",
+            params
+        )
+        return [self._check_from_row(row) for row in rows]
+    
+    def count_covenant_checks(self, loan_id: str, covenant_id: str) -> int:
+        return self._fetchone(
+            "SELECT COUNT(*) FROM covenant_checks WHERE loan_id = ? AND covenant_id = ?",
+            (loan_id, covenant_id)
+        )[0]
+    
+    def get_esg_compliance(self, loan_id: str) -> List[ESGCompliance]:
+        rows = self._fetchall(
+            "SELECT clause_id, check_date, status, evidence, notes, metadata "
+            "FROM esg_compliance WHERE loan_id = ? ORDER BY id",
+            (loan_id,)
+        )
+        return [
+            ESGCompliance(
+                clause_id=row[0],
+                loan_id=loan_id,
+                check_date=datetime.fromisoformat(row[1]),
+                status=row[2],
+                evidence=row[3],
+                notes=row[4],
+                metadata=json.loads(row[5]) if row[5] else {}
+            )
+            for row in rows
+        ]
+    
+    def get_health_row(self, loan_id: str) -> Optional[Dict[str, Any]]:
+        row = self._fetchone(
+            f"SELECT {', '.join(HEALTH_ROW_FIELDS)} FROM loan_health WHERE loan_id = ?",
+            (loan_id,)
+        )
+        return dict(zip(HEALTH_ROW_FIELDS, row)) if row else None
+    
+    def get_health_rows(self) -> List[Dict[str, Any]]:
+        rows = self._fetchall(
+            f"SELECT {', '.join(HEALTH_ROW_FIELDS)} FROM loan_health ORDER BY rowid"
+        )
+        return [dict(zip(HEALTH_ROW_FIELDS, row)) for row in rows]
+    
+    def current_version(self) -> int:
+        """Latest change log version - every committed mutation bumps it"""
+        return self._fetchone("SELECT COALESCE(MAX(version), 0) FROM twin_changes")[0]
+    
+    def changes_since(self, version: int) -> List[Tuple[int, str, str, Optional[str]]]:
+        """
+        (version, loan_id, kind, origin) for every change after version, oldest first - PK range scan
+        origin is the writing store's id, so a process can skip changes it applied itself
+        """
+        return self._fetchall(
+            "SELECT version, loan_id, kind, origin FROM twin_changes WHERE version > ? ORDER BY version",
+            (version,)
+        )
+    
+    def feed_entries(self, version: int, limit: int) -> List[Tuple[int, str, str, Optional[str]]]:
+        """(version, loan_id, kind, at) for up to limit changes after version - the change feed's twin half"""
+        return self._fetchall(
+            "SELECT version, loan_id, kind, at FROM twin_changes WHERE version > ? ORDER BY version LIMIT ?",
+            (version, limit)
+        )
+    
+    def get_loan_seq(self, loan_id: str) -> Optional[int]:
+        row = self._fetchone("SELECT seq FROM loans WHERE id = ?", (loan_id,))
+        return row[0] if row else None
+    
+    def loan_version(self, loan_id: str) -> int:
+        """Version of the last change log entry for the loan - idx_twin_changes_loan makes this one seek"""
+        return self._fetchone(
+            "SELECT COALESCE(MAX(version), 0) FROM twin_changes WHERE loan_id = ?", (loan_id,)
+        )[0]
+    
+    def get_loan_scores(self, loan_id: str) -> Optional[Dict[str, Any]]:
+        row = self._fetchone("SELECT data FROM loan_scores WHERE loan_id = ?", (loan_id,))
+        return json.loads(row[0]) if row else None
+
+
+class SQLiteTwinSnapshot(_SQLiteReads):
+    """
+    Consistent read-only view - every query runs inside one read transaction, so WAL
+    serves the database exactly as it was when the snapshot started while writers carry on
+    """
+    
+    def __init__(self, conn: sqlite3.Connection, version: int):
+        self._conn = conn
+        self.version = version
+
+
+class SQLiteTwinStore(_SQLiteReads):
+    """
+    SQLite-backed store - survives restarts
+    Full loan JSON lives in loans.data, covenants/ESG clauses are mirrored into
+    their own tables so they can be queried without decoding every loan
+    """
+    
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS loans (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        id TEXT NOT NULL UNIQUE,
+        borrower_name TEXT NOT NULL,
+        loan_amount REAL NOT NULL,
+        interest_rate REAL NOT NULL,
+        start_date TEXT NOT NULL,
+        maturity_date TEXT NOT NULL,
+        status TEXT NOT NULL,
+        data TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_loans_status ON loans(status);
+    CREATE INDEX IF NOT EXISTS idx_loans_maturity ON loans(maturity_date);
+    
+    CREATE TABLE IF NOT EXISTS covenants (
+        loan_id TEXT NOT NULL,
+        covenant_id TEXT NOT NULL,
+        name TEXT NOT NULL,
+        type TEXT NOT NULL,
+        threshold REAL NOT NULL,
+        operator TEXT NOT NULL,
+        frequency TEXT NOT NULL,
+        next_check_date TEXT NOT NULL,
+        PRIMARY KEY (loan_id, covenant_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_covenants_next_check ON covenants(next_check_date);
+    
+    CREATE TABLE IF NOT EXISTS esg_clauses (
+        loan_id TEXT NOT NULL,
+        clause_id TEXT NOT NULL,
+        category TEXT NOT NULL,
+        requirement TEXT NOT NULL,
+        reporting_frequency TEXT NOT NULL,
+        next_report_date TEXT NOT NULL,
+        PRIMARY KEY (loan_id, clause_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_esg_clauses_next_report ON esg_clauses(next_report_date);
+    
+    CREATE TABLE IF NOT EXISTS covenant_checks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        loan_id TEXT NOT NULL,
+        covenant_id TEXT NOT NULL,
+        check_date TEXT NOT NULL,
+        status TEXT NOT NULL,
+        actual_value REAL,
+        threshold_value REAL NOT NULL,
+        is_breached INTEGER NOT NULL,
+        notes TEXT,
+        metadata TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_checks_loan ON covenant_checks(loan_id, id);
+    CREATE INDEX IF NOT EXISTS idx_checks_covenant ON covenant_checks(loan_id, covenant_id, check_date);
+    
+    CREATE TABLE IF NOT EXISTS esg_compliance (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        loan_id TEXT NOT NULL,
+        clause_id TEXT NOT NULL,
+        check_date TEXT NOT NULL,
+        status TEXT NOT NULL,
+        evidence TEXT,
+        notes TEXT,
+        metadata TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_esg_compliance_loan ON esg_compliance(loan_id, id);
+    
+    CREATE TABLE IF NOT EXISTS twin_changes (
+        version INTEGER PRIMARY KEY AUTOINCREMENT,
+        loan_id TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        origin TEXT,
+        at TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_twin_changes_loan ON twin_changes(loan_id, version);
+    
+    CREATE TABLE IF NOT EXISTS loan_health (
+        loan_id TEXT PRIMARY KEY,
+        borrower_name TEXT NOT NULL,
+        status TEXT NOT NULL,
+        total_covenants INTEGER NOT NULL,
+        total_esg_clauses INTEGER NOT NULL,
+        breached_covenants INTEGER NOT NULL DEFAULT 0,
+        at_risk_covenants INTEGER NOT NULL DEFAULT 0,
+        non_compliant_esg INTEGER NOT NULL DEFAULT 0
+    );
+    
+    CREATE TABLE IF NOT EXISTS loan_scores (
+        loan_id TEXT PRIMARY KEY,
+        scored_at TEXT NOT NULL,
+        data TEXT NOT NULL
+    );
+    
+    CREATE TABLE IF NOT EXISTS leases (
+        name TEXT PRIMARY KEY,
+        owner TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    );
+    """
+    
+    MAX_IDLE_READERS = 4
+    
+    def __init__(self, path: str):
+        self.path = path
+        # One shared connection per process, writes serialized by the lock - SQLite only allows one writer anyway
+        self._conn = open_sqlite(path)
+        self._lock = threading.RLock()
+        self._conn.executescript(self.SCHEMA)
+        self.epoch = store_epoch(self._conn)
+        # Identifies this process's writes in the change log
+        self.origin = uuid.uuid4().hex
+        # Idle reader connections - plain reads borrow one per query, snapshots hold one for their read transaction
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        self._migrate()
+        self._backfill_health_counters()
+    
+    @contextmanager
+    def _reader(self):
+        """
+        Idle reader connection for one query - never the writer connection, which may be
+        inside a transaction that isn't committed yet (or gets rolled back)
+        """
+        with self._readers_lock:
+            conn = self._readers.pop() if self._readers else open_sqlite(self.path)
+        try:
+            yield conn
+        finally:
+            with self._readers_lock:
+                if len(self._readers) < self.MAX_IDLE_READERS:
+                    self._readers.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+    
+    @contextmanager
+    def snapshot(self):
+        """
+        Pin the current committed state for a long read
+        Old page versions stay in the WAL until the snapshot ends - the next checkpoint
+        after release reclaims them
+        """
+        with self._reader() as conn:
+            conn.execute("BEGIN")
+            try:
+                # The first read fixes the snapshot
+                version = conn.execute("SELECT COALESCE(MAX(version), 0) FROM twin_changes").fetchone()[0]
+                yield SQLiteTwinSnapshot(conn, version)
+            finally:
+                conn.execute("COMMIT")
+    
+    @contextmanager
+    def _transaction(self):
+        """Serialized write transaction - rolled back if anything inside raises"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+    
+    def _migrate(self) -> None:
+        """Columns added after a table was first created"""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(twin_changes)")}
+        if "origin" not in columns:
+            self._conn.execute("ALTER TABLE twin_changes ADD COLUMN origin TEXT")
+        if "at" not in columns:
+            self._conn.execute("ALTER TABLE twin_changes ADD COLUMN at TEXT")
+    
+    def _backfill_health_counters(self) -> None:
+        """Databases written before loan_health existed - count once, then maintain incrementally"""
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO loan_health "
+                "SELECT l.id, l.borrower_name, l.status, "
+                "json_array_length(l.data, '$.covenants'), json_array_length(l.data, '$.esg_clauses'), "
+                "(SELECT COUNT(*) FROM covenant_checks c WHERE c.loan_id = l.id AND c.is_breached = 1), "
+                "(SELECT COUNT(*) FROM covenant_checks c WHERE c.loan_id = l.id AND c.status = 'at_risk'), "
+                "(SELECT COUNT(*) FROM esg_compliance e WHERE e.loan_id = l.id AND e.status = 'non_compliant') "
+                "FROM loans l WHERE l.id NOT IN (SELECT loan_id FROM loan_health) ORDER BY l.seq"
+            )
+    
+    def _log_change(self, conn, loan_id: str, kind: str) -> None:
+        """Append to the change log so other worker processes can refresh their in-memory indexes"""
+        conn.execute(
+            "INSERT INTO twin_changes (loan_id, kind, origin, at) VALUES (?, ?, ?, ?)",
+            (loan_id, kind, self.origin, datetime.now().isoformat())
+        )
+    
+    def _bump_counters(self, conn, loan_id: str, deltas: Dict[str, int]) -> None:
+        if not any(deltas.values()):
+            return
+        assignments = ", ".join(f"{key} = {key} + ?" for key in deltas)
+        conn.execute(
+            f"UPDATE loan_health SET {assignments} WHERE loan_id = ?",
+            (*deltas.values(), loan_id)
+        )
+    
+    def put_loan(self, loan: Loan) -> int:
+        """Insert loan row plus its covenant and ESG clause rows in one transaction, returns its seq"""
+        return self.put_loans([loan])[0]
+    
+    def put_loans(self, loans: List[Loan]) -> List[int]:
+        """Insert a batch of loans in one transaction - one commit instead of one per loan"""
+        with self._transaction() as conn:
+            return [self._insert_loan(conn, loan) for loan in loans]
+    
+    def _insert_loan(self, conn, loan: Loan) -> int:
+        seq = conn.execute(
+            "INSERT INTO loans (id, borrower_name, loan_amount, interest_rate, "
+            "start_date, maturity_date, status, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                loan.id, loan.borrower_name, loan.loan_amount, loan.interest_rate,
+                loan.start_date.isoformat(), loan.maturity_date.isoformat(),
+                loan.status, loan.model_dump_json()
+            )
+        ).lastrowid
+        self._insert_clauses(conn, loan)
+        conn.execute(
+            "INSERT OR IGNORE INTO loan_health (loan_id, borrower_name, status, "
+            "total_covenants, total_esg_clauses) VALUES (?, ?, ?, ?, ?)",
+            (loan.id, loan.borrower_name, loan.status, len(loan.covenants), len(loan.esg_clauses))
+        )
+        self._log_change(conn, loan.id, "loan_created")
+        return seq
+    
+    @staticmethod
+    def _insert_clauses(conn, loan: Loan) -> None:
+        conn.executemany(
+            "INSERT OR REPLACE INTO covenants VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (loan.id, c.id, c.name, c.type, c.threshold, c.operator,
+                 c.frequency, c.next_check_date.isoformat())
+                for c in loan.covenants
+            ]
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO esg_clauses VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (loan.id, e.id, e.category, e.requirement,
+                 e.reporting_frequency, e.next_report_date.isoformat())
+                for e in loan.esg_clauses
+            ]
+        )
+    
+    def update_loan_status(self, loan_id: str, status: str) -> bool:
+        # Read inside the write transaction so a concurrent worker can't interleave
+        with self._transaction() as conn:
+            row = conn.execute("SELECT data FROM loans WHERE id = ?", (loan_id,)).fetchone()
+            if not row:
+                return False
+            loan = Loan.model_validate_json(row[0])
+            loan.status = status
+            conn.execute(
+                "UPDATE loans SET status = ?, data = ? WHERE id = ?",
+                (status, loan.model_dump_json(), loan_id)
+            )
+            conn.execute("UPDATE loan_health SET status = ? WHERE loan_id = ?", (status, loan_id))
+            self._log_change(conn, loan_id, "status_changed")
+            return True
+    
+    def update_loan(self, loan: Loan) -> bool:
+        """Replace an existing loan (same id) and re-mirror its covenant/ESG clause rows"""
+        with self._transaction() as conn:
+            updated = conn.execute(
+                "UPDATE loans SET borrower_name = ?, loan_amount = ?, interest_rate = ?, "
+                "start_date = ?, maturity_date = ?, status = ?, data = ? WHERE id = ?",
+                (
+                    loan.borrower_name, loan.loan_amount, loan.interest_rate,
+                    loan.start_date.isoformat(), loan.maturity_date.isoformat(),
+                    loan.status, loan.model_dump_json(), loan.id
+                )
+            ).rowcount
+            if not updated:
+                return False
+            conn.execute("DELETE FROM covenants WHERE loan_id = ?", (loan.id,))
+            conn.execute("DELETE FROM esg_clauses WHERE loan_id = ?", (loan.id,))
+            self._insert_clauses(conn, loan)
+            conn.execute(
+                "UPDATE loan_health SET borrower_name = ?, status = ?, total_covenants = ?, "
+                "total_esg_clauses = ? WHERE loan_id = ?",
+                (loan.borrower_name, loan.status, len(loan.covenants), len(loan.esg_clauses), loan.id)
+            )
+            self._log_change(conn, loan.id, "loan_updated")
+            return True
+    
+    def append_covenant_check(
+        self,
+        loan_id: str,
+        covenant_id: str,
+        check_date: datetime,
+        status: str,
+        actual_value: Optional[float],
+        threshold_value: float,
+        is_breached: bool,
+        notes: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> None:
+        self.append_covenant_checks([(
+            loan_id, covenant_id, check_date, status, actual_value,
+            threshold_value, is_breached, notes, metadata
+        )])
+    
+    def append_covenant_checks(self, rows: List[Tuple]) -> None:
+        """Append a batch of checks (CHECK_ROW_FIELDS tuples) in one transaction"""
+        params = []
+        totals: Dict[str, Dict[str, int]] = {}
+        for loan_id, covenant_id, check_date, status, actual_value, threshold_value, is_breached, notes, metadata in rows:
+            status = CovenantStatus(status).value
+            params.append((
+                loan_id, covenant_id, check_date.isoformat(), status,
+                actual_value, threshold_value, int(is_breached), notes,
+                json.dumps(metadata) if metadata else None
+            ))
+            _sum_deltas(totals, loan_id, _check_counter_deltas(status, is_breached))
+        
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT INTO covenant_checks (loan_id, covenant_id, check_date, status, "
+                "actual_value, threshold_value, is_breached, notes, metadata) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                params
+            )
+            for loan_id, deltas in totals.items():
+                self._bump_counters(conn, loan_id, deltas)
+                self._log_change(conn, loan_id, "covenant_check")
+    
+    def append_esg_compliance(self, loan_id: str, compliance: ESGCompliance) -> None:
+        self.append_esg_compliances([(loan_id, compliance)])
+    
+    def append_esg_compliances(self, records: List[Tuple[str, ESGCompliance]]) -> None:
+        """Append a batch of (loan_id, compliance) records in one transaction"""
+        totals: Dict[str, Dict[str, int]] = {}
+        for loan_id, compliance in records:
+            _sum_deltas(totals, loan_id, _compliance_counter_deltas(compliance))
+        
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT INTO esg_compliance (loan_id, clause_id, check_date, status, "
+                "evidence, notes, metadata) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        loan_id, compliance.clause_id, compliance.check_date.isoformat(),
+                        compliance.status.value, compliance.evidence, compliance.notes,
+                        json.dumps(compliance.metadata) if compliance.metadata else None
+                    )
+                    for loan_id, compliance in records
+                ]
+            )
+            for loan_id, deltas in totals.items():
+                self._bump_counters(conn, loan_id, deltas)
+                self._log_change(conn, loan_id, "esg_compliance")
+    
+    def put_loan_scores(self, loan_id: str, scores: Dict[str, Any]) -> None:
+        """Derived results - no change log entry, they don't alter the loan"""
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO loan_scores (loan_id, scored_at, data) VALUES (?, ?, ?)",
+                (loan_id, datetime.now().isoformat(), json.dumps(scores, default=str))
+            )
+    
+    def acquire_lease(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        """
+        Take or renew a named lease shared by every worker process on this database
+        True if owner holds it for the next ttl_seconds - lets exactly one worker run background jobs
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT owner, expires_at FROM leases WHERE name = ?", (name,)).fetchone()
+            if row is not None and row[0] != owner and row[1] > now:
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO leases (name, owner, expires_at) VALUES (?, ?, ?)",
+                (name, owner, now + ttl_seconds)
+            )
+            return True
+    
+    def close(self) -> None:
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers = []
+        with self._lock:
+            self._conn.close()
+
+
+def create_twin_store(database_url: Optional[str] = None):
+    """
+    Pick a backend from DATABASE_URL
+    sqlite:///path/to/loans.db -> SQLiteTwinStore, unset/anything else -> in-memory
+    """
+    database_url = database_url or os.getenv("DATABASE_URL", "")
+    if database_url.startswith("sqlite:///"):
+        return SQLiteTwinStore(database_url[len("sqlite:///"):])
+    return InMemoryTwinStore()
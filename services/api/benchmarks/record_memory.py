@@ -0,0 +1,104 @@
+"""
+Memory per stored record - pydantic models / dicts vs the compact record types
+Run from services/api: python -m benchmarks.record_memory [--records N]
+"""
+import argparse
+import gc
+import random
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+from app.models import CovenantCheck, ESGCompliance
+from app.services.audit_service import AuditService, AuditEventType
+from app.services.compact_records import AuditRecord, ComplianceRecord
+from app.services.covenant_series import LoanCheckLog
+
+STATUSES = ("compliant", "at_risk", "non_compliant")
+CHECK_STATUSES = ("compliant", "at_risk", "breached")
+
+
+def measure(build) -> int:
+    """Bytes still allocated after build() returns its result"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, default=100_000)
+    n = parser.parse_args().records
+    
+    random.seed(7)
+    start = datetime(2024, 1, 1)
+    loan_ids = [str(uuid.uuid4()) for _ in range(max(n // 100, 1))]
+    clause_ids = [str(uuid.uuid4()) for _ in range(5)]
+    compliances = [
+        ESGCompliance(
+            clause_id=random.choice(clause_ids),
+            loan_id=random.choice(loan_ids),
+            check_date=start + timedelta(hours=i),
+            status=random.choice(STATUSES)
+        )
+        for i in range(n)
+    ]
+    audit_service = AuditService()
+    audit_loans = [random.choice(loan_ids) for _ in range(n)]
+    
+    def audit_entry(loan_id):
+        return audit_service._build_entry(
+            AuditEventType.COVENANT_CHECKED,
+            loan_id,
+            "analyst",
+            "Covenant check: Debt to Equity Ratio - Compliant",
+            {"covenant_id": clause_ids[0], "actual_value": 1.5, "threshold": 2.0, "is_breached": False}
+        )
+    checks = [
+        (random.choice(clause_ids), start + timedelta(hours=i), random.choice(CHECK_STATUSES), random.random() * 3, 2.0)
+        for i in range(n)
+    ]
+    
+    def covenant_models():
+        return [
+            CovenantCheck(
+                covenant_id=covenant_id, check_date=check_date, status=status,
+                actual_value=actual, threshold_value=threshold, is_breached=status == "breached"
+            )
+            for covenant_id, check_date, status, actual, threshold in checks
+        ]
+    
+    def covenant_log():
+        log = LoanCheckLog()
+        for covenant_id, check_date, status, actual, threshold in checks:
+            log.append(covenant_id, check_date, status, actual, threshold, status == "breached")
+        return log
+    
+    # Only what the store keeps is counted - shared inputs and temporaries are excluded
+    rows = [
+        ("CovenantCheck model -> LoanCheckLog arrays", covenant_models, covenant_log),
+        (
+            "ESGCompliance model -> ComplianceRecord",
+            lambda: [c.model_copy() for c in compliances],
+            lambda: [ComplianceRecord.from_model(c) for c in compliances]
+        ),
+        (
+            "audit entry dict -> AuditRecord",
+            lambda: [audit_entry(loan_id) for loan_id in audit_loans],
+            lambda: [AuditRecord(audit_entry(loan_id)) for loan_id in audit_loans]
+        ),
+    ]
+    
+    print(f"{n:,} records each")
+    print(f"{'record type':<46}{'before B/rec':>14}{'after B/rec':>14}{'saved':>8}")
+    for name, before, after in rows:
+        before_bytes = measure(before) / n
+        after_bytes = measure(after) / n
+        print(f"{name:<46}{before_bytes:>14.0f}{after_bytes:>14.0f}{1 - after_bytes / before_bytes:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
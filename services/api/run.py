@@ -1,13 +1,53 @@
 """
 Simple script to run the API server
+
+python run.py                  - dev server with auto-reload
+python run.py --workers 4      - production, 4 worker processes (or WEB_CONCURRENCY=4)
+
+Workers are separate processes, so with more than one the twin store and audit log
+must live in SQLite (DATABASE_URL) for every worker to see the same loans
 """
+import argparse
+import os
 import uvicorn
 
-if __name__ == "__main__":
+DEFAULT_SHARED_DATABASE_URL = "sqlite:///data/loanlife.db"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the LoanLife Edge API")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("WEB_CONCURRENCY", "1")),
+        help="Worker processes - more than 1 switches to production mode"
+    )
+    args = parser.parse_args()
+    
+    if args.workers <= 1:
+        uvicorn.run("app.main:app", host=args.host, port=args.port, reload=True)
+        return
+    
+    # In-memory stores would give every worker its own private copy of the portfolio
+    if not os.getenv("DATABASE_URL", "").startswith("sqlite:///"):
+        os.environ["DATABASE_URL"] = DEFAULT_SHARED_DATABASE_URL
+        print(f"ℹ️  {args.workers} workers need shared state - using DATABASE_URL={DEFAULT_SHARED_DATABASE_URL}")
+    
+    # Seed once here instead of once per worker, then keep the workers from seeding again
+    if os.getenv("SEED_DATA", "false").lower() == "true":
+        import app.main  # noqa: F401 - seeds into the shared database on import
+        os.environ["SEED_DATA"] = "false"
+    
     uvicorn.run(
         "app.main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        reload=False
     )
 
+
+if __name__ == "__main__":
+    main()